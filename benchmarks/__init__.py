@@ -0,0 +1,57 @@
+# Benchmarks for the Sabre client. Run each module with `python -m`, e.g.
+#     python -m sabre.benchmarks.bench_transport
+# Nothing here talks to Sabre: every benchmark runs against the local stub in
+# stub_server.py.
+
+import atexit
+import os
+import shutil
+import tempfile
+
+import django
+from django.conf import settings
+
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+
+# template_root
+# () -> String
+# A temporary template directory laid out like a project using the app:
+# the SOAP templates load as sabre/xml/... and extend libs/sabre/xml/...
+def template_root():
+    root = tempfile.mkdtemp(prefix='sabre_templates_')
+    atexit.register(shutil.rmtree, root, True)
+    os.makedirs(os.path.join(root, 'libs'))
+    for link in (os.path.join(root, 'sabre'), os.path.join(root, 'libs', 'sabre')):
+        os.symlink(os.path.join(TEMPLATES_DIR, 'sabre'), link)
+    return root
+
+
+# setup_django
+# () -> ()
+# Configures a minimal Django so the client modules can be imported outside
+# of a project. Does nothing when settings are already configured.
+def setup_django(**overrides):
+    if settings.configured:
+        return
+
+    options = {
+        'DEBUG': True,
+        'SABRE': {
+            'TEST': True,
+            'WSDL_URL': 'http://127.0.0.1:0/',
+        },
+        'CACHES': {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }
+        },
+        'TEMPLATES': [{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [template_root()],
+        }],
+    }
+    options.update(overrides)
+    settings.configure(**options)
+    django.setup()
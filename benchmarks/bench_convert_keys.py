@@ -0,0 +1,96 @@
+"""
+Keys/sec of sabre_utils.convert_keys against the previous implementation
+(seven uncompiled re.sub calls per key, recursive walk) on a large
+InstaFlights response.
+
+    python -m sabre.benchmarks.bench_convert_keys [--itineraries N] [--rounds N]
+"""
+import argparse
+import copy
+import re
+import time
+
+from sabre.benchmarks import setup_django
+
+setup_django()
+
+from sabre.benchmarks.fixtures import instaflights_response
+from sabre.sabre_dev_studio import sabre_utils
+
+
+# The implementation convert_keys replaced, kept for comparison. Iterates
+# over a copy of the keys so that it runs on Python 3.
+def legacy_convert_keys(d):
+    if isinstance(d, list):
+        for elem in d:
+            legacy_convert_keys(elem)
+        return
+    elif not isinstance(d, dict):
+        return
+
+    for key in list(d.keys()):
+        s = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', key)
+        s = re.sub('([a-z0-9])([A-Z])', r'\1_\2', s).lower()
+        s = re.sub('[^0-9a-zA-Z]+', '_', s)
+        s = re.sub('^[0-9]', '', s)
+        s = s.replace(' ', '_')
+        s = re.sub('__*', '_', s)
+        s = re.sub('_*$', '', s)
+
+        d[s] = d[key]
+        if s != key:
+            del d[key]
+
+        legacy_convert_keys(d[s])
+
+
+def count_keys(d):
+    total = 0
+    stack = [d]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            total += len(node)
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return total
+
+
+def run(convert, fixture, rounds):
+    best = None
+    for _ in range(rounds):
+        data = copy.deepcopy(fixture)
+        start = time.perf_counter()
+        convert(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--itineraries', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    fixture = instaflights_response(args.itineraries)
+    keys = count_keys(fixture)
+
+    expected = copy.deepcopy(fixture)
+    legacy_convert_keys(expected)
+    converted = copy.deepcopy(fixture)
+    sabre_utils.convert_keys(converted)
+    assert converted == expected, 'convert_keys output differs from the legacy implementation'
+
+    before = run(legacy_convert_keys, fixture, args.rounds)
+    after = run(sabre_utils.convert_keys, fixture, args.rounds)
+
+    print('%d keys per response' % keys)
+    print('%-8s %12.0f keys/s' % ('before', keys / before))
+    print('%-8s %12.0f keys/s' % ('after', keys / after))
+    print('%-8s %12.2fx' % ('speedup', before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Envelopes/sec of the SOAP envelope rendering: Django render_to_string
+against the cached EnvelopeBuilder, for every SOAP template, checking that
+both produce the same text.
+
+    python -m sabre.benchmarks.bench_envelope [--seconds N]
+"""
+import argparse
+import datetime
+import time
+
+from sabre.benchmarks import setup_django
+
+setup_django(SABRE={
+    'TEST': True,
+    'WSDL_URL': 'http://127.0.0.1:0/',
+    'From': 'agency.example.com',
+    'To': 'webservices.sabre.com',
+    'CPAId': 'PCC1',
+    'ConversationId': 'bench-conversation',
+    'MessageId': 'bench-message',
+    'Timestamp': '2026-10-18T10:00:00Z',
+    'TimeToLive': '2026-10-18T10:15:00Z',
+    'Username': 'user',
+    'Password': 'secret & <pass>',
+    'Organization': 'PCC1',
+    'Domain': 'DEFAULT',
+    'Ippc': 'PCC1',
+})
+
+from django.template.loader import render_to_string
+
+from sabre.sabre_dev_studio import sabre_configs
+from sabre.sabre_dev_studio.sabre_envelope import EnvelopeBuilder
+
+
+TOKEN = 'Shared/IDL:IceSess\\/SessMgr:1\\.0.IDL/Common/!ICESMS\\/STUB!ICESMSLB\\/STUB.LB!-0123456789'
+
+CASES = [
+    ('BargainFinderMaxRQ', 'BargainFinderMaxRQ', {
+        'BinarySecurityToken': TOKEN,
+        'origin': 'JFK', 'destination': 'LAX',
+        'date_departure': '2026-11-01T00:00:00', 'date_arrival': '2026-11-08T00:00:00',
+    }),
+    ('OTA_HotelAvailLLSRQ', 'OTA_HotelAvailLLSRQ', {
+        'BinarySecurityToken': TOKEN, 'ipcc': 'PCC1',
+        'hotel_latitude': '32.7767', 'hotel_longitude': '-96.7970', 'hotel_name': 'B&B <Dallas>',
+        'room_amenities': ['A2D'], 'price_max': 150,
+    }),
+    ('SessionCreateRQ', 'Session', {}),
+    ('SessionCloseRQ', 'Session', {'BinarySecurityToken': TOKEN}),
+    ('OTA_PingRQ', 'OTA_PingRQ', {'BinarySecurityToken': TOKEN,
+                                  'TimeStamp': datetime.datetime(2026, 10, 18, 10, 0).isoformat()}),
+]
+
+
+def rate(fn, seconds):
+    count = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=1.0)
+    args = parser.parse_args()
+
+    for action, service, values in CASES:
+        # As render_service builds them
+        params = dict(values, Action=action, Service=service)
+        params.update(sabre_configs.configurations)
+        template_name = 'sabre/xml/' + action + '.xml'
+        builder = EnvelopeBuilder.get(action, service)
+
+        expected = render_to_string(template_name, params)
+        assert builder.render(params) == expected, '%s output differs from the template' % action
+
+        before = rate(lambda: render_to_string(template_name, params), args.seconds)
+        after = rate(lambda: builder.render(params), args.seconds)
+        print('%-20s template %9.0f/s   builder %9.0f/s   %5.2fx' % (action, before, after, after / before))
+
+
+if __name__ == '__main__':
+    main()
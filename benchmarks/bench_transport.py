@@ -0,0 +1,71 @@
+"""
+Requests/sec of SabreDevStudio.request with and without connection pooling.
+
+    python -m sabre.benchmarks.bench_transport [--requests N] [--threads N]
+"""
+import argparse
+import threading
+import time
+
+from sabre.benchmarks import setup_django
+
+# Every request must reach the stub: no client-side rate limits, and no
+# coalescing or caching of identical requests
+setup_django(SABRE={
+    'TEST': True,
+    'WSDL_URL': 'http://127.0.0.1:0/',
+    'RESPONSE_CACHE_BACKEND': None,
+    'SINGLE_FLIGHT_BACKEND': None,
+    'RATE_LIMIT_BACKEND': None,
+})
+
+from sabre.benchmarks.stub_server import StubServer
+from sabre.sabre_dev_studio.sabre_dev_studio import SabreDevStudio
+from sabre.sabre_dev_studio.sabre_transport import SabreTransport
+
+
+def run(transport, stub, total, threads):
+    client = SabreDevStudio(transport=transport)
+    client.host = stub.url
+    served = stub.count
+    client.token = 'stub'
+
+    per_thread = total // threads
+
+    def worker(n):
+        for i in range(per_thread):
+            client.instaflights({'origin': 'JFK', 'destination': 'LAX',
+                                 'limit': n * per_thread + i})
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.time() - start
+    transport.close()
+
+    assert stub.count - served == per_thread * threads, 'not every request reached the stub'
+
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0)
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency) as stub:
+        plain = run(SabreTransport(pooled=False), stub, args.requests, args.threads)
+        pooled = run(SabreTransport(pool_maxsize=args.threads), stub, args.requests, args.threads)
+
+    print('%-12s %10.1f req/s' % ('unpooled', plain))
+    print('%-12s %10.1f req/s' % ('pooled', pooled))
+    print('%-12s %10.2fx' % ('speedup', pooled / plain))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Parse time and peak RSS of xmltodict.parse on BargainFinderMaxRQ and
+OTA_HotelAvailLLSRQ responses: default (OrderedDict), fast (plain dicts,
+interned names), fast with XmlNode objects and fast with a display
+projection (sabre_configs.soap_projections).
+
+Each measurement runs in its own process so that peak RSS is not shared
+between modes. Peak RSS moves in pages and may not grow at all when the
+result fits in memory the process already holds, so the peak Python heap
+(tracemalloc) is reported too and used for the memory ratio.
+
+    python -m sabre.benchmarks.bench_xmltodict [--itineraries N] [--hotels N] [--rounds N]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sabre.benchmarks import setup_django
+
+setup_django()
+
+from sabre import xmltodict
+from sabre.benchmarks.fixtures import bargain_finder_max_response, hotel_availability_response
+from sabre.sabre_dev_studio.sabre_utils import soap_projection
+
+
+MODES = {
+    'default': {},
+    'fast': {'fast': True},
+    'nodes': {'fast': True, 'nodes': True},
+    'projected': {'fast': True},
+}
+
+
+def max_rss():
+    # kilobytes on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+# measure
+# String -> String -> Int -> String? -> Dictionary
+# Runs in the child process: parses the file once for peak RSS, once under
+# tracemalloc for peak heap, then `rounds` more times for the best time
+def measure(path, mode, rounds, projection=None):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    options = dict(MODES[mode], attr_prefix='_')
+    if mode == 'projected':
+        options['projection'] = soap_projection(projection)
+
+    before = max_rss()
+    doc = xmltodict.parse(raw, **options)
+    peak = max_rss() - before
+    del doc
+
+    tracemalloc.start()
+    doc = xmltodict.parse(raw, **options)
+    heap = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del doc
+
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        xmltodict.parse(raw, **options)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {'seconds': best, 'peak_rss': peak, 'peak_heap': heap}
+
+
+def run_child(path, mode, rounds, projection):
+    out = subprocess.check_output([sys.executable, '-m', 'sabre.benchmarks.bench_xmltodict',
+                                   '--child', mode, '--file', path, '--rounds', str(rounds),
+                                   '--projection', projection])
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--itineraries', type=int, default=2000)
+    parser.add_argument('--hotels', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--child', choices=sorted(MODES), help=argparse.SUPPRESS)
+    parser.add_argument('--file', help=argparse.SUPPRESS)
+    parser.add_argument('--projection', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.file, args.child, args.rounds, args.projection)))
+        return
+
+    payloads = [
+        ('BargainFinderMaxRQ', 'bfm_fare_display', bargain_finder_max_response(args.itineraries)),
+        ('OTA_HotelAvailLLSRQ', 'hotel_rate_display', hotel_availability_response(args.hotels)),
+    ]
+    for name, projection, raw in payloads:
+        fd, path = tempfile.mkstemp(suffix='.xml')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(raw)
+
+            print('%s (%.1f MB)' % (name, len(raw) / 1e6))
+            baseline = None
+            for mode in ('default', 'fast', 'nodes', 'projected'):
+                result = run_child(path, mode, args.rounds, projection)
+                if baseline is None:
+                    baseline = result
+                print('  %-10s %8.1f ms %8.1f MB peak RSS %8.1f MB peak heap   %5.2fx time %5.2fx memory' % (
+                    mode, result['seconds'] * 1e3, result['peak_rss'] / 1e6, result['peak_heap'] / 1e6,
+                    baseline['seconds'] / result['seconds'],
+                    baseline['peak_heap'] / float(result['peak_heap'])))
+        finally:
+            os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+# Synthetic Sabre payloads shaped like recorded responses, so that the
+# benchmarks run offline and at any size. Values are deterministic for a
+# given size.
+import datetime
+
+
+def _segment(i, j):
+    depart = datetime.datetime(2026, 11, 1, 6, 0) + datetime.timedelta(hours=i % 18, minutes=15 * j)
+    arrive = depart + datetime.timedelta(hours=2, minutes=35)
+    return {
+        'DepartureAirport': {'LocationCode': 'JFK', 'TerminalID': str(1 + j % 8)},
+        'ArrivalAirport': {'LocationCode': 'LAX', 'TerminalID': str(1 + i % 7)},
+        'MarketingAirline': {'Code': 'AA'},
+        'OperatingAirline': {'Code': 'AA', 'FlightNumber': 100 + i},
+        'Equipment': {'AirEquipType': '32B'},
+        'DepartureDateTime': depart.strftime('%Y-%m-%dT%H:%M:%S'),
+        'ArrivalDateTime': arrive.strftime('%Y-%m-%dT%H:%M:%S'),
+        'StopQuantity': 0,
+        'FlightNumber': 100 + i,
+        'ResBookDesigCode': 'Y',
+        'ElapsedTime': 335,
+        'MarriageGrp': 'O',
+        'DepartureTimeZone': {'GMTOffset': -5},
+        'ArrivalTimeZone': {'GMTOffset': -8},
+        'TPA_Extensions': {'eTicket': {'Ind': True}},
+    }
+
+
+def _itinerary(i):
+    fare = 200 + (i * 37) % 900
+    return {
+        'SequenceNumber': i + 1,
+        'AirItinerary': {
+            'DirectionInd': 'Return',
+            'OriginDestinationOptions': {
+                'OriginDestinationOption': [
+                    {'ElapsedTime': 335, 'FlightSegment': [_segment(i, j) for j in range(2)]},
+                    {'ElapsedTime': 350, 'FlightSegment': [_segment(i + 1, j) for j in range(2)]},
+                ]
+            }
+        },
+        'AirItineraryPricingInfo': {
+            'PTC_FareBreakdowns': {
+                'PTC_FareBreakdown': {
+                    'PassengerTypeQuantity': {'Quantity': 1, 'Code': 'ADT'},
+                    'FareBasisCodes': {'FareBasisCode': [
+                        {'BookingCode': 'Y', 'DepartureAirportCode': 'JFK',
+                         'ArrivalAirportCode': 'LAX', 'content': 'Y26'},
+                    ]},
+                    'PassengerFare': {
+                        'TotalFare': {'CurrencyCode': 'USD', 'DecimalPlaces': 2, 'Amount': fare},
+                        'BaseFare': {'CurrencyCode': 'USD', 'Amount': fare - 40},
+                        'Taxes': {'Tax': [{'TaxCode': 'US1', 'CurrencyCode': 'USD', 'Amount': 40}]},
+                    },
+                }
+            },
+            'FareInfos': {'FareInfo': [{'FareReference': 'Y', 'TPA_Extensions': {
+                'SeatsRemaining': {'BelowMin': False, 'Number': 9},
+                'Cabin': {'Cabin': 'Y'}}}]},
+            'TPA_Extensions': {'DivideInParty': {'Indicator': False}},
+            'ItinTotalFare': {
+                'FareConstruction': {'CurrencyCode': 'USD', 'DecimalPlaces': 2, 'Amount': fare - 40},
+                'TotalFare': {'CurrencyCode': 'USD', 'DecimalPlaces': 2, 'Amount': fare},
+                'Taxes': {'Tax': [{'TaxCode': 'TOTALTAX', 'CurrencyCode': 'USD', 'Amount': 40}]},
+                'BaseFare': {'CurrencyCode': 'USD', 'Amount': fare - 40},
+                'EquivFare': {'CurrencyCode': 'USD', 'DecimalPlaces': 2, 'Amount': fare - 40},
+            },
+        },
+        'TicketingInfo': {'TicketType': 'eTicket', 'ValidInterline': 'Yes'},
+        'TPA_Extensions': {'ValidatingCarrier': {'Code': 'AA'}, 'TagID': 'TAG%06d' % i},
+    }
+
+
+# instaflights_response
+# Int -> Dictionary
+# An InstaFlights Search response with n PricedItineraries
+def instaflights_response(n=500):
+    return {
+        'OriginLocation': 'JFK',
+        'DestinationLocation': 'LAX',
+        'DepartureDateTime': '2026-11-01T00:00:00',
+        'ReturnDateTime': '2026-11-08T00:00:00',
+        'PricedItineraries': [_itinerary(i) for i in range(n)],
+        'Links': [{'rel': 'self', 'href': 'https://api.test.sabre.com/v1/shop/flights'}],
+    }
+
+
+_SOAP_ENVELOPE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<soap-env:Envelope xmlns:soap-env="http://schemas.xmlsoap.org/soap/envelope/">'
+    '<soap-env:Header>'
+    '<eb:MessageHeader xmlns:eb="http://www.ebxml.org/namespaces/messageHeader" eb:version="1.0" soap-env:mustUnderstand="1">'
+    '<eb:From><eb:PartyId eb:type="URI">webservices.sabre.com</eb:PartyId></eb:From>'
+    '<eb:To><eb:PartyId eb:type="URI">agency</eb:PartyId></eb:To>'
+    '<eb:ConversationId>stub-conversation</eb:ConversationId>'
+    '<eb:Service eb:type="sabreXML">{service}</eb:Service><eb:Action>{action}</eb:Action>'
+    '<eb:MessageData><eb:MessageId>stub-message</eb:MessageId>'
+    '<eb:Timestamp>2026-10-18T10:00:00</eb:Timestamp></eb:MessageData>'
+    '</eb:MessageHeader>'
+    '<wsse:Security xmlns:wsse="http://schemas.xmlsoap.org/ws/2002/12/secext">'
+    '<wsse:BinarySecurityToken valueType="String" EncodingType="wsse:Base64Binary">'
+    'Shared/IDL:IceSess\\/SessMgr:1\\.0.IDL/Common/!ICESMS\\/STUB!ICESMSLB\\/STUB.LB!-0123456789</wsse:BinarySecurityToken>'
+    '</wsse:Security>'
+    '</soap-env:Header>'
+    '<soap-env:Body>{body}</soap-env:Body>'
+    '</soap-env:Envelope>'
+)
+
+
+def _xml_segment(i, j):
+    depart = datetime.datetime(2026, 11, 1, 6, 0) + datetime.timedelta(hours=i % 18, minutes=15 * j)
+    arrive = depart + datetime.timedelta(hours=2, minutes=35)
+    return (
+        '<FlightSegment DepartureDateTime="{depart}" ArrivalDateTime="{arrive}" StopQuantity="0" '
+        'FlightNumber="{flight}" ResBookDesigCode="Y" ElapsedTime="335">'
+        '<DepartureAirport LocationCode="JFK" TerminalID="{dterm}"/>'
+        '<ArrivalAirport LocationCode="LAX" TerminalID="{aterm}"/>'
+        '<OperatingAirline Code="AA" FlightNumber="{flight}"/>'
+        '<Equipment AirEquipType="32B"/>'
+        '<MarketingAirline Code="AA"/>'
+        '<MarriageGrp>O</MarriageGrp>'
+        '<DepartureTimeZone GMTOffset="-5"/><ArrivalTimeZone GMTOffset="-8"/>'
+        '<TPA_Extensions><eTicket Ind="true"/><Mileage Amount="2475"/></TPA_Extensions>'
+        '</FlightSegment>'
+    ).format(depart=depart.strftime('%Y-%m-%dT%H:%M:%S'),
+             arrive=arrive.strftime('%Y-%m-%dT%H:%M:%S'),
+             flight=100 + i, dterm=1 + j % 8, aterm=1 + i % 7)
+
+
+def _xml_itinerary(i):
+    fare = 200 + (i * 37) % 900
+    options = ''.join(
+        '<OriginDestinationOption ElapsedTime="%d">%s</OriginDestinationOption>'
+        % (335 + 15 * k, ''.join(_xml_segment(i + k, j) for j in range(2)))
+        for k in range(2))
+    return (
+        '<PricedItinerary SequenceNumber="{seq}">'
+        '<AirItinerary DirectionInd="Return"><OriginDestinationOptions>{options}</OriginDestinationOptions></AirItinerary>'
+        '<AirItineraryPricingInfo PricingSource="ADVJR1" PricingSubSource="MIP">'
+        '<ItinTotalFare>'
+        '<BaseFare Amount="{base}" CurrencyCode="USD" DecimalPlaces="2"/>'
+        '<FareConstruction Amount="{base}" CurrencyCode="USD" DecimalPlaces="2"/>'
+        '<EquivFare Amount="{base}" CurrencyCode="USD" DecimalPlaces="2"/>'
+        '<Taxes><Tax TaxCode="TOTALTAX" Amount="40.00" CurrencyCode="USD" DecimalPlaces="2"/></Taxes>'
+        '<TotalFare Amount="{fare}" CurrencyCode="USD" DecimalPlaces="2"/>'
+        '</ItinTotalFare>'
+        '<PTC_FareBreakdowns><PTC_FareBreakdown>'
+        '<PassengerTypeQuantity Code="ADT" Quantity="1"/>'
+        '<FareBasisCodes>'
+        '<FareBasisCode BookingCode="Y" DepartureAirportCode="JFK" ArrivalAirportCode="LAX">Y26</FareBasisCode>'
+        '<FareBasisCode BookingCode="Y" DepartureAirportCode="LAX" ArrivalAirportCode="JFK">Y26</FareBasisCode>'
+        '</FareBasisCodes>'
+        '<PassengerFare><BaseFare Amount="{base}" CurrencyCode="USD"/>'
+        '<Taxes><Tax TaxCode="US1" Amount="18.30" CurrencyCode="USD"/><Tax TaxCode="ZP" Amount="21.70" CurrencyCode="USD"/>'
+        '<TotalTax Amount="40.00" CurrencyCode="USD"/></Taxes>'
+        '<TotalFare Amount="{fare}" CurrencyCode="USD"/></PassengerFare>'
+        '</PTC_FareBreakdown></PTC_FareBreakdowns>'
+        '<FareInfos><FareInfo><FareReference>Y</FareReference><TPA_Extensions>'
+        '<SeatsRemaining Number="9" BelowMin="false"/><Cabin Cabin="Y"/>'
+        '</TPA_Extensions></FareInfo></FareInfos>'
+        '<TPA_Extensions><DivideInParty Indicator="false"/></TPA_Extensions>'
+        '</AirItineraryPricingInfo>'
+        '<TicketingInfo TicketType="eTicket" ValidInterline="Yes"/>'
+        '<TPA_Extensions><ValidatingCarrier Code="AA"/><TagID>TAG{seq:06d}</TagID></TPA_Extensions>'
+        '</PricedItinerary>'
+    ).format(seq=i + 1, options=options, base='%d.00' % (fare - 40), fare='%d.00' % fare)
+
+
+# bargain_finder_max_response
+# Int -> bytes
+# A BargainFinderMaxRQ SOAP response with n PricedItineraries
+def bargain_finder_max_response(n=500):
+    body = (
+        '<OTA_AirLowFareSearchRS xmlns="http://www.opentravel.org/OTA/2003/05" Version="1.9.2" PricedItinCount="{n}">'
+        '<Success/><Warnings><Warning Type="WORKERTHREAD" ShortText="TRAVELSKY"/></Warnings>'
+        '<PricedItineraries>{items}</PricedItineraries>'
+        '<TPA_Extensions><AirlineOrderList><AirlineOrder Code="AA" SequenceNumber="1"/></AirlineOrderList></TPA_Extensions>'
+        '</OTA_AirLowFareSearchRS>'
+    ).format(n=n, items=''.join(_xml_itinerary(i) for i in range(n)))
+    return _SOAP_ENVELOPE.format(service='BargainFinderMaxRQ', action='BargainFinderMaxRQ',
+                                 body=body).encode('utf-8')
+
+
+def _xml_hotel(i):
+    rate = 89 + (i * 13) % 400
+    amenities = ''.join('<Amenity Code="%s"/>' % code
+                        for code in ('FREE_WIFI', 'POOL', 'FITNESS', 'PARKING')[:1 + i % 4])
+    return (
+        '<AvailabilityOption RPH="{rph:03d}">'
+        '<BasicPropertyInfo AreaID="{area:03d}" ChainCode="{chain}" Distance="{dist}" GEO_ConfidenceLevel="3" '
+        'HotelCityCode="DFW" HotelCode="{code:07d}" HotelName="STUB HOTEL {code}" Latitude="32.{lat:06d}" '
+        'Longitude="-97.{lon:06d}" NumFloors="{floors}" RPH="{rph:03d}">'
+        '<Address><AddressLine>{code} MAIN STREET</AddressLine><AddressLine>DALLAS TX 75201</AddressLine>'
+        '<CountryCode>US</CountryCode></Address>'
+        '<ContactNumbers><ContactNumber Phone="1-214-555-{phone:04d}" Fax="1-214-555-{fax:04d}"/></ContactNumbers>'
+        '<DirectConnect><Alt_Avail Ind="false"/><DC_AvailParticipant Ind="true"/>'
+        '<DC_SellParticipant Ind="true"/><RatesExceedMax Ind="false"/><UnAvail Ind="false"/></DirectConnect>'
+        '<LocationDescription Code="C"><Text>DALLAS TX</Text></LocationDescription>'
+        '<Property Rating="{rating}"><Text>{rating} CROWN</Text></Property>'
+        '<PropertyOptionInfo>{amenities}</PropertyOptionInfo>'
+        '<RateRange CurrencyCode="USD" Max="{max}.00" Min="{rate}.00"/>'
+        '<RoomRate RateLevelCode="RAC"><AdditionalInfo><CancelPolicy Numeric="1" Option="D"/></AdditionalInfo></RoomRate>'
+        '<SpecialOffers Ind="false"/>'
+        '</BasicPropertyInfo>'
+        '</AvailabilityOption>'
+    ).format(rph=i % 1000, area=i % 900, chain=('HI', 'MC', 'HY', 'SI')[i % 4], dist='%.1f' % (i % 50 / 10.0),
+             code=1000 + i, lat=i * 7919 % 1000000, lon=i * 104729 % 1000000, floors=3 + i % 40,
+             phone=i % 10000, fax=(i * 3) % 10000, rating=1 + i % 5, amenities=amenities,
+             max=rate + 120, rate=rate)
+
+
+# hotel_availability_response
+# Int -> bytes
+# An OTA_HotelAvailLLSRQ SOAP response with n AvailabilityOptions
+def hotel_availability_response(n=500):
+    body = (
+        '<OTA_HotelAvailRS xmlns="http://webservices.sabre.com/sabreXML/2011/10" '
+        'xmlns:stl="http://services.sabre.com/STL/v01" Version="2.3.0">'
+        '<stl:ApplicationResults status="Complete">'
+        '<stl:Success timeStamp="2026-10-18T10:00:00-05:00"/></stl:ApplicationResults>'
+        '<AdditionalAvail Ind="true"/>'
+        '<AvailabilityOptions>{items}</AvailabilityOptions>'
+        '</OTA_HotelAvailRS>'
+    ).format(items=''.join(_xml_hotel(i) for i in range(n)))
+    return _SOAP_ENVELOPE.format(service='OTA_HotelAvailLLSRQ', action='OTA_HotelAvailLLSRQ',
+                                 body=body).encode('utf-8')
+
+
+# lead_price_response
+# Int -> Dictionary
+# A Lead Price (/v2/shop/flights/fares) response with n FareInfo entries
+def lead_price_response(n=60):
+    start = datetime.datetime(2026, 11, 1)
+    fares = []
+    for i in range(n):
+        depart = start + datetime.timedelta(days=i)
+        fare = 150 + (i * 53) % 700
+        fares.append({
+            'CurrencyCode': 'USD',
+            'LowestFare': {'AirlineCodes': ['AA', 'DL'][:1 + i % 2], 'Fare': fare},
+            'LowestNonStopFare': {'AirlineCodes': ['AA'], 'Fare': fare + 45},
+            'DepartureDateTime': depart.strftime('%Y-%m-%dT%H:%M:%S'),
+            'ReturnDateTime': (depart + datetime.timedelta(days=7)).strftime('%Y-%m-%dT%H:%M:%S'),
+            'Links': [{'rel': 'shop', 'href': 'https://api.test.sabre.com/v1/shop/flights?origin=JFK'}],
+        })
+    return {
+        'OriginLocation': 'JFK',
+        'DestinationLocation': 'LAX',
+        'FareInfo': fares,
+        'Links': [{'rel': 'self', 'href': 'https://api.test.sabre.com/v2/shop/flights/fares'}],
+    }
+
+
+# soap_response
+# String -> String -> String -> bytes
+# A small SOAP response for action, e.g. SessionCreateRQ: the envelope
+# carries the BinarySecurityToken that Session.create_session reads
+def soap_response(action, service=None, body=''):
+    if not body:
+        body = '<%sRS xmlns="http://www.opentravel.org/OTA/2002/11" status="Approved"/>' % action[:-2]
+    return _SOAP_ENVELOPE.format(service=service or action, action=action, body=body).encode('utf-8')
@@ -0,0 +1,148 @@
+import gzip
+import json
+import random
+import re
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+TOKEN_RESPONSE = {
+    'access_token': 'T1RLAQ-stub-token',
+    'token_type': 'bearer',
+    'expires_in': 604800
+}
+
+
+# Path the stub answers SOAP calls on; point WSDL_URL at stub.url + SOAP_PATH
+SOAP_PATH = '/websvc'
+
+_SOAP_ACTION = re.compile(br'<(?:\w+:)?Action>\s*([\w.]+)\s*</(?:\w+:)?Action>')
+
+
+class _ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so that clients can keep the connection alive
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request_body = self.rfile.read(length) if length else b''
+
+        stub = self.server.stub
+        with stub.lock:
+            stub.count += 1
+        latency = stub.latency + (random.uniform(0, stub.jitter) if stub.jitter else 0)
+        if latency:
+            time.sleep(latency)
+
+        path = self.path.split('?', 1)[0]
+        headers = {}
+        if path.startswith('/v2/auth/token'):
+            status, content_type, body = 200, 'application/json', json.dumps(TOKEN_RESPONSE).encode('utf-8')
+        else:
+            reply = stub.route(self.command, path, request_body)
+            status, content_type, body = reply[:3]
+            if len(reply) > 3:
+                headers = reply[3]
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+    do_PUT = _reply
+    do_DELETE = _reply
+
+
+# StubServer
+# A local stand-in for api.sabre.com. Serves an OAuth token on
+# /v2/auth/token/, the JSON in `routes` for the paths it lists (longest
+# prefix wins) and `body` (JSON) for every other path. SOAP envelopes
+# posted to SOAP_PATH are answered with `soap[Action]` (XML bytes),
+# gzipped with Content-Encoding: gzip like Sabre does when gzip_soap is
+# set. Every reply waits `latency` seconds plus up to `jitter` more.
+#    with StubServer(routes={'/v1/shop/flights': {...}}) as stub:
+#        client.host = stub.url
+class StubServer(object):
+    def __init__(self, body=None, latency=0, host='127.0.0.1', port=0, routes=None, soap=None,
+                 gzip_soap=True, jitter=0):
+        self.body = json.dumps(body if body is not None else {'status': 'ok'}).encode('utf-8')
+        self.latency = latency
+        self.jitter = jitter
+        self.count = 0
+        self.lock = threading.Lock()
+
+        # Bodies are encoded (and compressed) once, not per request
+        self.routes = sorted(((path.rstrip('/'), json.dumps(value).encode('utf-8'))
+                              for path, value in (routes or {}).items()),
+                             key=lambda route: -len(route[0]))
+        self.gzip_soap = gzip_soap
+        self.soap = dict((action, gzip.compress(xml, 6) if gzip_soap else xml)
+                         for action, xml in (soap or {}).items())
+
+        self.httpd = _ThreadingServer((host, port), _StubHandler)
+        self.httpd.stub = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    @property
+    def soap_url(self):
+        return self.url + SOAP_PATH
+
+    # route
+    # String -> String -> bytes -> (Int, String, bytes[, Dictionary])
+    # Returns status, content type, body and extra headers for a request
+    def route(self, method, path, body=b''):
+        if path.rstrip('/') == SOAP_PATH and self.soap:
+            match = _SOAP_ACTION.search(body)
+            xml = self.soap.get(match.group(1).decode('ascii')) if match else None
+            if xml is None:
+                return 500, 'text/xml', b'<Fault>unknown action</Fault>'
+            headers = {'Content-Encoding': 'gzip'} if self.gzip_soap else {}
+            return 200, 'text/xml', xml, headers
+
+        for prefix, value in self.routes:
+            if path == prefix or path.startswith(prefix + '/'):
+                return 200, 'application/json', value
+        return 200, 'application/json', self.body
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,379 @@
+"""
+End-to-end benchmark suite: the client against the local Sabre stub
+(stub_server.py), which serves synthetic recorded-style REST JSON and
+gzipped SOAP responses with configurable latency and payload sizes.
+
+Scenarios:
+    auth              token flow (authenticate -> /v2/auth/token/)
+    instaflights      SabreDevStudio.instaflights
+    lead_price        SabreDevStudio.lead_price
+    bfm               get_service with a BargainFinderMaxRQ envelope
+    session_churn     lease a pool session and ping it, more threads than
+                      sessions (pool fill and close are timed too)
+    convert_keys      json.loads + sabre_utils.convert_keys of an
+                      InstaFlights body
+    process_response  json.loads + process_response, reading every fare
+    xmltodict         xmltodict.parse of a BFM response, default mode
+    xmltodict_fast    xmltodict.parse of a BFM response, fast mode
+
+Each scenario runs in its own process and reports throughput, latency
+percentiles per operation, peak RSS growth and the peak Python heap
+(tracemalloc, measured on a separate short pass so that tracing does not
+slow the timed one). Response cache, single flight and rate limits are
+off so that every operation reaches the stub. The SOAP envelopes the
+client prints are discarded.
+
+    python -m sabre.benchmarks.suite [--only bfm,auth] [--requests N] [--threads N]
+        [--latency S] [--jitter S] [--itineraries N] [--fares N] [--sessions N]
+        [--output results.json] [--compare previous.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+from sabre.benchmarks import setup_django
+
+# Set before the client is imported: Session builds its client, with the
+# configured rate limiter and single flight, at import time
+setup_django(SABRE={
+    'TEST': True,
+    'WSDL_URL': 'http://127.0.0.1:0/',
+    'RESPONSE_CACHE_BACKEND': None,
+    'SINGLE_FLIGHT_BACKEND': None,
+    'RATE_LIMIT_BACKEND': None,
+})
+
+from sabre import xmltodict
+from sabre.benchmarks import fixtures
+from sabre.benchmarks.stub_server import StubServer
+from sabre.sabre_dev_studio import sabre_configs, sabre_utils
+from sabre.sabre_dev_studio.sabre_metrics import Histogram
+
+
+SCENARIOS = ('auth', 'instaflights', 'lead_price', 'bfm', 'session_churn',
+             'convert_keys', 'process_response', 'xmltodict', 'xmltodict_fast')
+
+INSTAFLIGHTS_OPTIONS = {'origin': 'JFK', 'destination': 'LAX',
+                        'departuredate': '2026-11-01', 'returndate': '2026-11-08'}
+
+BFM_VALUES = {'origin': 'JFK', 'destination': 'LAX',
+              'date_departure': '2026-11-01T00:00:00', 'date_arrival': '2026-11-08T00:00:00'}
+
+
+def max_rss():
+    # kilobytes on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+# run_ops
+# (() -> a) -> Int -> Int -> Dictionary
+# Calls op `count` times spread over `threads` threads and summarizes
+# throughput and per-call latency
+def run_ops(op, count, threads):
+    threads = max(1, min(threads, count))
+    histograms = [Histogram() for _ in range(threads)]
+    errors = []
+
+    def worker(histogram, n):
+        for _ in range(n):
+            start = time.perf_counter()
+            try:
+                op()
+            except Exception as e:
+                errors.append(repr(e))
+            histogram.record(time.perf_counter() - start)
+
+    shares = [count // threads + (1 if i < count % threads else 0) for i in range(threads)]
+    workers = [threading.Thread(target=worker, args=(histograms[i], shares[i])) for i in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    total = Histogram()
+    for histogram in histograms:
+        total.merge(histogram)
+    summary = total.summary()
+    result = {
+        'ops': count,
+        'threads': threads,
+        'seconds': elapsed,
+        'throughput': count / elapsed,
+        'errors': len(errors),
+    }
+    for key in ('p50', 'p90', 'p99', 'p999', 'max'):
+        result[key] = summary[key]
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+
+def peak_heap(op, count):
+    tracemalloc.start()
+    try:
+        for _ in range(count):
+            op()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def make_client(stub):
+    from sabre.sabre_dev_studio.sabre_dev_studio import SabreDevStudio
+
+    client = SabreDevStudio()
+    client.host = stub.url
+    client.token = 'stub'
+    return client
+
+
+# Scenario setups: each takes the parsed arguments and returns the
+# operation to time, a teardown and a dict of extra measurements. Stub
+# servers are started here and stopped by the teardown.
+
+def setup_auth(args):
+    stub = StubServer(latency=args.latency, jitter=args.jitter).start()
+    client = make_client(stub)
+    client.set_credentials('stub-client', 'stub-secret')
+    return client.authenticate, stub.stop, {}
+
+
+def setup_instaflights(args):
+    stub = StubServer(latency=args.latency, jitter=args.jitter, routes={
+        sabre_configs.sabre_endpoints['instaflights']: fixtures.instaflights_response(args.itineraries),
+    }).start()
+    client = make_client(stub)
+    return lambda: client.instaflights(INSTAFLIGHTS_OPTIONS), stub.stop, {}
+
+
+def setup_lead_price(args):
+    stub = StubServer(latency=args.latency, jitter=args.jitter, routes={
+        sabre_configs.sabre_endpoints['lead_price']: fixtures.lead_price_response(args.fares),
+    }).start()
+    client = make_client(stub)
+    departure = datetime.date(2026, 11, 1)
+    return (lambda: client.lead_price('JFK', 'LAX', [5, 7], point_of_sale='US', departure_date=departure),
+            stub.stop, {})
+
+
+def setup_bfm(args):
+    stub = StubServer(latency=args.latency, jitter=args.jitter, soap={
+        'BargainFinderMaxRQ': fixtures.bargain_finder_max_response(args.itineraries),
+    }).start()
+    sabre_configs.configurations['WSDL_URL'] = stub.soap_url
+    client = make_client(stub)
+
+    def op():
+        values = dict(BFM_VALUES, Action='BargainFinderMaxRQ', Service='BargainFinderMaxRQ',
+                      BinarySecurityToken='stub')
+        return client.get_service(values)
+
+    return op, stub.stop, {}
+
+
+def setup_session_churn(args):
+    stub = StubServer(latency=args.latency, jitter=args.jitter, soap={
+        'SessionCreateRQ': fixtures.soap_response('SessionCreateRQ', 'Session'),
+        'SessionCloseRQ': fixtures.soap_response('SessionCloseRQ', 'Session'),
+        'OTA_PingRQ': fixtures.soap_response('OTA_PingRQ'),
+    }).start()
+    sabre_configs.configurations['WSDL_URL'] = stub.soap_url
+
+    from sabre.sabre_dev_studio.sabre_dev_studio import Session
+
+    extra = {}
+    start = time.perf_counter()
+    Session.create_session_pool(args.sessions)
+    extra['fill_seconds'] = time.perf_counter() - start
+    pool = Session.pool()
+    extra['sessions'] = pool.size()
+
+    def op():
+        with pool.lease() as lease:
+            Session.ping_session(lease.token)
+
+    def teardown():
+        stats = pool.stats()
+        extra['pool_size_after'] = stats['size']
+        extra['checkout_wait_p99'] = stats['wait_p99']
+        start = time.perf_counter()
+        Session.close_session_pool()
+        extra['close_seconds'] = time.perf_counter() - start
+        stub.stop()
+
+    return op, teardown, extra
+
+
+def setup_convert_keys(args):
+    raw = json.dumps(fixtures.instaflights_response(args.itineraries))
+    return lambda: sabre_utils.convert_keys(json.loads(raw)), None, {'payload_bytes': len(raw)}
+
+
+def setup_process_response(args):
+    from sabre.sabre_dev_studio.sabre_dev_studio import SabreDevStudio
+
+    client = SabreDevStudio()
+    raw = json.dumps(fixtures.instaflights_response(args.itineraries))
+
+    def op():
+        resp = client.process_response(json.loads(raw))
+        return [itinerary.air_itinerary_pricing_info.ptc_fare_breakdowns.ptc_fare_breakdown
+                .passenger_fare.total_fare.amount for itinerary in resp.priced_itineraries]
+
+    return op, None, {'payload_bytes': len(raw)}
+
+
+def setup_xmltodict(args, fast=False):
+    raw = fixtures.bargain_finder_max_response(args.itineraries)
+    return lambda: xmltodict.parse(raw, attr_prefix='_', fast=fast), None, {'payload_bytes': len(raw)}
+
+
+SETUPS = {
+    'auth': setup_auth,
+    'instaflights': setup_instaflights,
+    'lead_price': setup_lead_price,
+    'bfm': setup_bfm,
+    'session_churn': setup_session_churn,
+    'convert_keys': setup_convert_keys,
+    'process_response': setup_process_response,
+    'xmltodict': setup_xmltodict,
+    'xmltodict_fast': lambda args: setup_xmltodict(args, fast=True),
+}
+
+# In-process scenarios are CPU bound: more threads only add GIL contention
+SINGLE_THREADED = ('convert_keys', 'process_response', 'xmltodict', 'xmltodict_fast')
+
+
+# run_scenario
+# String -> Namespace -> Dictionary
+# Runs in the child process
+def run_scenario(name, args):
+    before = max_rss()
+    op, teardown, extra = SETUPS[name](args)
+    try:
+        # Warm up connections, caches and compiled templates
+        for _ in range(min(3, args.requests)):
+            op()
+        threads = 1 if name in SINGLE_THREADED else args.threads
+        result = run_ops(op, args.requests, threads)
+        result['peak_rss'] = max_rss() - before
+        result['peak_heap'] = peak_heap(op, min(args.traced, args.requests))
+    finally:
+        if teardown is not None:
+            teardown()
+    result.update(extra)
+    return result
+
+
+def run_child(name, args):
+    out = subprocess.check_output([sys.executable, '-m', 'sabre.benchmarks.suite',
+                                   '--child', name, '--child-args', json.dumps(vars(args))])
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+
+def git_revision():
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=here,
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ms(seconds):
+    return seconds * 1e3 if seconds is not None else float('nan')
+
+
+def report(results, previous=None):
+    print('%-17s %10s %9s %9s %9s %10s %10s' % ('scenario', 'ops/s', 'p50 ms', 'p90 ms', 'p99 ms',
+                                                'RSS MB', 'heap MB'))
+    for name, result in results.items():
+        line = '%-17s %10.1f %9.2f %9.2f %9.2f %10.1f %10.1f' % (
+            name, result['throughput'], ms(result['p50']), ms(result['p90']), ms(result['p99']),
+            result['peak_rss'] / 1e6, result['peak_heap'] / 1e6)
+        old = (previous or {}).get(name)
+        if old:
+            line += '   %5.2fx ops/s %5.2fx p99' % (result['throughput'] / old['throughput'],
+                                                    (old['p99'] or 0) / (result['p99'] or 1))
+        if result.get('errors'):
+            line += '   %d errors (%s)' % (result['errors'], result.get('first_error'))
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help='comma separated scenarios (default: all)')
+    parser.add_argument('--requests', type=int, default=200, help='operations per scenario')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.0, help='stub latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random stub latency, up to S')
+    parser.add_argument('--itineraries', type=int, default=200, help='itineraries per shop response')
+    parser.add_argument('--fares', type=int, default=60, help='FareInfo entries per lead price response')
+    parser.add_argument('--sessions', type=int, default=2, help='SOAP sessions in the pool')
+    parser.add_argument('--traced', type=int, default=5, help='operations traced for the peak heap')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument('--child-args', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args = argparse.Namespace(**json.loads(args.child_args))
+        stdout = sys.stdout
+        # render_service and get_token_data print; keep the JSON line clean
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            result = run_scenario(args.child_name, args)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        print(json.dumps(result))
+        return
+
+    names = args.only.split(',') if args.only else list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error('unknown scenarios: %s' % ', '.join(sorted(unknown)))
+
+    results = {}
+    for name in names:
+        args.child_name = name
+        results[name] = run_child(name, args)
+    del args.child_name
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f).get('results')
+    report(results, previous)
+
+    if args.output:
+        document = {
+            'meta': {
+                'time': datetime.datetime.now().isoformat(),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'args': dict((k, v) for k, v in vars(args).items()
+                             if k not in ('output', 'compare', 'child', 'child_args')),
+            },
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+        print('results written to %s' % args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,542 @@
+import asyncio
+import collections
+import functools
+import json
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from sabre.sabre_dev_studio import sabre_configs, sabre_exceptions, sabre_concurrency, sabre_metrics, \
+    sabre_utils
+from sabre.sabre_dev_studio.sabre_cache import ResponseCache
+from sabre.sabre_dev_studio.sabre_configs import sabre_endpoints
+from sabre.sabre_dev_studio.sabre_dev_studio import SabreDevStudio, Session
+from sabre.sabre_dev_studio.sabre_exceptions import UnsupportedMethodError
+from sabre.sabre_dev_studio.sabre_geo import geo_code_country
+
+
+# _AsyncResponse
+# The parts of requests.Response that verify_response relies on, built from
+# an already-read aiohttp response
+class _AsyncResponse(object):
+    def __init__(self, status, content, headers=None):
+        self.status_code = status
+        self.content = content
+        self.headers = headers if headers is not None else {}
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+# AsyncSabreDevStudio
+# asyncio version of SabreDevStudio. Every REST wrapper and the SOAP
+# services are coroutines; all of them share one aiohttp connection pool and
+# one token, so many Sabre calls can be in flight from a single worker:
+#
+#    async with AsyncSabreDevStudio() as sabre:
+#        sabre.set_credentials(client_id, client_secret)
+#        await sabre.authenticate()
+#        flights, fares = await asyncio.gather(sabre.instaflights(opts),
+#                                              sabre.lead_price('JFK', 'LAX', 3))
+#
+# Query building and response checks are inherited from SabreDevStudio, as
+# are the rate limiter, circuit breakers, single flight, response cache and
+# instrumentation, applied as in the sync client. Hedging and streamed
+# responses are sync only.
+class AsyncSabreDevStudio(SabreDevStudio):
+    def __init__(self, environment='test', return_obj=True, limit=None,
+                 limit_per_host=None):
+        if aiohttp is None:
+            raise ImportError('AsyncSabreDevStudio requires aiohttp')
+
+        super(AsyncSabreDevStudio, self).__init__(environment, return_obj)
+
+        configs = sabre_configs.configurations
+        self.limit = configs.get('ASYNC_POOL_LIMIT') if limit is None else limit
+        self.limit_per_host = configs.get('ASYNC_POOL_LIMIT_PER_HOST') \
+            if limit_per_host is None else limit_per_host
+        self.timeout = aiohttp.ClientTimeout(sock_connect=configs.get('HTTP_CONNECT_TIMEOUT'),
+                                             sock_read=configs.get('HTTP_READ_TIMEOUT'))
+
+        self.session = None
+        self.auth_lock = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # get_session
+    # () -> aiohttp.ClientSession
+    # The shared connection pool, created on first use inside the running loop
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit,
+                                             limit_per_host=self.limit_per_host)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=self.timeout)
+        return self.session
+
+    # close
+    # () -> ()
+    # Closes the connection pool
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    # send
+    # String -> String -> Dictionary? -> Dictionary? -> Object? -> _AsyncResponse
+    # Sends one HTTP request through the shared pool and reads the body.
+    # Reports server_wait (connecting included: aiohttp does not tell them
+    # apart), download and bytes to the call being measured, if any
+    async def send(self, method, url, headers=None, params=None, data=None):
+        if params:
+            # aiohttp rejects None and non-string query values
+            params = dict((k, str(v)) for k, v in params.items() if v is not None)
+
+        call = sabre_metrics.current()
+        start = time.time()
+        async with self.get_session().request(method, url, headers=headers,
+                                              params=params, data=data) as resp:
+            headers_at = time.time()
+            content = await resp.read()
+            if call is not None:
+                call.add('server_wait', headers_at - start)
+                call.add('download', time.time() - headers_at)
+                call.bytes_in += len(content)
+                call.bytes_out += len(str(resp.url)) + (len(data) if isinstance(data, (str, bytes)) else 0)
+            return _AsyncResponse(resp.status, content, resp.headers.copy())
+
+    # init_with_config
+    # () -> ()
+    # Initializes the client with an ID and secret from a config file
+    async def init_with_config(self, config_file='config.json'):
+        with open(config_file) as f:
+            data = json.loads(f.read())
+
+        self.set_credentials(data['sabre_client_id'], data['sabre_client_secret'])
+        await self.authenticate()
+
+    # authenticate
+    # () -> ()
+    # Requests a token with the credentials given in set_credentials, unless
+    # another worker has published a new one for them
+    async def authenticate(self):
+        if not self.client_id or not self.client_secret:
+            raise sabre_exceptions.NoCredentialsProvided
+
+        manager = self.token_manager
+        self.bind_token_cache()
+        if manager.adopt(stale=manager.token) and not manager.expiring():
+            return
+
+        with self.instrumentation.call('authenticate', 'token'):
+            token_resp = await self.get_token_data(self.client_id, self.client_secret)
+            self.verify_response(token_resp)
+
+            with sabre_metrics.phase('parse'):
+                token_json = token_resp.json()
+        self.token_manager.store(token_json.get('access_token'), token_json.get('expires_in'))
+
+    async def get_token_data(self, client_id, client_secret):
+        b64_client_id = self.stringToBase64(client_id)
+        b64_client_secret = self.stringToBase64(client_secret)
+
+        encoded = str(b64_client_id) + ':' + str(b64_client_secret)
+        encoded = self.stringToBase64(encoded)
+
+        encoded = 'VmpFNmJXUXpielZ6ZG00NWRHTnVPR3hsZGpwRVJWWkRSVTVVUlZJNlJWaFU6VkZKdU5URmhWMmM9'
+        headers = {
+            'Authorization' : 'Basic ' + encoded,
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+
+        payload = {
+            'grant_type': 'client_credentials'
+        }
+
+        return await self.send('POST',
+                               self.make_endpoint('/v2/auth/token/'),
+                               headers=headers,
+                               data=payload)
+
+    # refresh_token
+    # String? -> String
+    # Re-authenticates once however many coroutines ask at the same time.
+    # stale is a token the server rejected; see TokenManager.refresh
+    async def refresh_token(self, stale=None):
+        if self.auth_lock is None:
+            self.auth_lock = asyncio.Lock()
+
+        manager = self.token_manager
+        async with self.auth_lock:
+            if stale is not None and manager.token != stale and not manager.expired():
+                return manager.token
+            if stale is None and manager.token and not manager.expiring():
+                return manager.token
+            if manager.adopt(stale) and not manager.expiring():
+                return manager.token
+
+            await self.authenticate()
+            return manager.token
+
+    # get_token
+    # () -> String?
+    # Returns a usable token: refreshes in a background task inside the
+    # skew window and waits only once the token has actually expired
+    async def get_token(self):
+        manager = self.token_manager
+        if not manager.token:
+            manager.adopt()
+
+        if manager.token and manager.expired():
+            await self.refresh_token()
+        elif manager.token and manager.expiring() and not (self.auth_lock and self.auth_lock.locked()):
+            asyncio.ensure_future(self.refresh_token())
+
+        return manager.token
+
+    # request
+    # String -> String -> Dictionary? -> Dictionary? -> (ResponseData or dict)
+    # The generic request coroutine -- all async API requests go through here.
+    # As in SabreDevStudio.request, identical GETs in flight are coalesced
+    # and the endpoints listed in sabre_endpoints['cache_ttl'] are served
+    # from the response cache
+    async def request(self, method, endpoint, payload=None, additional_headers=None):
+        with self.instrumentation.call('request', sabre_utils.endpoint_name(endpoint) or endpoint,
+                                       method=method):
+            return await self.request_once(method, endpoint, payload, additional_headers)
+
+    async def request_once(self, method, endpoint, payload=None, additional_headers=None):
+        fetch = lambda: self.fetch_response(method, endpoint, payload, additional_headers)
+        key = None
+
+        if self.single_flight and method == 'GET':
+            # Identical GETs in flight share one call to Sabre
+            key = ResponseCache.make_key(method, self.make_endpoint(endpoint), payload)
+            fetch = functools.partial(self.single_flight.do_async, key, fetch)
+
+        policy = self.response_cache.policy(endpoint) if self.response_cache else None
+        if policy:
+            key = key or ResponseCache.make_key(method, self.make_endpoint(endpoint), payload)
+            resp_data = await self.response_cache.get_or_fetch_async(key, policy, fetch)
+        else:
+            resp_data = await fetch()
+
+        if self.return_obj:
+            with sabre_metrics.phase('convert_keys'):
+                return self.process_response(resp_data)
+        return resp_data
+
+    # fetch_response
+    # String -> String -> Dictionary? -> Dictionary? -> dict
+    # Performs the request against Sabre, bypassing the response cache
+    # Returns the parsed JSON body
+    async def fetch_response(self, method, endpoint, payload=None, additional_headers=None):
+        token = await self.get_token()
+        if not token:
+            raise sabre_exceptions.NotAuthorizedError
+
+        circuit = sabre_utils.endpoint_name(endpoint) or endpoint
+        family = sabre_utils.endpoint_family(endpoint)
+        endpoint = self.make_endpoint(endpoint)
+
+        try:
+            resp = await self.guarded(circuit, family, lambda: self.send_request(method, endpoint, token, payload,
+                                                                                 additional_headers))
+        except sabre_exceptions.SabreErrorUnauthenticated:
+            # Token revoked or expired early: refresh once and replay
+            if not self.client_id or not self.client_secret:
+                raise
+            token = await self.refresh_token(stale=token)
+            resp = await self.guarded(circuit, family, lambda: self.send_request(method, endpoint, token, payload,
+                                                                                 additional_headers))
+
+        with sabre_metrics.phase('parse'):
+            return resp.json()
+
+    # limited
+    # String -> (() -> Awaitable of a) -> a
+    # Runs a call to Sabre under the rate limit of its endpoint family,
+    # retrying 429/503/504 responses with backoff (see RateLimiter.call_async)
+    async def limited(self, family, fn):
+        if self.rate_limiter is None:
+            return await fn()
+        return await self.rate_limiter.call_async(family, fn)
+
+    # guarded
+    # String -> String -> (() -> Awaitable of a) -> a
+    # limited, with each attempt behind the circuit breaker of an endpoint
+    # name or SOAP Action, see SabreDevStudio.guarded
+    async def guarded(self, circuit, family, fn):
+        if self.breakers is None:
+            return await self.limited(family, fn)
+        breaker = self.breakers.get(circuit)
+        return await self.limited(family, lambda: breaker.call_async(fn))
+
+    async def send_request(self, method, endpoint, token, payload=None, additional_headers=None):
+        headers = additional_headers.copy() if additional_headers else {}
+        headers['Authorization'] = 'Bearer ' + token
+
+        if method == 'GET':
+            resp = await self.send('GET', endpoint, headers=headers, params=payload)
+        elif method in ('PUT', 'PATCH'):
+            resp = await self.send('PUT', endpoint, headers=headers, data=payload)
+        elif method == 'POST':
+            resp = await self.send('POST', endpoint, headers=headers, data=payload)
+        elif method == 'DELETE':
+            resp = await self.send('DELETE', endpoint, headers=headers)
+        else:
+            raise UnsupportedMethodError
+
+        self.verify_response(resp)
+        return resp
+
+    # SOAP APIs Handler
+    async def get_service(self, params=None, projection=None):
+        with self.instrumentation.call('get_service', params.get("Action")):
+            tpl = self.render_service(params)
+            result = await self.post_service(params["Action"], tpl)
+            return self.parse_service(result.content, projection)
+
+    # post_service
+    # String -> String -> _AsyncResponse
+    # Posts a SOAP envelope under the 'soap' rate limit and the circuit
+    # breaker of its Action
+    async def post_service(self, action, tpl):
+        async def send():
+            result = await self.send('POST',
+                                     sabre_configs.configurations["WSDL_URL"],
+                                     headers={"Content-Type": "text/xml","Accept": "text/xml","Accept-Encoding":"gzip"},
+                                     data=tpl)
+            self.verify_service_status(result)
+            return result
+
+        return await self.guarded(action, 'soap', send)
+
+    # checkout_session
+    # () -> SessionLease
+    # Leases a SOAP session without blocking the event loop: waiting for a
+    # busy pool happens in the default executor
+    async def checkout_session(self):
+        pool = Session.pool()
+        lease = pool.try_checkout()
+        if lease is None:
+            lease = await asyncio.get_running_loop().run_in_executor(None, pool.checkout)
+        return lease
+
+    async def soap_services(self, template_values, action, service, projection=None):
+        async def call():
+            with await self.checkout_session() as lease:
+                values = dict(template_values)
+                values["BinarySecurityToken"] = lease.token
+                values["Action"] = action
+                values["Service"] = service
+                return await self.get_service(values, projection)
+
+        if self.single_flight and action in sabre_configs.configurations.get('SINGLE_FLIGHT_SOAP_ACTIONS', ()):
+            values = dict((k, v) for k, v in template_values.items() if k != "BinarySecurityToken")
+            key = ResponseCache.make_key(action, service, [values, projection])
+            return await self.single_flight.do_async(key, call)
+        return await call()
+
+    async def bargain_finder_max_RQ(self, template_values, projection=None):
+        return await self.soap_services(template_values, action='BargainFinderMaxRQ', service='BargainFinderMaxRQ',
+                                        projection=projection)
+
+    async def hotel_availability(self, template_values, projection=None):
+        return await self.soap_services(template_values, action='OTA_HotelAvailLLSRQ', service='OTA_HotelAvailLLSRQ',
+                                        projection=projection)
+
+    # Air Search
+    async def instaflights(self, options):
+        return await self.request('GET', sabre_endpoints['instaflights'], options)
+
+    async def tagid(self, tag_id):
+        return await self.request('GET', sabre_endpoints['tagid'] + tag_id)
+
+    async def flights_to(self, city_code, point_of_sale=None):
+        return await self.request('GET',
+                                  sabre_endpoints['flights_to'] + '/' + city_code,
+                                  {'pointofsalecountry': point_of_sale})
+
+    async def lead_price(self, origin, destination, length_of_stay,
+                         point_of_sale=None, departure_date=None, min_fare=None,
+                         max_fare=None, other_opts={}):
+        if not point_of_sale:
+            point_of_sale = await self.country_code_lookup(origin) or 'US'
+
+        opts = self.lead_price_params(origin, destination, length_of_stay,
+                                      point_of_sale, departure_date,
+                                      min_fare, max_fare, other_opts)
+        return await self.request('GET', sabre_endpoints['lead_price'], opts)
+
+    async def lead_price_opts(self, opts):
+        return await self.request('GET', sabre_endpoints['lead_price'], opts)
+
+    # lead_price_many
+    # [Dictionary or List] -> Int? -> AsyncGenerator of BatchResult
+    #    async for r in sabre.lead_price_many(queries, 20):
+    def lead_price_many(self, queries, max_concurrency=None):
+        return sabre_concurrency.fan_out_async(self.lead_price, queries, max_concurrency)
+
+    async def destination_finder(self, origin, destination=None, length_of_stay=None,
+                                 point_of_sale=None,
+                                 departure_date=None, return_date=None,
+                                 earliest_departure_date=None, latest_departure_date=None,
+                                 min_fare=None, max_fare=None,
+                                 region=None, theme=None, location=None,
+                                 cost_per_mile=None,
+                                 other_opts={}):
+        if not point_of_sale:
+            point_of_sale = await self.country_code_lookup(origin) or 'US'
+
+        opts = self.destination_finder_params(origin, point_of_sale, destination,
+                                              length_of_stay,
+                                              departure_date, return_date,
+                                              earliest_departure_date, latest_departure_date,
+                                              min_fare, max_fare,
+                                              region, theme, location,
+                                              cost_per_mile,
+                                              other_opts)
+        return await self.request('GET', sabre_endpoints['destination_finder'], opts)
+
+    async def destination_finder_opts(self, opts):
+        return await self.request('GET', sabre_endpoints['destination_finder'], opts)
+
+    def destination_finder_many(self, queries, max_concurrency=None):
+        return sabre_concurrency.fan_out_async(self.destination_finder, queries, max_concurrency)
+
+    # Air Intelligence
+    async def top_destinations(self, origin, destination_type=None,
+                               theme=None, num_results=20, destination_country=None,
+                               region=None, weeks=2):
+        opts = self.top_destinations_params(origin, destination_type, theme,
+                                            num_results, destination_country,
+                                            region, weeks)
+        return await self.request('GET', sabre_endpoints['top_destinations'], opts)
+
+    async def top_destinations_opts(self, opts):
+        return await self.request('GET', sabre_endpoints['top_destinations'], opts)
+
+    # Air Utility
+    async def country_code_lookup(self, code):
+        country = self.country_index.get(code)
+        if country is None:
+            country = await self.fetch_country_code(code)
+            if country:
+                self.country_index.update({code: country})
+        return country
+
+    async def fetch_country_code(self, code):
+        try:
+            resp = await self.request('POST',
+                                      sabre_endpoints['geo_code'],
+                                      self.geo_code_payload(code),
+                                      additional_headers={'Content-Type': 'application/json'})
+            return geo_code_country(resp['Results'][0])
+        except:
+            return None
+
+    async def alliance_lookup(self, alliance_code):
+        if alliance_code not in ['*A', '*O', '*S']:
+            return None
+        return await self.request('GET',
+                                  sabre_endpoints['alliance_lookup'],
+                                  { 'alliancecode': alliance_code })
+
+    async def equipment_lookup(self, aircraft_code):
+        resp = await self.request('GET',
+                                  sabre_endpoints['equipment_lookup'],
+                                  { 'aircraftcode': aircraft_code })
+        try:
+            return resp.aircraft_info[0].aircraft_name
+        except:
+            return None
+
+    async def multi_city_airport_lookup(self, country_code):
+        resp = await self.request('GET',
+                                  sabre_endpoints['multi_city_airport_lookup'],
+                                  { 'country': country_code })
+        return resp.cities if resp else None
+
+    async def countries_lookup(self, point_of_sale='US'):
+        return await self.request('GET',
+                                  sabre_endpoints['countries_lookup'],
+                                  { 'pointofsalecountry': point_of_sale })
+
+    async def city_pairs_lookup(self, endpoint, point_of_sale=None, origin_country=None,
+                                destination_country=None, origin_region=None,
+                                destination_region=None):
+        endpoint = self.city_pairs_endpoint(endpoint)
+        opts = self.city_pairs_params(point_of_sale, origin_country,
+                                      destination_country, origin_region,
+                                      destination_region)
+        return await self.request('GET', sabre_endpoints[endpoint], opts)
+
+    async def city_pairs_lookup_opts(self, endpoint, opts):
+        endpoint = self.city_pairs_endpoint(endpoint)
+        return await self.request('GET', sabre_endpoints[endpoint], opts)
+
+    # Hotel
+    async def get_hotel_list(self, options):
+        return await self.request('POST', sabre_endpoints['get_hotel_list'], options)
+
+    async def get_hotel_content(self, options):
+        return await self.request('POST', sabre_endpoints['get_hotel_content'], options)
+
+    async def get_hotel_image(self, options):
+        return await self.request('POST', sabre_endpoints['get_hotel_image'], options)
+
+    async def get_hotel_media(self, options):
+        return await self.request('POST', sabre_endpoints['get_hotel_media'], options)
+
+    # Cars
+    async def car_availability(self, options):
+        return await self.request('POST',
+                                  sabre_endpoints['car_availability'],
+                                  json.dumps(options, sort_keys=True),
+                                  additional_headers={'Content-Type': 'application/json'})
+
+    async def get_vehicle_media(self, options):
+        return await self.request('POST', sabre_endpoints['get_vehicle_media'], options)
+
+    # Utility
+    async def geo_autocomplete(self, options):
+        return await self.request('GET', sabre_endpoints['geo_autocomplete'], options)
+
+    async def geocode(self, options):
+        return await self.request(sabre_endpoints['geocode']['method'],
+                                  sabre_endpoints['geocode']['url'],
+                                  json.dumps(options, sort_keys=True),
+                                  additional_headers={'Content-Type': 'application/json'})
+
+    async def geocode_many(self, codes, chunk_size=None, max_concurrency=None):
+        codes = list(collections.OrderedDict.fromkeys(code.upper() for code in codes))
+        chunk_size = chunk_size or sabre_configs.configurations.get('GEOCODE_CHUNK_SIZE')
+        chunks = [codes[i:i + chunk_size] for i in range(0, len(codes), chunk_size)]
+
+        async def resolve(chunk):
+            resp = await self.geocode([self.geo_code_request(code) for code in chunk])
+            return resp['Results']
+
+        results = dict.fromkeys(codes)
+        async for batch in sabre_concurrency.fan_out_async(resolve, [(chunk,) for chunk in chunks],
+                                                           max_concurrency):
+            if batch.error is None:
+                results.update(zip(batch.query[0], batch.result))
+        return results
+
+    async def airline_lookup(self, airline_code):
+        return await self.request(sabre_endpoints['airline_lookup']['method'],
+                                  sabre_endpoints['airline_lookup']['url'],
+                                  { 'airlinecode': airline_code })
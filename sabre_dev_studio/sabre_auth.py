@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+
+from sabre.sabre_dev_studio import sabre_configs
+
+
+PREFIX_TOKEN = "sabre_token_"
+
+
+# TokenManager
+# Holds the OAuth token of a client and refreshes it ahead of expiry.
+#    fetch is a () -> (token, expires_in) callable that hits /v2/auth/token/
+#
+# - Inside the last refresh_skew seconds of a token's life, callers keep
+#   using the current token while one background thread fetches a new one.
+# - Once a token has expired, callers block on a lock so that exactly one
+#   thread fetches (single-flight); the others reuse its result.
+# - Tokens are published to the Django cache under cache_key, and a cache
+#   lock keeps other processes from refreshing at the same moment.
+class TokenManager(object):
+    def __init__(self, fetch, cache_key=None, refresh_skew=None, shared=None):
+        configs = sabre_configs.configurations
+
+        self.fetch = fetch
+        self.cache_key = cache_key
+        self.refresh_skew = configs.get('TOKEN_REFRESH_SKEW') if refresh_skew is None else refresh_skew
+        self.shared = configs.get('TOKEN_SHARED_CACHE') if shared is None else shared
+        self.lock_timeout = configs.get('TOKEN_LOCK_TIMEOUT')
+
+        self.token = None
+        self.expiry = None  # epoch seconds, None = never expires
+
+        self.lock = threading.Lock()
+        # Guards refreshing; self.lock is held for a whole refresh
+        self.refreshing_lock = threading.Lock()
+        self.refreshing = False
+
+    # make_cache_key
+    # String -> String -> String
+    # Cache key for the token of one client ID on one host
+    @staticmethod
+    def make_cache_key(client_id, host):
+        digest = hashlib.sha1((host + '|' + client_id).encode('utf-8')).hexdigest()
+        return PREFIX_TOKEN + digest
+
+    def expired(self, now=None):
+        return self.expiry is not None and (now or time.time()) >= self.expiry
+
+    def expiring(self, now=None):
+        return self.expiry is not None and (now or time.time()) >= self.expiry - self.refresh_skew
+
+    # store
+    # String -> Number? -> ()
+    # Sets the token (expires_in seconds from now) and publishes it
+    def store(self, token, expires_in=None):
+        self.token = token
+        self.expiry = time.time() + expires_in if expires_in is not None else None
+
+        if self.shared and self.cache_key and expires_in:
+            cache.set(self.cache_key, (self.token, self.expiry), int(expires_in))
+
+    # adopt
+    # String? -> Boolean
+    # Takes the token another process published, if it is usable and is
+    # not the one we are trying to replace
+    def adopt(self, stale=None):
+        if not (self.shared and self.cache_key):
+            return False
+
+        shared = cache.get(self.cache_key)
+        if not shared:
+            return False
+
+        token, expiry = shared
+        if token == stale or (expiry is not None and time.time() >= expiry):
+            return False
+
+        self.token, self.expiry = token, expiry
+        return True
+
+    # get_token
+    # () -> String?
+    # Returns a usable token, refreshing it first when needed
+    def get_token(self):
+        now = time.time()
+        if self.token and not self.expiring(now):
+            return self.token
+
+        if self.token and not self.expired(now):
+            # Still valid: refresh in the background, don't make the caller wait
+            self.refresh_in_background()
+            return self.token
+
+        if not self.token and not self.adopt():
+            return None
+
+        if self.expired():
+            self.refresh()
+        return self.token
+
+    # refresh
+    # String? -> String
+    # Fetches a new token, single-flight across threads and processes.
+    # stale is the token that was rejected (e.g. by a 401); if another
+    # caller has already replaced it, that token is returned as is.
+    def refresh(self, stale=None):
+        with self.lock:
+            if stale is not None:
+                if self.token and self.token != stale and not self.expired():
+                    return self.token
+            elif self.token and not self.expiring():
+                return self.token
+
+            if self.adopt(stale) and not self.expiring():
+                return self.token
+
+            return self._refresh_locked(stale)
+
+    def _refresh_locked(self, stale):
+        lock_key = None
+        if self.shared and self.cache_key:
+            lock_key = self.cache_key + '_lock'
+            if not cache.add(lock_key, 1, self.lock_timeout):
+                # Another process is refreshing: wait for it to publish
+                deadline = time.time() + self.lock_timeout
+                while time.time() < deadline:
+                    time.sleep(0.1)
+                    if self.adopt(stale):
+                        return self.token
+                lock_key = None
+
+        try:
+            token, expires_in = self.fetch()
+            self.store(token, expires_in)
+        finally:
+            if lock_key:
+                cache.delete(lock_key)
+
+        return self.token
+
+    # refresh_in_background
+    # () -> ()
+    # Starts one background refresh unless one is already running
+    def refresh_in_background(self):
+        with self.refreshing_lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception:
+                logging.exception("background token refresh failed")
+            finally:
+                self.refreshing = False
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
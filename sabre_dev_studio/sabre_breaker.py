@@ -0,0 +1,221 @@
+import asyncio
+import collections
+import logging
+import threading
+import time
+
+import requests
+
+from sabre.sabre_dev_studio import sabre_configs, sabre_exceptions
+from sabre.sabre_dev_studio.sabre_exceptions import CircuitOpenError
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Errors that count against an endpoint: it could not be reached or could
+# not answer. Client errors (4xx) and rate limiting say nothing about its
+# health.
+FAILURE_ERRORS = (requests.RequestException,
+                  sabre_exceptions.SabreInternalServerError,
+                  sabre_exceptions.SabreErrorServiceUnavailable,
+                  sabre_exceptions.SabreErrorGatewayTimeout)
+
+# The asyncio client's network errors count as well
+try:
+    import aiohttp
+    FAILURE_ERRORS += (aiohttp.ClientError, asyncio.TimeoutError)
+except ImportError:
+    pass
+
+
+# CircuitBreaker
+# Tracks the last `window` calls to one endpoint. Once at least min_calls
+# have been made, the circuit opens when failure_rate of them failed or
+# slow_call_rate of them took slow_call_seconds or more; calls then fail at
+# once with CircuitOpenError for open_seconds. After that the circuit is
+# half open: up to half_open_probes calls go through, and it closes again
+# if they all succeed (quickly), or reopens on the first bad one.
+class CircuitBreaker(object):
+    def __init__(self, name, window=None, min_calls=None, failure_rate=None, slow_call_seconds=None,
+                 slow_call_rate=None, open_seconds=None, half_open_probes=None):
+        configs = sabre_configs.configurations
+
+        def _opt(value, key):
+            return configs.get(key) if value is None else value
+
+        self.name = name
+        self.window = _opt(window, 'BREAKER_WINDOW')
+        self.min_calls = _opt(min_calls, 'BREAKER_MIN_CALLS')
+        self.failure_rate = _opt(failure_rate, 'BREAKER_FAILURE_RATE')
+        self.slow_call_seconds = _opt(slow_call_seconds, 'BREAKER_SLOW_CALL_SECONDS')
+        self.slow_call_rate = _opt(slow_call_rate, 'BREAKER_SLOW_CALL_RATE')
+        self.open_seconds = _opt(open_seconds, 'BREAKER_OPEN_SECONDS')
+        self.half_open_probes = _opt(half_open_probes, 'BREAKER_HALF_OPEN_PROBES')
+
+        self.state = CLOSED
+        self.opened_at = 0
+        self.probes = 0
+        self.probe_successes = 0
+        # (failed, slow) of the last calls
+        self.outcomes = collections.deque(maxlen=self.window)
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+
+    # before
+    # () -> ()
+    # Lets a call through, or raises CircuitOpenError
+    def before(self):
+        with self.lock:
+            if self.state == OPEN:
+                remaining = self.opened_at + self.open_seconds - time.time()
+                if remaining > 0:
+                    self.counters['rejected'] += 1
+                    raise CircuitOpenError(self.name, remaining)
+                self.state = HALF_OPEN
+                self.probes = 0
+                self.probe_successes = 0
+                logging.info("circuit %s: half open", self.name)
+
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_probes:
+                    self.counters['rejected'] += 1
+                    raise CircuitOpenError(self.name, 0)
+                self.probes += 1
+
+    # after
+    # Boolean -> Number -> ()
+    # Records the outcome of a call let through by before
+    def after(self, failed, seconds):
+        slow = seconds >= self.slow_call_seconds
+        with self.lock:
+            self.counters['failures' if failed else 'successes'] += 1
+            if slow:
+                self.counters['slow'] += 1
+
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self.trip()
+                else:
+                    self.probe_successes += 1
+                    if self.probe_successes >= self.half_open_probes:
+                        self.state = CLOSED
+                        self.outcomes.clear()
+                        logging.info("circuit %s: closed", self.name)
+                return
+
+            self.outcomes.append((failed, slow))
+            calls = len(self.outcomes)
+            if self.state == CLOSED and calls >= self.min_calls:
+                failures = sum(1 for f, s in self.outcomes if f)
+                slow_calls = sum(1 for f, s in self.outcomes if s)
+                if (failures >= self.failure_rate * calls
+                        or slow_calls >= self.slow_call_rate * calls):
+                    self.trip()
+
+    def trip(self):
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.counters['opened'] += 1
+        logging.warning("circuit %s: open for %ss", self.name, self.open_seconds)
+
+    # call
+    # (() -> a) -> a
+    def call(self, fn):
+        self.before()
+        start = time.time()
+        try:
+            result = fn()
+        except FAILURE_ERRORS:
+            self.after(True, time.time() - start)
+            raise
+        except Exception:
+            # Not the endpoint's fault; frees a half open probe all the same
+            self.after(False, 0)
+            raise
+        self.after(False, time.time() - start)
+        return result
+
+    # call_async
+    # (() -> Awaitable of a) -> a
+    async def call_async(self, fn):
+        self.before()
+        start = time.time()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # Says nothing about the endpoint: give a half open probe back
+            with self.lock:
+                if self.state == HALF_OPEN and self.probes:
+                    self.probes -= 1
+            raise
+        except FAILURE_ERRORS:
+            self.after(True, time.time() - start)
+            raise
+        except Exception:
+            self.after(False, 0)
+            raise
+        self.after(False, time.time() - start)
+        return result
+
+    # stats
+    # () -> Dictionary
+    def stats(self):
+        with self.lock:
+            stats = dict.fromkeys(['successes', 'failures', 'slow', 'rejected', 'opened'], 0)
+            stats.update(self.counters)
+            stats['state'] = self.state
+        return stats
+
+
+# CircuitBreakers
+# One CircuitBreaker per endpoint name (sabre_endpoints key) or SOAP
+# Action, created on first use with the BREAKER_* defaults, overridden per
+# name by BREAKERS
+class CircuitBreakers(object):
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, overrides=None):
+        self.overrides = sabre_configs.configurations.get('BREAKERS', {}) if overrides is None else overrides
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    # default
+    # () -> CircuitBreakers?
+    # The per-process breakers, None unless CIRCUIT_BREAKER is set
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    if not sabre_configs.configurations.get('CIRCUIT_BREAKER'):
+                        return None
+                    cls._default = cls()
+        return cls._default
+
+    # get
+    # String -> CircuitBreaker
+    def get(self, name):
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            with self.lock:
+                breaker = self.breakers.get(name)
+                if breaker is None:
+                    breaker = self.breakers[name] = CircuitBreaker(name, **self.overrides.get(name, {}))
+        return breaker
+
+    # call
+    # String -> (() -> a) -> a
+    def call(self, name, fn):
+        return self.get(name).call(fn)
+
+    # stats
+    # () -> Dictionary
+    # name -> CircuitBreaker.stats()
+    def stats(self):
+        with self.lock:
+            breakers = list(self.breakers.values())
+        return dict((breaker.name, breaker.stats()) for breaker in breakers)
@@ -0,0 +1,249 @@
+import asyncio
+import collections
+import contextvars
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from sabre.sabre_dev_studio import sabre_configs, sabre_utils
+from sabre.sabre_dev_studio.sabre_configs import sabre_endpoints
+
+
+PREFIX_RESPONSE = "sabre_response_"
+
+
+# LocalLRUBackend
+# In-process cache holding at most maxsize entries, least recently used
+# evicted first
+class LocalLRUBackend(object):
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, timeout):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# DjangoCacheBackend
+# Stores entries in a Django cache, shared by every process using it
+class DjangoCacheBackend(object):
+    def __init__(self, cache=None, prefix=PREFIX_RESPONSE):
+        if cache is None:
+            from django.core.cache import cache
+        self.cache = cache
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.cache.get(self.prefix + key)
+
+    def set(self, key, entry, timeout):
+        self.cache.set(self.prefix + key, entry, int(timeout) + 1)
+
+    def delete(self, key):
+        self.cache.delete(self.prefix + key)
+
+    def clear(self):
+        pass
+
+
+# ResponseCache
+# Caches responses of the endpoints listed in sabre_endpoints['cache_ttl'].
+# A cached response is served as is until its ttl runs out. During the
+# following stale window it is still served immediately while one
+# background thread fetches a fresh copy (stale-while-revalidate), so hot
+# keys never wait on Sabre. Cached data is shared: treat it as read-only.
+class ResponseCache(object):
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, backend, policies=None):
+        self.backend = backend
+        self.policies = sabre_endpoints.get('cache_ttl', {}) if policies is None else policies
+
+        self.lock = threading.Lock()
+        self.revalidating = set()
+        self.counters = collections.Counter()
+
+    # default
+    # () -> ResponseCache?
+    # The per-process cache configured by RESPONSE_CACHE_BACKEND
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    configs = sabre_configs.configurations
+                    backend = configs.get('RESPONSE_CACHE_BACKEND')
+                    if backend == 'local':
+                        cls._default = cls(LocalLRUBackend(configs.get('RESPONSE_CACHE_SIZE')))
+                    elif backend == 'django':
+                        cls._default = cls(DjangoCacheBackend())
+                    else:
+                        return None
+        return cls._default
+
+    # policy
+    # String -> Dictionary?
+    # The {'ttl': .., 'stale': ..} policy of a relative endpoint, if cached
+    def policy(self, endpoint):
+        name = sabre_utils.endpoint_name(endpoint)
+        return self.policies.get(name) if name else None
+
+    # make_key
+    # String -> String -> (Dictionary or String)? -> String
+    # Cache key for a request. Params are normalized (sorted, None dropped)
+    # so that equivalent requests share an entry.
+    @staticmethod
+    def make_key(method, url, payload=None):
+        if isinstance(payload, dict):
+            payload = sorted((str(k), str(v)) for k, v in payload.items() if v is not None)
+        raw = json.dumps([method, url, payload], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    # lookup
+    # String -> (String, a)
+    # ('fresh', value), ('stale', value) or ('miss', None) for key
+    def lookup(self, key):
+        entry = self.backend.get(key)
+        now = time.time()
+
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self.count('hits')
+                return 'fresh', value
+            if now < stale_until:
+                self.count('stale_hits')
+                return 'stale', value
+
+        self.count('misses')
+        return 'miss', None
+
+    # get_or_fetch
+    # String -> Dictionary -> (() -> a) -> a
+    # Returns the cached value for key, calling fetch on a miss
+    def get_or_fetch(self, key, policy, fetch):
+        state, value = self.lookup(key)
+        if state == 'stale':
+            self.revalidate(key, policy, fetch)
+        if state != 'miss':
+            return value
+        return self.fetch_and_store(key, policy, fetch)
+
+    # get_or_fetch_async
+    # String -> Dictionary -> (() -> Awaitable of a) -> a
+    # get_or_fetch for coroutines: stale entries are revalidated in a task
+    async def get_or_fetch_async(self, key, policy, fetch):
+        state, value = self.lookup(key)
+        if state == 'stale':
+            self.revalidate_async(key, policy, fetch)
+        if state != 'miss':
+            return value
+        return self.store(key, policy, await fetch())
+
+    def fetch_and_store(self, key, policy, fetch):
+        return self.store(key, policy, fetch())
+
+    # store
+    # String -> Dictionary -> a -> a
+    def store(self, key, policy, value):
+        now = time.time()
+        ttl = policy.get('ttl', 0)
+        stale = policy.get('stale', 0)
+        self.backend.set(key, (value, now + ttl, now + ttl + stale), ttl + stale)
+        return value
+
+    # revalidating_key
+    # String -> Boolean
+    # Marks key as being revalidated; False if it already was
+    def revalidating_key(self, key):
+        with self.lock:
+            if key in self.revalidating:
+                return False
+            self.revalidating.add(key)
+            return True
+
+    def revalidated(self, key, error=None):
+        if error is None:
+            self.count('revalidations')
+        else:
+            self.count('revalidation_errors')
+            logging.error("response cache revalidation failed", exc_info=error)
+        with self.lock:
+            self.revalidating.discard(key)
+
+    # revalidate
+    # Refreshes key in the background, at most once at a time per key
+    def revalidate(self, key, policy, fetch):
+        if not self.revalidating_key(key):
+            return
+
+        def run():
+            try:
+                self.fetch_and_store(key, policy, fetch)
+            except Exception as e:
+                self.revalidated(key, e)
+            else:
+                self.revalidated(key)
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    # revalidate_async
+    # revalidate in a task of the running event loop, started in an empty
+    # context so that it does not report to the caller's measured call
+    def revalidate_async(self, key, policy, fetch):
+        if not self.revalidating_key(key):
+            return
+
+        async def run():
+            try:
+                self.store(key, policy, await fetch())
+            except Exception as e:
+                self.revalidated(key, e)
+            else:
+                self.revalidated(key)
+
+        contextvars.Context().run(asyncio.ensure_future, run())
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    # stats
+    # () -> Dictionary
+    # hits, stale_hits, misses, revalidations and revalidation_errors
+    def stats(self):
+        stats = dict.fromkeys(['hits', 'stale_hits', 'misses',
+                               'revalidations', 'revalidation_errors'], 0)
+        with self.lock:
+            stats.update(self.counters)
+        return stats
+
+    def clear(self):
+        self.backend.clear()
+        self.counters.clear()
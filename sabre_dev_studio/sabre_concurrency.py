@@ -0,0 +1,143 @@
+import asyncio
+import collections
+import threading
+import weakref
+from concurrent import futures
+
+from sabre.sabre_dev_studio import sabre_configs
+
+
+# BatchResult
+# One finished query of a batch: the query as given, and either its result
+# or the exception it raised (never both)
+BatchResult = collections.namedtuple('BatchResult', ['query', 'result', 'error'])
+
+# Process-wide cap on batch calls in flight, shared by every batch and
+# every client so that concurrent batches together stay under Sabre's limits
+_global_limit = threading.BoundedSemaphore(
+    sabre_configs.configurations.get('MAX_CONCURRENT_REQUESTS'))
+
+# The same cap for fan_out_async, one semaphore per event loop (asyncio
+# primitives belong to a single loop)
+_global_async_limits = weakref.WeakKeyDictionary()
+_global_async_limits_lock = threading.Lock()
+
+
+# global_async_limit
+# () -> asyncio.Semaphore
+# The cap on batch calls in flight in the running loop, sized from
+# MAX_CONCURRENT_REQUESTS when the loop first runs a batch
+def global_async_limit():
+    loop = asyncio.get_running_loop()
+    limit = _global_async_limits.get(loop)
+    if limit is None:
+        with _global_async_limits_lock:
+            limit = _global_async_limits.get(loop)
+            if limit is None:
+                limit = _global_async_limits[loop] = asyncio.Semaphore(
+                    sabre_configs.configurations.get('MAX_CONCURRENT_REQUESTS'))
+    return limit
+
+
+# call_query
+# (... -> a) -> (Dictionary or List) -> a
+# Calls fn with a query given as keyword arguments (dict) or positional
+# arguments (list/tuple)
+def call_query(fn, query):
+    if isinstance(query, dict):
+        return fn(**query)
+    elif isinstance(query, (list, tuple)):
+        return fn(*query)
+    return fn(query)
+
+
+def _limited_call(fn, query):
+    with _global_limit:
+        return call_query(fn, query)
+
+
+# fan_out
+# (... -> a) -> [Query] -> Int? -> Generator of BatchResult
+# Runs fn for every query on a bounded thread pool and yields a BatchResult
+# as each one completes (not in input order). At most max_concurrency
+# queries of this batch run at once, and never more than
+# MAX_CONCURRENT_REQUESTS across the process. Errors are reported per query
+# and do not stop the batch. Closing the generator early cancels the
+# queries that have not started.
+def fan_out(fn, queries, max_concurrency=None):
+    if max_concurrency is None:
+        max_concurrency = sabre_configs.configurations.get('BATCH_MAX_CONCURRENCY')
+    max_concurrency = max(1, max_concurrency)
+
+    queries = iter(queries)
+    pool = futures.ThreadPoolExecutor(max_workers=max_concurrency)
+    pending = {}
+
+    def submit_next():
+        for query in queries:
+            pending[pool.submit(_limited_call, fn, query)] = query
+            return True
+        return False
+
+    try:
+        while len(pending) < max_concurrency and submit_next():
+            pass
+
+        while pending:
+            done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                query = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    yield BatchResult(query, future.result(), None)
+                else:
+                    yield BatchResult(query, None, error)
+                submit_next()
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+
+# fan_out_async
+# (... -> Coroutine a) -> [Query] -> Int? -> AsyncGenerator of BatchResult
+# asyncio version of fan_out for AsyncSabreDevStudio: at most
+# max_concurrency queries of the batch are awaited at once, and never more
+# than MAX_CONCURRENT_REQUESTS across the batches of the event loop.
+# Queries are read from the iterable as slots free up.
+async def fan_out_async(fn, queries, max_concurrency=None):
+    if max_concurrency is None:
+        max_concurrency = sabre_configs.configurations.get('BATCH_MAX_CONCURRENCY')
+    max_concurrency = max(1, max_concurrency)
+    limit = global_async_limit()
+
+    queries = iter(queries)
+    pending = {}
+
+    async def run(query):
+        async with limit:
+            return await call_query(fn, query)
+
+    def submit_next():
+        for query in queries:
+            pending[asyncio.ensure_future(run(query))] = query
+            return True
+        return False
+
+    try:
+        while len(pending) < max_concurrency and submit_next():
+            pass
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                query = pending.pop(task)
+                error = asyncio.CancelledError() if task.cancelled() else task.exception()
+                if error is None:
+                    yield BatchResult(query, task.result(), None)
+                else:
+                    yield BatchResult(query, None, error)
+                submit_next()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -53,15 +53,226 @@ sabre_endpoints = {
     'airline_lookup': {
         'method': 'GET',
         'url': '/v1/lists/utilities/airlines/'
+    },
+
+    # Response cache policy per endpoint, in seconds:
+    #    ttl   -- served from cache without asking Sabre
+    #    stale -- afterwards, still served while refreshed in the background
+    # Endpoints not listed here are never cached
+    'cache_ttl': {
+        'alliance_lookup': {'ttl': 86400, 'stale': 86400},
+        'equipment_lookup': {'ttl': 86400, 'stale': 86400},
+        'airline_lookup': {'ttl': 86400, 'stale': 86400},
+        'countries_lookup': {'ttl': 86400, 'stale': 86400},
+        'multi_city_airport_lookup': {'ttl': 86400, 'stale': 86400},
+        'city_pairs_shop_lookup': {'ttl': 21600, 'stale': 21600},
+        'city_pairs_historical_lookup': {'ttl': 21600, 'stale': 21600},
+        'city_pairs_forecast_lookup': {'ttl': 21600, 'stale': 21600},
+        'top_destinations': {'ttl': 3600, 'stale': 3600},
     }
 }
 
+# Named SOAP response projections (see sabre_utils.soap_projection). Paths
+# are relative to the response element in the SOAP Body; only the listed
+# elements (and their subtrees) are built when parsing.
+soap_projections = {
+    # BargainFinderMaxRQ: total fares, flight segments and validating carrier
+    'bfm_fare_display': (
+        'PricedItineraries/PricedItinerary/AirItinerary/OriginDestinationOptions/OriginDestinationOption/FlightSegment',
+        'PricedItineraries/PricedItinerary/AirItineraryPricingInfo/ItinTotalFare/TotalFare',
+        'PricedItineraries/PricedItinerary/TPA_Extensions/ValidatingCarrier',
+    ),
+    # OTA_HotelAvailLLSRQ: hotel identity, location and rate range
+    'hotel_rate_display': (
+        'AvailabilityOptions/AvailabilityOption/BasicPropertyInfo/Address',
+        'AvailabilityOptions/AvailabilityOption/BasicPropertyInfo/Property',
+        'AvailabilityOptions/AvailabilityOption/BasicPropertyInfo/RateRange',
+    ),
+}
+
 DEBUG = getattr(settings, 'DEBUG')
 sabre_endpoints['base'] = sabre_endpoints['base_test'] if DEBUG and SABRE_CONFIGS['TEST'] else sabre_endpoints['base_prod']
 
 # other configs
 configurations = {
+    # HTTP transport (connection pooling / keep-alive)
+    'HTTP_POOL_CONNECTIONS': 10,
+    'HTTP_POOL_MAXSIZE': 20,
+    'HTTP_POOL_BLOCK': False,
+    'HTTP_KEEP_ALIVE': True,
+    'HTTP_CONNECT_TIMEOUT': 5,
+    'HTTP_READ_TIMEOUT': 60,
+    'HTTP_MAX_RETRIES': 0,
+    'HTTP_RETRY_BACKOFF': 0.3,
+    'HTTP_RETRY_STATUSES': (502, 503, 504),
+
+    # Record / replay transport (sabre_replay), under every REST and SOAP
+    # call: 'record' saves each exchange with Sabre to REPLAY_FILE, 'replay'
+    # answers from that file without touching the network, None is off.
+    # REPLAY_LATENCY is added to each replayed call, in seconds, or
+    # 'recorded' for the latency seen while recording; REPLAY_JITTER adds
+    # up to that many random seconds. With REPLAY_STRICT, a request that was
+    # not recorded raises ReplayMissError, else it gets one of the recorded
+    # responses of the same endpoint (or SOAP Action). REPLAY_IGNORE
+    # patterns are removed from request bodies before matching them.
+    # Recorded responses are meant to be shared as fixtures: the 'secret'
+    # group of each REPLAY_REDACT pattern is replaced with REDACTED before
+    # a response is saved (OAuth access tokens and SOAP session tokens by
+    # default; replay works with any token). Add patterns for anything
+    # else sensitive in your responses.
+    'REPLAY_MODE': None,
+    'REPLAY_FILE': 'sabre_replay.bin',
+    'REPLAY_LATENCY': 0,
+    'REPLAY_JITTER': 0,
+    'REPLAY_STRICT': True,
+    'REPLAY_IGNORE': (
+        r'<(\w+:)?(ConversationId|MessageId|Timestamp|BinarySecurityToken)\b[^>]*>[^<]*',
+        r'\bTimeStamp="[^"]*"',
+    ),
+    'REPLAY_REDACT': (
+        r'"(access_token|refresh_token)"\s*:\s*"(?P<secret>[^"]*)"',
+        r'<(\w+:)?BinarySecurityToken\b[^>]*>(?P<secret>[^<]*)<',
+    ),
+
+    # asyncio client (AsyncSabreDevStudio)
+    'ASYNC_POOL_LIMIT': 100,
+    'ASYNC_POOL_LIMIT_PER_HOST': 0,
+
+    # Batch / fan-out calls (lead_price_many, destination_finder_many)
+    # MAX_CONCURRENT_REQUESTS caps in-flight batch calls across the process
+    'MAX_CONCURRENT_REQUESTS': 16,
+    'BATCH_MAX_CONCURRENCY': 8,
+
+    # OAuth token manager
+    # refresh this many seconds before expiry; share tokens via Django cache
+    'TOKEN_REFRESH_SKEW': 300,
+    'TOKEN_SHARED_CACHE': True,
+    'TOKEN_LOCK_TIMEOUT': 30,
+
+    # Response cache for near-static lookups (see sabre_endpoints['cache_ttl'])
+    # backend: 'local' (in-process LRU), 'django' (django cache) or None
+    'RESPONSE_CACHE_BACKEND': 'local',
+    'RESPONSE_CACHE_SIZE': 1024,
+
+    # Airport/city -> country index used for the point of sale
+    # COUNTRY_INDEX_FILE: optional JSON ({"DFW": "US"}) or CSV (DFW,US) to preload
+    'COUNTRY_INDEX_TTL': 30 * 86400,
+    'COUNTRY_INDEX_FILE': None,
+
+    # geocode_many: GeoCodeRQ elements per request
+    'GEOCODE_CHUNK_SIZE': 100,
+
+    # SOAP responses: parse into plain dicts with interned keys (xmltodict
+    # fast mode) instead of OrderedDicts
+    'SOAP_FAST_PARSE': True,
+
+    # Render SOAP envelopes from templates compiled once per Action/Service
+    # (sabre_envelope.EnvelopeBuilder); output is identical to render_to_string
+    'SOAP_ENVELOPE_CACHE': True,
+
+    # SOAP session pool (sabre_session.SessionPool)
+    # a lease not checked in after SESSION_LEASE_TIMEOUT seconds is reclaimed;
+    # checkout waits up to SESSION_CHECKOUT_TIMEOUT seconds for a free session
+    'SESSION_LEASE_TIMEOUT': 300,
+    'SESSION_CHECKOUT_TIMEOUT': 30,
+    # pool create/refresh/close: parallel SOAP calls, and SessionCreateRQ
+    # attempts per slot before giving up on it
+    'SESSION_POOL_WORKERS': 8,
+    'SESSION_CREATE_ATTEMPTS': 3,
+    # autoscaling: grow (up to SESSION_POOL_MAX) when a checkout waited
+    # SESSION_GROW_WAIT seconds or more than SESSION_GROW_WAITERS callers wait;
+    # close the last session (down to SESSION_POOL_MIN) once it has been idle
+    # SESSION_SHRINK_IDLE seconds and the size has not changed for
+    # SESSION_SCALE_COOLDOWN seconds. Checkouts take the lowest free slot, so
+    # the last ones go idle once traffic drops; the check runs on checkin
+    # and on every keepalive round.
+    'SESSION_POOL_MIN': 1,
+    'SESSION_POOL_MAX': 10,
+    'SESSION_GROW_WAIT': 0.5,
+    'SESSION_GROW_WAITERS': 2,
+    'SESSION_SHRINK_IDLE': 600,
+    'SESSION_SCALE_COOLDOWN': 60,
+    # keepalive (sabre_session.SessionKeepalive): Sabre closes sessions idle
+    # for SESSION_IDLE_TIMEOUT seconds; every SESSION_KEEPALIVE_INTERVAL
+    # seconds, ping up to SESSION_KEEPALIVE_MAX_PINGS sessions idle for more
+    # than SESSION_IDLE_TIMEOUT - SESSION_KEEPALIVE_MARGIN seconds. Pings
+    # count as use, so SESSION_SHRINK_IDLE must be below that to shrink.
+    # SESSION_KEEPALIVE starts it with the pool.
+    'SESSION_KEEPALIVE': False,
+    'SESSION_IDLE_TIMEOUT': 15 * 60,
+    'SESSION_KEEPALIVE_MARGIN': 120,
+    'SESSION_KEEPALIVE_INTERVAL': 10,
+    'SESSION_KEEPALIVE_MAX_PINGS': 2,
+
+    # Client-side rate limits (sabre_ratelimit.RateLimiter), opt-in
+    # backend: 'local' (per process), 'django' (shared through the django
+    # cache) or None (no limits and no retries, the default)
+    'RATE_LIMIT_BACKEND': None,
+    # per endpoint family: calls per second and burst size; 'default' covers
+    # endpoints of no other family, a family set to None is not limited
+    'RATE_LIMITS': {
+        'shop': {'rate': 20, 'burst': 40},
+        'lists': {'rate': 20, 'burst': 40},
+        'hotels': {'rate': 10, 'burst': 20},
+        'soap': {'rate': 10, 'burst': 20},
+        'default': {'rate': 20, 'burst': 40},
+    },
+    # longest wait for a token before RateLimitTimeout
+    'RATE_LIMIT_TIMEOUT': 30,
+    # retries of 429/503/504 responses, after Retry-After or a random pause
+    # of up to BACKOFF_BASE * 2 ** attempt seconds, at most BACKOFF_MAX
+    'BACKOFF_RETRIES': 3,
+    'BACKOFF_BASE': 0.5,
+    'BACKOFF_MAX': 30,
+
+    # Single flight (sabre_singleflight.SingleFlight): identical GET requests
+    # and SOAP searches in flight at the same time share one call to Sabre.
+    # backend: 'local' (threads of a process), 'django' (all processes, via
+    # a cache lock held up to SINGLE_FLIGHT_LOCK_TIMEOUT seconds; the result
+    # is kept SINGLE_FLIGHT_RESULT_TTL seconds for the waiting processes) or
+    # None (off)
+    'SINGLE_FLIGHT_BACKEND': 'local',
+    'SINGLE_FLIGHT_LOCK_TIMEOUT': 60,
+    'SINGLE_FLIGHT_RESULT_TTL': 5,
+    'SINGLE_FLIGHT_SOAP_ACTIONS': ('BargainFinderMaxRQ', 'OTA_HotelAvailLLSRQ'),
+
+    # Circuit breakers (sabre_breaker.CircuitBreaker), one per endpoint
+    # (sabre_endpoints key) and per SOAP Action: once BREAKER_MIN_CALLS of
+    # the last BREAKER_WINDOW calls were made, the circuit opens if
+    # BREAKER_FAILURE_RATE of them failed or BREAKER_SLOW_CALL_RATE took
+    # BREAKER_SLOW_CALL_SECONDS or more. Calls then raise CircuitOpenError for
+    # BREAKER_OPEN_SECONDS, after which BREAKER_HALF_OPEN_PROBES calls decide
+    # whether it closes again. BREAKERS overrides these per name.
+    'CIRCUIT_BREAKER': True,
+    'BREAKER_WINDOW': 20,
+    'BREAKER_MIN_CALLS': 10,
+    'BREAKER_FAILURE_RATE': 0.5,
+    'BREAKER_SLOW_CALL_SECONDS': 10,
+    'BREAKER_SLOW_CALL_RATE': 0.8,
+    'BREAKER_OPEN_SECONDS': 30,
+    'BREAKER_HALF_OPEN_PROBES': 1,
+    'BREAKERS': {
+        'BargainFinderMaxRQ': {'slow_call_seconds': 30},
+    },
+
+    # Hedged calls (sabre_hedge.Hedger), opt-in per endpoint name or SOAP
+    # Action, e.g. ('instaflights', 'BargainFinderMaxRQ'): a call still
+    # unanswered after the HEDGE_PERCENTILE-th latency of the last calls
+    # (at least HEDGE_MIN_DELAY seconds; HEDGE_INITIAL_DELAY until
+    # HEDGE_MIN_SAMPLES calls were seen) is sent again and the first answer
+    # wins. HEDGE_BUDGET caps the extra calls (0.05: 5% more traffic).
+    'HEDGED_CALLS': (),
+    'HEDGE_PERCENTILE': 95,
+    'HEDGE_MIN_DELAY': 0.5,
+    'HEDGE_INITIAL_DELAY': 5,
+    'HEDGE_MIN_SAMPLES': 20,
+    'HEDGE_BUDGET': 0.05,
+    'HEDGE_MAX_WORKERS': 32,
 
+    # Instrumentation (sabre_metrics.Instrumentation): hooks, phase timings
+    # and latency histograms of request, get_service, authenticate and
+    # session checkout
+    'METRICS': True,
 }
 
 # django ? get from environment
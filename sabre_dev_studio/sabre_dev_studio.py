@@ -1,10 +1,14 @@
 import base64
 import collections
 import datetime
+import functools
 import gzip
+import io
 import json
 import os
 import re
+import threading
+import time
 from xml.etree import ElementTree
 
 from django.conf import settings
@@ -16,11 +20,23 @@ from suds.client import Client
 from sabre import xmltodict
 from sabre.sabre_dev_studio import sabre_configs
 from sabre.sabre_dev_studio import sabre_configs as config
-from sabre.sabre_dev_studio import sabre_utils, sabre_exceptions, session
+from sabre.sabre_dev_studio import sabre_utils, sabre_exceptions, sabre_concurrency, sabre_metrics, \
+    sabre_stream
+from sabre.sabre_dev_studio.sabre_auth import TokenManager
+from sabre.sabre_dev_studio.sabre_breaker import CircuitBreakers
+from sabre.sabre_dev_studio.sabre_cache import ResponseCache
+from sabre.sabre_dev_studio.sabre_geo import CountryIndex, geo_code_country
+from sabre.sabre_dev_studio.sabre_hedge import Hedger
+from sabre.sabre_dev_studio.sabre_metrics import Instrumentation
+from sabre.sabre_dev_studio.sabre_ratelimit import RateLimiter, parse_retry_after
 from sabre.sabre_dev_studio.sabre_configs import sabre_endpoints
 from sabre.sabre_dev_studio.sabre_exceptions import UnsupportedMethodError, \
     SabreErrorBadRequest
-from sabre.sabre_dev_studio.sabre_utils import country_code_lookup
+from sabre.sabre_dev_studio.sabre_envelope import EnvelopeBuilder
+from sabre.sabre_dev_studio.sabre_session import SessionKeepalive, SessionPool
+from sabre.sabre_dev_studio.sabre_singleflight import SingleFlight
+from sabre.sabre_dev_studio.sabre_transport import SabreTransport
+from sabre.sabre_dev_studio.sabre_utils import country_code_lookup, response_data
 
 
 # from google.appengine.api import urlfetch
@@ -31,21 +47,45 @@ except ImportError:
     
 
 # from google.appengine.api import memcache
-PREFIX_SESSION = "session_"
 MAX_SESSIONS=1
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 
 
 # Local imports
 class SabreDevStudio(object):
-    def __init__(self, environment='test', return_obj=True):
+    def __init__(self, environment='test', return_obj=True, transport=None,
+                 response_cache=None, rate_limiter=None, single_flight=None, breakers=None,
+                 instrumentation=None):
         self.auth_headers = None
 
+        # Pooled keep-alive HTTP transport, shared per process unless given
+        self.transport = transport or SabreTransport.default()
+
+        # Cache for near-static lookups, see sabre_endpoints['cache_ttl']
+        self.response_cache = response_cache or ResponseCache.default()
+
+        # Client-side rate limits and 429/503/504 retries, see RATE_LIMITS
+        self.rate_limiter = rate_limiter or RateLimiter.default()
+
+        # Coalesces identical in-flight requests, see SINGLE_FLIGHT_BACKEND
+        self.single_flight = single_flight or SingleFlight.default()
+
+        # Fails fast on endpoints that keep failing or stalling, see CIRCUIT_BREAKER
+        self.breakers = breakers or CircuitBreakers.default()
+
+        # Hooks, phase timings and latency histograms, see METRICS
+        self.instrumentation = instrumentation or Instrumentation.default()
+
+        # Airport/city -> country index for point of sale lookups
+        self.country_index = CountryIndex.default()
+
+        # OAuth token state, refreshed ahead of expiry and shared via cache
+        self.token_manager = TokenManager(self.fetch_token)
+
         self.client_id = None
         self.client_secret = None
-        self.token = None
-        self.token_expiry = None
 
         self.return_obj = return_obj
 
@@ -86,23 +126,70 @@ class SabreDevStudio(object):
     def set_credentials(self, client_id, client_secret):
         self.client_id = client_id
         self.client_secret = client_secret 
+        self.bind_token_cache()
+
+    # bind_token_cache
+    # () -> ()
+    # Points the token manager at the shared cache entry of these
+    # credentials on this host, so a token another worker published is
+    # adopted instead of fetched again
+    def bind_token_cache(self):
+        self.token_manager.cache_key = TokenManager.make_cache_key(self.client_id, self.host) \
+            if self.client_id else None
+
+    # token
+    # The current access token, kept by self.token_manager
+    @property
+    def token(self):
+        return self.token_manager.token
+
+    @token.setter
+    def token(self, token):
+        self.token_manager.token = token
+        self.token_manager.expiry = None
+
+    # token_expiry
+    # The expiry of the current token as a datetime, None if it never expires
+    @property
+    def token_expiry(self):
+        expiry = self.token_manager.expiry
+        return datetime.datetime.fromtimestamp(expiry) if expiry is not None else None
+
+    @token_expiry.setter
+    def token_expiry(self, expiry):
+        self.token_manager.expiry = time.mktime(expiry.timetuple()) if expiry else None
 
     # authenticate
     # () -> ()
     # This method uses the client ID and client secret provided in set_credentials
     # to request the token from Sabre. The token is then saved in the internal state
     # of the instance in self.token
+    # A token another worker published for the same credentials, other than
+    # the current one, is adopted instead (see TokenManager.refresh)
     def authenticate(self):
         if not self.client_id or not self.client_secret:
             raise sabre_exceptions.NoCredentialsProvided
 
-        token_resp = self.get_token_data(self.client_id, self.client_secret)
-        self.verify_response(token_resp)
+        self.bind_token_cache()
+        self.token_manager.refresh(stale=self.token_manager.token)
 
-        token_json = token_resp.json()
-        
-        self.token = token_json.get('access_token')
-        self.token_expiry = datetime.datetime.now() + datetime.timedelta(0, token_json.get('expires_in'))
+    # fetch_token
+    # () -> (String, Number)
+    # Requests a new token and returns it with its lifetime in seconds
+    # Used by the token manager for every refresh
+    def fetch_token(self):
+        if not self.client_id or not self.client_secret:
+            raise sabre_exceptions.NoCredentialsProvided
+
+        self.bind_token_cache()
+
+        with self.instrumentation.call('authenticate', 'token'):
+            token_resp = self.get_token_data(self.client_id, self.client_secret)
+            self.verify_response(token_resp)
+
+            with sabre_metrics.phase('parse'):
+                token_json = token_resp.json()
+        return token_json.get('access_token'), token_json.get('expires_in')
 
     def stringToBase64(self, s):
         return base64.b64encode(s.encode('utf-8'))
@@ -133,9 +220,10 @@ class SabreDevStudio(object):
         }
         
         # Step 3: Get an access token
-        data = requests.post(self.make_endpoint('/v2/auth/token/'),
-                             headers=headers,
-                             data=payload)
+        data = self.transport.request('POST',
+                                      self.make_endpoint('/v2/auth/token/'),
+                                      headers=headers,
+                                      data=payload)
 
         return data
 
@@ -147,48 +235,183 @@ class SabreDevStudio(object):
     #    endpoint is a relative endpoint
     #    payload is the data -- added as query params for GET
     # Returns an object with the properties of the response data
-    def request(self, method, endpoint, payload=None, additional_headers=None):
-        now = datetime.datetime.now()
+    #    hedge sends the request again if it is slow to answer (see Hedger)
+    def request(self, method, endpoint, payload=None, additional_headers=None, hedge=False):
+        with self.instrumentation.call('request', sabre_utils.endpoint_name(endpoint) or endpoint,
+                                       method=method):
+            return self.request_once(method, endpoint, payload, additional_headers, hedge)
+
+    def request_once(self, method, endpoint, payload=None, additional_headers=None, hedge=False):
+        fetch = lambda: self.fetch_response(method, endpoint, payload, additional_headers)
+        key = None
+
+        if hedge:
+            hedger = Hedger.get(sabre_utils.endpoint_name(endpoint) or endpoint)
+            fetch = functools.partial(hedger.call, fetch)
+
+        if self.single_flight and method == 'GET':
+            # Identical GETs in flight share one call to Sabre
+            key = ResponseCache.make_key(method, self.make_endpoint(endpoint), payload)
+            fetch = functools.partial(self.single_flight.do, key, fetch)
+
+        policy = self.response_cache.policy(endpoint) if self.response_cache else None
+        if policy:
+            key = key or ResponseCache.make_key(method, self.make_endpoint(endpoint), payload)
+            resp_data = self.response_cache.get_or_fetch(key, policy, fetch)
+        else:
+            resp_data = fetch()
+
+        if self.return_obj:
+            with sabre_metrics.phase('convert_keys'):
+                return self.process_response(resp_data)
+        return resp_data
 
-        # Check for token
-        if not self.token:
+    # fetch_response
+    # String -> String -> Dictionary? -> Dictionary? -> dict
+    # Performs the request against Sabre, bypassing the response cache
+    # Returns the parsed JSON body
+    def fetch_response(self, method, endpoint, payload=None, additional_headers=None):
+        # Check for token, refreshing it ahead of expiry
+        token = self.token_manager.get_token()
+        if not token:
             raise sabre_exceptions.NotAuthorizedError
 
-        if not self.token_expiry:
-            pass
-        elif self.token_expiry < now:
-            # Authenticate again
-            self.authenticate()
+        circuit = sabre_utils.endpoint_name(endpoint) or endpoint
+        family = sabre_utils.endpoint_family(endpoint)
+        endpoint = self.make_endpoint(endpoint)
+
+        try:
+            resp = self.guarded(circuit, family, lambda: self.send_request(method, endpoint, token, payload,
+                                                                           additional_headers))
+        except sabre_exceptions.SabreErrorUnauthenticated:
+            # Token revoked or expired early: refresh once and replay
+            if not self.client_id or not self.client_secret:
+                raise
+            token = self.token_manager.refresh(stale=token)
+            resp = self.guarded(circuit, family, lambda: self.send_request(method, endpoint, token, payload,
+                                                                           additional_headers))
+
+        with sabre_metrics.phase('parse'):
+            return resp.json()
+
+    # request_stream
+    # String -> String -> String -> Dictionary? -> Dictionary? ->
+    #    Generator of (ResponseData or dict)
+    # Like request, but reads the body incrementally and yields the elements
+    # of its top-level array `key` one at a time as they arrive. Only one
+    # element is held in memory. Streamed responses are never cached.
+    def request_stream(self, method, endpoint, key, payload=None, additional_headers=None):
+        # Measured until the last element, like stream_service; first_byte
+        # is the time to the first chunk of the body
+        call = self.instrumentation.call('request', sabre_utils.endpoint_name(endpoint) or endpoint,
+                                         method=method, stream=True)
+        record = call.begin()
+        try:
+            resp = self.open_stream(method, endpoint, payload, additional_headers)
+        except Exception as e:
+            call.end(e)
+            raise
+        call.detach()
 
+        error = None
+        try:
+            chunks = resp.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+            if record is not None:
+                chunks = sabre_metrics.count_bytes(chunks, record, first_byte=True)
+            for item in sabre_stream.iter_json_array(chunks, key, resp.encoding):
+                yield self.process_response(item) if self.return_obj else item
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            resp.close()
+            call.end(error)
+
+    # open_stream
+    # String -> String -> Dictionary? -> Dictionary? -> Response
+    # Sends a request for request_stream and returns the response with its
+    # body unread
+    def open_stream(self, method, endpoint, payload=None, additional_headers=None):
+        token = self.token_manager.get_token()
+        if not token:
+            raise sabre_exceptions.NotAuthorizedError
+
+        circuit = sabre_utils.endpoint_name(endpoint) or endpoint
+        family = sabre_utils.endpoint_family(endpoint)
         endpoint = self.make_endpoint(endpoint)
+
+        try:
+            return self.guarded(circuit, family, lambda: self.send_request(method, endpoint, token, payload,
+                                                                           additional_headers, stream=True))
+        except sabre_exceptions.SabreErrorUnauthenticated:
+            if not self.client_id or not self.client_secret:
+                raise
+            token = self.token_manager.refresh(stale=token)
+            return self.guarded(circuit, family, lambda: self.send_request(method, endpoint, token, payload,
+                                                                           additional_headers, stream=True))
+
+    # limited
+    # String -> (() -> a) -> a
+    # Runs a call to Sabre under the rate limit of its endpoint family,
+    # retrying 429/503/504 responses with backoff (see RateLimiter.call)
+    def limited(self, family, fn):
+        if self.rate_limiter is None:
+            return fn()
+        return self.rate_limiter.call(family, fn)
+
+    # guarded
+    # String -> String -> (() -> a) -> a
+    # limited, with each attempt behind the circuit breaker of an endpoint
+    # name or SOAP Action: raises CircuitOpenError without calling Sabre
+    # while it is open. Rate limit waits and retry backoff happen outside
+    # the breaker, so they never count as slow calls.
+    def guarded(self, circuit, family, fn):
+        if self.breakers is None:
+            return self.limited(family, fn)
+        breaker = self.breakers.get(circuit)
+        return self.limited(family, lambda: breaker.call(fn))
+
+    # hedged
+    # String -> Boolean? -> Boolean
+    # Whether to hedge calls to an endpoint name or SOAP Action: as asked,
+    # else if it is listed in HEDGED_CALLS
+    def hedged(self, name, hedge=None):
+        if hedge is None:
+            return name in sabre_configs.configurations.get('HEDGED_CALLS', ())
+        return hedge
+
+    # send_request
+    # String -> String -> String -> Dictionary? -> Dictionary? -> Response
+    # Sends one authorized request to an absolute endpoint and verifies it
+    def send_request(self, method, endpoint, token, payload=None, additional_headers=None,
+                     stream=False):
         auth_header = {
-            'Authorization': 'Bearer ' + self.token
+            'Authorization': 'Bearer ' + token
         }
 
         headers = additional_headers.copy() if additional_headers else {}
         headers.update(auth_header)
 
         if method == 'GET':
-            resp = requests.get(endpoint, headers=headers, params=payload)
+            resp = self.transport.request('GET', endpoint, headers=headers, params=payload,
+                                          stream=stream)
         elif method == 'PUT':
-            resp = requests.put(endpoint, headers=headers, data=payload)
+            resp = self.transport.request('PUT', endpoint, headers=headers, data=payload,
+                                          stream=stream)
         elif method == 'PATCH':
-            resp = requests.put(endpoint, headers=headers, data=payload)
+            resp = self.transport.request('PUT', endpoint, headers=headers, data=payload,
+                                          stream=stream)
         elif method == 'POST':
-            resp = requests.post(endpoint, headers=headers, data=payload)
+            resp = self.transport.request('POST', endpoint, headers=headers, data=payload,
+                                          stream=stream)
         elif method == 'DELETE':
-            resp = requests.delete(endpoint, headers=headers)
+            resp = self.transport.request('DELETE', endpoint, headers=headers,
+                                          stream=stream)
         else:
             raise UnsupportedMethodError
 
         self.verify_response(resp)
-
-#         if self.return_obj:
-#             resp_data = self.process_response(resp.json())
-#         else:
-#             resp_data = resp.json()
-        resp_data = resp.json()
-        return resp_data
+        return resp
 
     # verify_response
     # Response -> ()
@@ -212,38 +435,86 @@ class SabreDevStudio(object):
             elif resp.status_code == 406:
                 raise sabre_exceptions.SabreErrorNotAcceptable(resp.json())
             elif resp.status_code == 429:
-                raise sabre_exceptions.SabreErrorRateLimited(resp.json())
+                raise self.retry_error(sabre_exceptions.SabreErrorRateLimited(resp.json()), resp)
 
             elif resp.status_code == 500:
                 print(resp.text)
                 raise sabre_exceptions.SabreInternalServerError(resp.text)
             elif resp.status_code == 503:
-                raise sabre_exceptions.SabreErrorServiceUnavailable
+                raise self.retry_error(sabre_exceptions.SabreErrorServiceUnavailable(), resp)
             elif resp.status_code == 504:
-                raise sabre_exceptions.SabreErrorGatewayTimeout
+                raise self.retry_error(sabre_exceptions.SabreErrorGatewayTimeout(), resp)
+
+    # verify_service_status
+    # Response -> ()
+    # SOAP responses carry their errors as faults in the body, except when
+    # Sabre throttles (429) or is unavailable (503, 504)
+    def verify_service_status(self, resp):
+        if resp.status_code == 429:
+            raise self.retry_error(sabre_exceptions.SabreErrorRateLimited(), resp)
+        elif resp.status_code == 503:
+            raise self.retry_error(sabre_exceptions.SabreErrorServiceUnavailable(), resp)
+        elif resp.status_code == 504:
+            raise self.retry_error(sabre_exceptions.SabreErrorGatewayTimeout(), resp)
+
+    # retry_error
+    # SabreDevStudioAPIException -> Response -> SabreDevStudioAPIException
+    # Records how long Sabre asked us to wait (Retry-After) on the error
+    def retry_error(self, error, resp):
+        error.retry_after = parse_retry_after(resp.headers.get('Retry-After'))
+        return error
 
     # process_response
     # JSON Dictionary -> ResponseData
-    # Converts a dictionary into a python object with Pythonic names
+    # Wraps a dictionary in a dict with Pythonic attribute names (a list in
+    # a ResponseList). Keys are converted lazily on access; json_obj is not
+    # modified
     def process_response(self, json_obj):
-        sabre_utils.convert_keys(json_obj)
-
-        json_str = json.dumps(json_obj)
-        obj = json.loads(json_str,
-                         object_hook=lambda d: collections.namedtuple('ResponseData', d.keys())(*d.values()))
-
-        return obj
+        return response_data(json_obj)
     
+    # render_service
+    # Dictionary -> String
+    # Renders the SOAP envelope for params["Action"], through the cached
+    # EnvelopeBuilder for the Action/Service if SOAP_ENVELOPE_CACHE is set
+    def render_service(self, params):
+        params.update(sabre_configs.configurations)
+        with sabre_metrics.phase('render'):
+            if sabre_configs.configurations.get('SOAP_ENVELOPE_CACHE'):
+                builder = EnvelopeBuilder.get(params["Action"], params.get("Service"))
+                tpl = builder.render(params)
+            else:
+                tpl = render_to_string('sabre/xml/' + params["Action"] + '.xml', params)
+        print (tpl)
+        return tpl
+
     # SOAP APIs Handler
     #
     #
-    def get_service(self, params=None):
+    def get_service(self, params=None, stream=False, item_depth=None, item_name=None, projection=None):
         """
             Initializes all session poll sessions.
+
+            With stream=True, returns a generator of the elements found at
+            item_depth (only those named item_name if given), e.g. each
+            PricedItinerary of a BargainFinderMax response, parsed while
+            the response is still being downloaded. Closing the generator
+            stops reading and releases the connection.
+
+            projection limits parsing to the given element paths, relative
+            to the response element, or names an entry of soap_projections
+            (see sabre_utils.soap_projection).
         """
-        params.update(sabre_configs.configurations)
-        tpl = render_to_string('sabre/xml/' + params["Action"] + '.xml', params)
-        print (tpl)
+        if stream:
+            return self.stream_service(params, item_depth, item_name, projection)
+
+        with self.instrumentation.call('get_service', params.get("Action")):
+            return self.call_service(params, projection)
+
+    # call_service
+    # Dictionary -> (String or [String])? -> Dictionary
+    # Renders, sends and parses one SOAP call, see get_service
+    def call_service(self, params, projection=None):
+        tpl = self.render_service(params)
         
         # implementation for memcache
     #     urlfetch.set_default_fetch_deadline(60)
@@ -254,22 +525,96 @@ class SabreDevStudio(object):
                    #headers={"Content-Type": "text/xml","Accept": "text/xml"})
     
         # implementation for redirect
-        result = requests.post(sabre_configs.configurations["WSDL_URL"], 
-                               {"Content-Type": "text/xml","Accept": "text/xml","Accept-Encoding":"gzip"}, tpl)
+        result = self.post_service(params["Action"], tpl)
     
-        gzip_stream = StringIO.StringIO(result.content)
-        gzip_file = gzip.GzipFile(fileobj=gzip_stream)
-        ungzipped = gzip_file.read()
-        doc = xmltodict.parse(ungzipped,attr_prefix='_')
+        doc = self.parse_service(result.content, projection)
         return doc#json.dumps(doc)
         ##doc = xmltodict.parse(result.content,attr_prefix='_')
         #return doc    
 
+    # stream_service
+    # Dictionary -> Int -> String? -> Generator of Dictionary
+    # Sends a SOAP request and parses the raw (gzipped) body incrementally,
+    # see get_service(stream=True)
+    # The call is measured until the last item, but download, gunzip and
+    # parse are interleaved with the caller's work: only render, connect,
+    # server_wait and the bytes read are reported
+    def stream_service(self, params, item_depth, item_name=None, projection=None):
+        call = self.instrumentation.call('get_service', params.get("Action"), stream=True)
+        record = call.begin()
+        try:
+            tpl = self.render_service(params)
+            result = self.post_service(params["Action"], tpl, stream=True)
+        except Exception as e:
+            call.end(e)
+            raise
+        call.detach()
+
+        error = None
+        try:
+            # Read the socket as is and gunzip as we go
+            chunks = result.raw.stream(STREAM_CHUNK_SIZE, decode_content=False)
+            if record is not None:
+                chunks = sabre_metrics.count_bytes(chunks, record, first_byte=True)
+            fast = sabre_configs.configurations.get('SOAP_FAST_PARSE')
+            for path, item in sabre_stream.iter_xml_items(chunks, item_depth, item_name,
+                                                         fast=fast, attr_prefix='_',
+                                                         projection=sabre_utils.soap_projection(projection)):
+                yield item
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            result.close()
+            call.end(error)
+
+    # post_service
+    # String -> String -> Boolean -> Response
+    # Posts a SOAP envelope under the 'soap' rate limit and the circuit
+    # breaker of its Action
+    def post_service(self, action, tpl, stream=False):
+        def send():
+            result = self.transport.request('POST',
+                                            sabre_configs.configurations["WSDL_URL"],
+                                            headers={"Content-Type": "text/xml","Accept": "text/xml","Accept-Encoding":"gzip"},
+                                            data=tpl,
+                                            stream=stream)
+            try:
+                self.verify_service_status(result)
+            except sabre_exceptions.SabreDevStudioAPIException:
+                result.close()
+                raise
+            return result
+
+        return self.guarded(action, 'soap', send)
+
+    # parse_service
+    # bytes -> (String or [String])? -> Dictionary
+    # Parses a SOAP response body, gunzipping it first if needed. With
+    # SOAP_FAST_PARSE, builds plain dicts with interned keys instead of
+    # OrderedDicts; with a projection, only the projected elements
+    def parse_service(self, content, projection=None):
+        # requests already inflates bodies sent with Content-Encoding: gzip
+        if content[:2] == b'\x1f\x8b':
+            with sabre_metrics.phase('gunzip'):
+                content = gzip.GzipFile(fileobj=io.BytesIO(content)).read()
+        with sabre_metrics.phase('parse'):
+            return xmltodict.parse(content, attr_prefix='_',
+                                   fast=sabre_configs.configurations.get('SOAP_FAST_PARSE'),
+                                   projection=sabre_utils.soap_projection(projection))
+
     # instaflights
     # Dictionary -> ResponseData
     # Executes a request to Sabre's instaflights endpoint with the options specified
-    def instaflights(self, options):
-        resp = self.request('GET', sabre_endpoints['instaflights'], options)
+    # With stream=True, returns a generator that yields each of the
+    # PricedItineraries as soon as it has been read, without holding the
+    # whole response in memory
+    def instaflights(self, options, stream=False, hedge=None):
+        if stream:
+            return self.request_stream('GET', sabre_endpoints['instaflights'],
+                                       'PricedItineraries', options)
+        resp = self.request('GET', sabre_endpoints['instaflights'], options,
+                            hedge=self.hedged('instaflights', hedge))
         return resp
     
     # The Tag ID Lookup endpoint has a required 
@@ -296,26 +641,18 @@ class SabreDevStudio(object):
 
         return resp
 
-    # lead_price
-    # String -> String -> [Number] -> String? -> Date? -> Number? ->
-    #    Number? -> ResponseData 
-    # Executes a request to Sabre's "Lead Price" endpoint with the arguments specified
-    # Gives the cheapest dates and fare for the specified origin, destination
-    # and length of stay
-    def lead_price(self, origin, destination, length_of_stay,
-                   point_of_sale=None, departure_date=None, min_fare=None, 
-                   max_fare=None, other_opts={}):
-
+    # lead_price_params
+    # String -> String -> [Number] -> String -> Date? -> Number? ->
+    #    Number? -> Dictionary -> Dictionary
+    # Builds the query params for the "Lead Price" endpoint
+    # Shared by lead_price and the async client
+    def lead_price_params(self, origin, destination, length_of_stay,
+                          point_of_sale, departure_date=None, min_fare=None,
+                          max_fare=None, other_opts={}):
         opts = other_opts.copy()
         opts['origin'] = origin
         opts['destination'] = destination
-        
-        if point_of_sale:
-            opts['pointofsalecountry'] = point_of_sale
-        else:
-            # Get point of sale country for origin
-            result = country_code_lookup(origin)
-            opts['pointofsalecountry'] = result if result else 'US'
+        opts['pointofsalecountry'] = point_of_sale
 
         if length_of_stay is not None and isinstance(length_of_stay, list):
             opts['lengthofstay'] = ','.join(map(str, length_of_stay))
@@ -323,12 +660,32 @@ class SabreDevStudio(object):
             opts['lengthofstay'] = length_of_stay
 
         if departure_date:
-            opts['departuredate'] = self.convert_date(departure_date);
+            opts['departuredate'] = sabre_utils.convert_date(departure_date)
         if min_fare:
             opts['minfare'] = min_fare
         if max_fare:
             opts['maxfare'] = max_fare
 
+        return opts
+
+    # lead_price
+    # String -> String -> [Number] -> String? -> Date? -> Number? ->
+    #    Number? -> ResponseData 
+    # Executes a request to Sabre's "Lead Price" endpoint with the arguments specified
+    # Gives the cheapest dates and fare for the specified origin, destination
+    # and length of stay
+    def lead_price(self, origin, destination, length_of_stay,
+                   point_of_sale=None, departure_date=None, min_fare=None, 
+                   max_fare=None, other_opts={}):
+
+        if not point_of_sale:
+            # Get point of sale country for origin
+            point_of_sale = self.country_code_lookup(origin) or 'US'
+
+        opts = self.lead_price_params(origin, destination, length_of_stay,
+                                      point_of_sale, departure_date,
+                                      min_fare, max_fare, other_opts)
+
         resp = self.request('GET',
                             sabre_endpoints['lead_price'],
                             opts)
@@ -347,29 +704,32 @@ class SabreDevStudio(object):
         
         return resp
 
-
-    # destination_finder
-    # Executes a request to Sabre's "Lead Price" endpoint with the arguments specified
-    # Gives the cheapest dates and fare for the specified origin, destination
-    # and length of stay
-    def destination_finder(self, origin, destination=None, length_of_stay=None,
-                           point_of_sale=None,
-                           departure_date=None, return_date=None,
-                           earliest_departure_date=None, latest_departure_date=None,
-                           min_fare=None, max_fare=None,
-                           region=None, theme=None, location=None,
-                           cost_per_mile=None,
-                           other_opts={}):
-
+    # lead_price_many
+    # [Dictionary or List] -> Int? -> Generator of BatchResult
+    # Runs lead_price for many queries concurrently, yielding a BatchResult
+    # (query, result, error) as each one completes. A query is a dict of
+    # lead_price keyword arguments or a list of its positional arguments:
+    #    for r in sabre.lead_price_many([{'origin': 'JFK', 'destination': 'LAX',
+    #                                     'length_of_stay': 3}, ...], 8):
+    def lead_price_many(self, queries, max_concurrency=None):
+        return sabre_concurrency.fan_out(self.lead_price, queries, max_concurrency)
+
+
+    # destination_finder_params
+    # String -> String -> ... -> Dictionary -> Dictionary
+    # Builds the query params for the "Destination Finder" endpoint
+    # Shared by destination_finder and the async client
+    def destination_finder_params(self, origin, point_of_sale, destination=None,
+                                  length_of_stay=None,
+                                  departure_date=None, return_date=None,
+                                  earliest_departure_date=None, latest_departure_date=None,
+                                  min_fare=None, max_fare=None,
+                                  region=None, theme=None, location=None,
+                                  cost_per_mile=None,
+                                  other_opts={}):
         opts = other_opts.copy()
         opts['origin'] = origin
-
-        if point_of_sale:
-            opts['pointofsalecountry'] = point_of_sale
-        else:
-            # Get point of sale country for origin
-            result = country_code_lookup(origin)
-            opts['pointofsalecountry'] = result if result else 'US'
+        opts['pointofsalecountry'] = point_of_sale
 
         if destination:
             opts['destination'] = destination
@@ -380,13 +740,13 @@ class SabreDevStudio(object):
             opts['lengthofstay'] = length_of_stay
 
         if departure_date:
-            opts['departuredate'] = self.convert_date(departure_date);
+            opts['departuredate'] = sabre_utils.convert_date(departure_date)
         if return_date:
-            opts['returndate'] = self.convert_date(return_date);
+            opts['returndate'] = sabre_utils.convert_date(return_date)
         if earliest_departure_date:
-            opts['earliestdeparturedate'] = self.convert_date(earliest_departure_date);
+            opts['earliestdeparturedate'] = sabre_utils.convert_date(earliest_departure_date)
         if latest_departure_date:
-            opts['latestdeparturedate'] = self.convert_date(latest_departure_date);
+            opts['latestdeparturedate'] = sabre_utils.convert_date(latest_departure_date)
         if min_fare:
             opts['minfare'] = min_fare
         if max_fare:
@@ -400,6 +760,34 @@ class SabreDevStudio(object):
         if cost_per_mile:
             opts['pricepermile'] = cost_per_mile
 
+        return opts
+
+    # destination_finder
+    # Executes a request to Sabre's "Lead Price" endpoint with the arguments specified
+    # Gives the cheapest dates and fare for the specified origin, destination
+    # and length of stay
+    def destination_finder(self, origin, destination=None, length_of_stay=None,
+                           point_of_sale=None,
+                           departure_date=None, return_date=None,
+                           earliest_departure_date=None, latest_departure_date=None,
+                           min_fare=None, max_fare=None,
+                           region=None, theme=None, location=None,
+                           cost_per_mile=None,
+                           other_opts={}):
+
+        if not point_of_sale:
+            # Get point of sale country for origin
+            point_of_sale = self.country_code_lookup(origin) or 'US'
+
+        opts = self.destination_finder_params(origin, point_of_sale, destination,
+                                              length_of_stay,
+                                              departure_date, return_date,
+                                              earliest_departure_date, latest_departure_date,
+                                              min_fare, max_fare,
+                                              region, theme, location,
+                                              cost_per_mile,
+                                              other_opts)
+
         resp = self.request('GET',
                             sabre_endpoints['destination_finder'],
                             opts)
@@ -418,6 +806,12 @@ class SabreDevStudio(object):
         
         return resp
 
+    # destination_finder_many
+    # [Dictionary or List] -> Int? -> Generator of BatchResult
+    # Runs destination_finder for many queries concurrently, see lead_price_many
+    def destination_finder_many(self, queries, max_concurrency=None):
+        return sabre_concurrency.fan_out(self.destination_finder, queries, max_concurrency)
+
     # top_destinations
     # String -> String? -> String? -> Int? ->
     #    String? -> String? -> Int? -> ResponseData 
@@ -431,6 +825,22 @@ class SabreDevStudio(object):
                          theme=None, num_results=20, destination_country=None,
                          region=None, weeks=2):
 
+        opts = self.top_destinations_params(origin, destination_type, theme,
+                                            num_results, destination_country,
+                                            region, weeks)
+
+        resp = self.request('GET',
+                            sabre_endpoints['top_destinations'],
+                            opts)
+        return resp
+
+    # top_destinations_params
+    # String -> String? -> String? -> Int? ->
+    #    String? -> String? -> Int? -> Dictionary
+    # Builds the query params for the "Top Destinations" endpoint
+    def top_destinations_params(self, origin, destination_type=None,
+                                theme=None, num_results=20, destination_country=None,
+                                region=None, weeks=2):
         opts = {}
         if len(origin) == 2:
             opts['origincountry'] = origin
@@ -450,10 +860,7 @@ class SabreDevStudio(object):
         if weeks:
             opts['lookbackweeks'] = weeks
 
-        resp = self.request('GET',
-                            sabre_endpoints['top_destinations'],
-                            opts)
-        return resp
+        return opts
 
     # top_destinations_opts
     # Dictionary -> ResponseData 
@@ -469,8 +876,29 @@ class SabreDevStudio(object):
     # country_code_lookup
     # String -> String?
     # Finds a country code given an airport/city code
+    # Answers come from self.country_index; Sabre is only asked on a miss
     def country_code_lookup(self, code):
-        opts = [{
+        return self.country_index.lookup(code, self.fetch_country_code)
+
+    # fetch_country_code
+    # String -> String?
+    # Asks Sabre's GeoCode endpoint for the country of an airport/city code
+    def fetch_country_code(self, code):
+        try:
+            resp = self.request('POST',
+                                sabre_endpoints['geo_code'],
+                                self.geo_code_payload(code),
+                                additional_headers={'Content-Type': 'application/json'})
+            return geo_code_country(resp['Results'][0])
+        except:
+            return None
+
+
+    # geo_code_request
+    # String -> Dictionary
+    # One GeoCodeRQ element resolving an airport/city code
+    def geo_code_request(self, code):
+        return {
             "GeoCodeRQ": {
                 "PlaceById": {
                     "Id": code,
@@ -479,18 +907,14 @@ class SabreDevStudio(object):
                     }
                 }
             }
-        }]
-
-        try:
-            resp = self.request('POST',
-                                sabre_endpoints['geo_code'],
-                                json.dumps(opts, sort_keys=True),
-                                additional_headers={'Content-Type': 'application/json'})
-            code = resp.results[0].geo_code_rs.place[0].country
-            return code
-        except:
-            return None
+        }
 
+    # geo_code_payload
+    # String -> String
+    # Builds the GeoCode request body used to resolve an airport/city code
+    def geo_code_payload(self, code):
+        opts = [self.geo_code_request(code)]
+        return json.dumps(opts, sort_keys=True)
 
     # alliance_lookup
     # String -> ResponseData
@@ -544,12 +968,23 @@ class SabreDevStudio(object):
     def city_pairs_lookup(self, endpoint, point_of_sale=None, origin_country=None,
                           destination_country=None, origin_region=None,
                           destination_region=None):
-        if endpoint not in ['shop', 'historical', 'forecast']:
-            error_string = "Invalid endpoint %s specified for city pairs lookup" % endpoint
-            raise sabre_exceptions.InvalidInputError(error_string)
-        else:
-            endpoint = 'city_pairs_' + endpoint + '_lookup'
+        endpoint = self.city_pairs_endpoint(endpoint)
+        opts = self.city_pairs_params(point_of_sale, origin_country,
+                                      destination_country, origin_region,
+                                      destination_region)
 
+        resp = self.request('GET',
+                            sabre_endpoints[endpoint],
+                            opts)
+
+        return resp
+
+    # city_pairs_params
+    # String? -> String? -> String? -> String? -> String? -> Dictionary
+    # Builds the query params for the city pairs lookups
+    def city_pairs_params(self, point_of_sale=None, origin_country=None,
+                          destination_country=None, origin_region=None,
+                          destination_region=None):
         opts = {
             'pointofsalecountry': point_of_sale,
         }
@@ -563,11 +998,7 @@ class SabreDevStudio(object):
         if destination_region:
             opts['destinationregion'] = destination_region
 
-        resp = self.request('GET',
-                            sabre_endpoints[endpoint],
-                            opts)
-
-        return resp
+        return opts
 
 
     # city_pairs_lookup_opts
@@ -575,16 +1006,21 @@ class SabreDevStudio(object):
     # Returns the valid origin/destination city pairs for
     # a given point of sale & country
     def city_pairs_lookup_opts(self, endpoint, opts):
-        if endpoint not in ['shop', 'historical', 'forecast']:
-            error_string = "Invalid endpoint %s specified for city pairs lookup" % endpoint
-            raise sabre_exceptions.InvalidInputError(error_string)
-        else:
-            endpoint = 'city_pairs_' + endpoint + '_lookup'
+        endpoint = self.city_pairs_endpoint(endpoint)
 
         resp = self.request('GET',
                             sabre_endpoints[endpoint],
                             opts)
         return resp
+
+    # city_pairs_endpoint
+    # String -> String
+    # Maps 'shop', 'historical' or 'forecast' to its sabre_endpoints key
+    def city_pairs_endpoint(self, endpoint):
+        if endpoint not in ['shop', 'historical', 'forecast']:
+            error_string = "Invalid endpoint %s specified for city pairs lookup" % endpoint
+            raise sabre_exceptions.InvalidInputError(error_string)
+        return 'city_pairs_' + endpoint + '_lookup'
     
     #
     #
@@ -663,6 +1099,29 @@ class SabreDevStudio(object):
                             json.dumps(options, sort_keys=True), 
                             additional_headers=additional_headers)
         return resp
+
+    # geocode_many
+    # [String] -> Int? -> Int? -> Dictionary
+    # Resolves many airport/city codes with multi-element GeoCode requests of
+    # chunk_size codes each, sent concurrently. Returns code -> the GeoCode
+    # result for that code (e.g. result['GeoCodeRS']['Place'][0]['country']);
+    # codes whose chunk failed map to None.
+    def geocode_many(self, codes, chunk_size=None, max_concurrency=None):
+        codes = list(collections.OrderedDict.fromkeys(code.upper() for code in codes))
+        chunk_size = chunk_size or sabre_configs.configurations.get('GEOCODE_CHUNK_SIZE')
+        chunks = [codes[i:i + chunk_size] for i in range(0, len(codes), chunk_size)]
+
+        def resolve(chunk):
+            resp = self.geocode([self.geo_code_request(code) for code in chunk])
+            return resp['Results']
+
+        results = dict.fromkeys(codes)
+        for batch in sabre_concurrency.fan_out(resolve, [(chunk,) for chunk in chunks],
+                                               max_concurrency):
+            if batch.error is None:
+                # Results come back in request order
+                results.update(zip(batch.query[0], batch.result))
+        return results
     
     # https://developer.sabre.com/docs/read/rest_apis/utility/airline_lookup/
     # The Airline Lookup API returns the airline name associated with a specified IATA airline code.
@@ -674,33 +1133,125 @@ class SabreDevStudio(object):
         return resp
     
     
-    def soap_services(self, template_values, action, service):
-        binary_security_token = Session.get_session()
-        template_values["BinarySecurityToken"] = binary_security_token
-        template_values["Action"] = action
-        template_values["Service"] = service
-        result = self.get_service(template_values)
-        Session.free_session()
-        return result
+    # Identical searches listed in SINGLE_FLIGHT_SOAP_ACTIONS share one call
+    # (and one pool session) while in flight. With hedge, a slow call is
+    # sent again on another session (see Hedger).
+    def soap_services(self, template_values, action, service, projection=None, hedge=False):
+        pool = Session.pool()
+
+        def attempt(lease):
+            # The session goes back to the pool as soon as this attempt is
+            # over, whether it won or not
+            with lease:
+                values = dict(template_values or {})
+                values["BinarySecurityToken"] = lease.token
+                values["Action"] = action
+                values["Service"] = service
+                return self.get_service(values, projection=projection)
+
+        def call():
+            return attempt(pool.lease())
+
+        if hedge:
+            # The hedge never waits for a session: it is only sent when one
+            # is free
+            def hedge_call():
+                lease = pool.try_checkout()
+                if lease is None:
+                    raise sabre_exceptions.SessionPoolExhausted("no free SOAP session for a hedged call")
+                return attempt(lease)
+
+            call = functools.partial(Hedger.get(action).call, call, hedge_call,
+                                     lambda: pool.leased() < pool.size())
+
+        if self.single_flight and action in sabre_configs.configurations.get('SINGLE_FLIGHT_SOAP_ACTIONS', ()):
+            values = dict((k, v) for k, v in template_values.items() if k != "BinarySecurityToken")
+            key = ResponseCache.make_key(action, service, [values, projection])
+            return self.single_flight.do(key, call)
+        return call()
+
+    # soap_services_stream
+    # Dictionary -> String -> String -> Int -> String? -> [String]? -> Generator of Dictionary
+    # Streaming soap_services: the session is held until the generator is
+    # exhausted or closed
+    def soap_services_stream(self, template_values, action, service, item_depth, item_name=None,
+                             projection=None):
+        with Session.pool().lease() as lease:
+            values = dict(template_values or {})
+            values["BinarySecurityToken"] = lease.token
+            values["Action"] = action
+            values["Service"] = service
+            for item in self.stream_service(values, item_depth, item_name, projection):
+                yield item
 
     # 
     #
-    #
-    def bargain_finder_max_RQ(self, template_values):
-        result = self.soap_services(template_values, action='BargainFinderMaxRQ', service='BargainFinderMaxRQ')
+    # With stream=True, yields each PricedItinerary
+    # (Envelope/Body/OTA_AirLowFareSearchRS/PricedItineraries/PricedItinerary)
+    # as it is parsed; stop iterating to stop reading the response.
+    # projection, e.g. 'bfm_fare_display', builds only the listed elements
+    def bargain_finder_max_RQ(self, template_values, stream=False, projection=None, hedge=None):
+        if stream:
+            return self.soap_services_stream(template_values, 'BargainFinderMaxRQ', 'BargainFinderMaxRQ',
+                                             item_depth=5, item_name='PricedItinerary',
+                                             projection=projection)
+        result = self.soap_services(template_values, action='BargainFinderMaxRQ', service='BargainFinderMaxRQ',
+                                    projection=projection,
+                                    hedge=self.hedged('BargainFinderMaxRQ', hedge))
         return result
     
     
     # Hotel Availability
     # https://developer.sabre.com/docs/read/soap_apis/hotel/search/hotel_availability
     # Authentication: Session Token
-    def hotel_availability(self, template_values):
-        result = self.soap_services(template_values, action='OTA_HotelAvailLLSRQ', service='OTA_HotelAvailLLSRQ')
+    # projection, e.g. 'hotel_rate_display', builds only the listed elements
+    def hotel_availability(self, template_values, projection=None):
+        result = self.soap_services(template_values, action='OTA_HotelAvailLLSRQ', service='OTA_HotelAvailLLSRQ',
+                                    projection=projection)
         return result
     
 class Session(object):
     
     sabre = SabreDevStudio()
+
+    _pool = None
+    _pool_lock = threading.Lock()
+    _keepalive = None
+    _leases = threading.local()
+
+    @staticmethod
+    def pool():
+        """
+            The session pool shared through the Django cache.
+        """
+        if Session._pool is None:
+            with Session._pool_lock:
+                if Session._pool is None:
+                    Session._pool = SessionPool(create=Session.create_session,
+                                                ping=Session.ping_session,
+                                                close=Session.close_session)
+                    if sabre_configs.configurations.get('SESSION_KEEPALIVE'):
+                        Session.start_keepalive()
+        return Session._pool
+
+    @staticmethod
+    def start_keepalive():
+        """
+            Starts pinging pool sessions close to Sabre's idle timeout in a
+            background thread (see SessionKeepalive). Started with the pool
+            when SESSION_KEEPALIVE is set.
+        """
+        if Session._keepalive is None:
+            Session._keepalive = SessionKeepalive(Session.pool())
+        return Session._keepalive.start()
+
+    @staticmethod
+    def stop_keepalive():
+        """
+            Stops the keepalive thread.
+        """
+        if Session._keepalive is not None:
+            Session._keepalive.stop()
     
     @staticmethod
     def create_session():
@@ -724,21 +1275,28 @@ class Session(object):
         return token
     
     @staticmethod
-    def get_session():
+    def get_session(timeout=None):
         """
             Blocks the session so that it can not be used in the session poll.
+            Waits up to timeout seconds for a free one, then raises
+            SessionPoolExhausted. Prefer Session.pool().lease() in new code.
         """
-        index = cache.decr(key="index_sessions")
-        return cache.get(PREFIX_SESSION + str(index))
+        lease = Session.pool().checkout(timeout)
+        leases = getattr(Session._leases, 'stack', None)
+        if leases is None:
+            leases = Session._leases.stack = []
+        leases.append(lease)
+        return lease.token
     
     @staticmethod
     def free_session():
         """
-        It frees the session to be used in the session poll.
+        It frees the session to be used in the session poll: the last one
+        this thread got from get_session.
         """
-    #     index = memcache.incr(key="index_sessions")
-        index = cache.incr(key="index_sessions")
-        return index
+        leases = getattr(Session._leases, 'stack', None)
+        if leases:
+            leases.pop().release()
     
     @staticmethod
     def close_session(binary_security_token):
@@ -746,7 +1304,7 @@ class Session(object):
             Close session on saber.
         """
         return Session.sabre.get_service({
-            "Binary_security_token":binary_security_token,
+            "BinarySecurityToken":binary_security_token,
             "Service":"Session",
             "Action":"SessionCloseRQ"
         })
@@ -757,69 +1315,80 @@ class Session(object):
             Refresh a session poll session.
         """
         return Session.sabre.get_service({
-            "Binary_security_token":binary_security_token,
+            "BinarySecurityToken":binary_security_token,
             "Service":"OTA_PingRQ",
             "Action":"OTA_PingRQ",
             "TimeStamp": datetime.datetime.now().isoformat()
         })
     
     @staticmethod
-    def close_session_pool(max=MAX_SESSIONS):
+    def ping_session(binary_security_token):
+        """
+            Ping a session, raising SabreSessionError if Sabre rejects it.
+        """
+        session_ping_rs = Session.refresh_session(binary_security_token)
+        fault = sabre_utils.soap_fault(session_ping_rs)
+        if fault is not None:
+            raise sabre_exceptions.SabreSessionError(fault)
+        return session_ping_rs
+    
+    @staticmethod
+    def close_session_pool(max=None, max_workers=None):
         """
-            Close all sessions on saber.
+            Close all sessions on saber, max_workers at a time. With max,
+            only the sessions of the first max slots are closed and taken
+            out of the pool. Returns a SessionResult per session.
         """
         import logging
         logging.info("begin >> close_session_pool");
-    #     memcache.delete(key="index_sessions")
-        cache.delete(key="index_sessions")
-        list_sessions = []
-        for x in range(0, max):
-            list_sessions.append(str(x));
-    #     dict_sessions=memcache.get_multi(list_sessions, key_prefix=PREFIX_SESSION)
-        dict_sessions = cache.get_many(list_sessions, key_prefix=PREFIX_SESSION)
-        for key,value in dict_sessions.iteritems():
-            logging.info("key : {0} value: {1} ".format(key,value))
-            Session.close_session(binary_security_token=value)
-    
+        results = Session.pool().close_all(max_workers, limit=max)
+        Session.log_results("close_session_pool", results)
         logging.info("end >> close_session_pool");
-    #     return memcache.delete_multi(list_sessions,key_prefix=PREFIX_SESSION)
-        return cache.delete_many(list_sessions, key_prefix=PREFIX_SESSION)
+        return results
     
     @staticmethod
-    def refresh_session_pool(max=MAX_SESSIONS):
+    def refresh_session_pool(max=None, max_workers=None):
         """
-            Refresh all session poll sessions.
+            Refresh all session poll sessions, max_workers at a time (those
+            of the first max slots only, if given). Sessions Sabre rejects
+            are replaced. Returns a SessionResult per session.
         """
         import logging
         logging.info("begin >> refresh_all_sessions");
-        list_sessions = []
-        for x in range(0, max):
-            list_sessions.append(str(x));
-        #dict_sessions = memcache.get_multi(list_sessions, key_prefix=PREFIX_SESSION)
-        dict_sessions = cache.get_many(list_sessions, key_prefix=PREFIX_SESSION)
-        for key,value in dict_sessions.iteritems():
-            logging.info("key : {0} value: {1} ".format(key, value))
-            Session.refresh_session(binary_security_token=value)
+        results = Session.pool().ping_all(max_workers, limit=max)
+        Session.log_results("refresh_session_pool", results)
         logging.info("end >> refresh_all_sessions");
-        return True
+        return results
     
     @staticmethod
-    def create_session_pool(max=MAX_SESSIONS):
+    def create_session_pool(max=None, max_workers=None):
         """
-            Initializes all session poll sessions.
+            Initializes all session poll sessions, max_workers at a time.
+            max defaults to SESSION_POOL_MIN; the pool grows from there on
+            demand. Sessions that fail are retried, and left out if they
+            keep failing. Returns a SessionResult per session.
         """
         import logging
         logging.info("begin >> create_session_pool")
-    #     memcache.delete(key="index_sessions")
-        cache.delete(key="index_sessions")
-        sessions = {}
-        for x in range(0, max):
-            token = Session.create_session()
-            logging.info("key >> {0} value >> {1} ".format(x,token))
-            sessions[str(x)] = token
-    #     key_sessions=memcache.set_multi(sessions, key_prefix=PREFIX_SESSION)
-        key_sessions=cache.set_many(sessions, key_prefix=PREFIX_SESSION)
-    #     memcache.set(key="index_sessions", value=max)
-        cache.set(key="index_sessions", value=max)
+        pool = Session.pool()
+        results = pool.fill(pool.min_size if max is None else max, max_workers)
+        Session.log_results("create_session_pool", results)
         logging.info("end >> create_session_pool")
-        return key_sessions    
+        return results
+
+    @staticmethod
+    def pool_stats():
+        """
+            Size, waiters and checkout latency percentiles of the session
+            pool, see SessionPool.stats.
+        """
+        return Session.pool().stats()
+
+    @staticmethod
+    def log_results(operation, results):
+        import logging
+        failed = [result for result in results if result.error is not None]
+        for result in failed:
+            logging.warning("{0}: session {1} failed: {2!r} replacement: {3}".format(
+                operation, result.index, result.error, result.replacement))
+        logging.info("{0}: {1} ok, {2} failed".format(operation, len(results) - len(failed), len(failed)))
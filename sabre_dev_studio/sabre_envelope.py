@@ -0,0 +1,178 @@
+import re
+import threading
+
+from django.template import Context
+from django.template.base import TextNode, Variable, VariableNode
+from django.template.loader import get_template, render_to_string
+from django.template.loader_tags import BlockNode, ExtendsNode
+from django.utils.html import escape
+
+from sabre.sabre_dev_studio import sabre_configs
+
+
+TEMPLATE_DIR = 'sabre/xml/'
+
+# Characters Django's autoescape rewrites
+_NEEDS_ESCAPE = re.compile('[&<>"\']')
+
+
+class _Unsupported(Exception):
+    pass
+
+
+# _flatten
+# NodeList -> Dictionary -> [Node]
+# The nodes of a template with {% extends %} resolved: the parent's nodes,
+# each {% block %} replaced by the most derived version of it
+def _flatten(nodelist, blocks):
+    flat = []
+    for node in nodelist:
+        if isinstance(node, ExtendsNode):
+            parent_name = node.parent_name.var
+            if not isinstance(parent_name, str):
+                raise _Unsupported('dynamic extends')
+            child_blocks = dict(node.blocks)
+            child_blocks.update(blocks)
+            flat.extend(_flatten(get_template(parent_name).template.nodelist, child_blocks))
+        elif isinstance(node, BlockNode):
+            flat.extend(_flatten(blocks.get(node.name, node).nodelist, blocks))
+        else:
+            flat.append(node)
+    return flat
+
+
+# _simple_variable
+# Node -> String?
+# The variable name of a plain {{ name }} node, which can be filled in
+# without going through Django
+def _simple_variable(node):
+    if not isinstance(node, VariableNode):
+        return None
+    expression = node.filter_expression
+    var = expression.var
+    if expression.filters or not isinstance(var, Variable):
+        return None
+    if var.lookups and var.lookups[0] == 'block':
+        raise _Unsupported('block.super')
+    if var.literal is not None or var.translate or not var.lookups or len(var.lookups) != 1:
+        return None
+    if var.var in ('True', 'False', 'None'):
+        # Context builtins
+        return None
+    return var.var
+
+
+# EnvelopeBuilder
+# A SOAP envelope template compiled once into static text and slots.
+# Template text, and variables whose value is known when the builder is
+# made (the Action, the Service and the configurations, which override
+# request params in render_service), are joined into constant strings.
+# Plain {{ name }} variables holding strings are filled in and escaped
+# directly; anything else ({% if %}, {% for %}, filters, non-string values)
+# is rendered by Django, so the output is byte-identical to
+# render_to_string.
+#
+#    builder = EnvelopeBuilder.get('BargainFinderMaxRQ', 'BargainFinderMaxRQ')
+#    xml = builder.render(params)
+class EnvelopeBuilder(object):
+
+    _builders = {}
+    _lock = threading.Lock()
+
+    def __init__(self, template_name, static=None):
+        self.template_name = template_name
+        self.template = get_template(template_name).template
+        static = static or {}
+
+        try:
+            nodes = _flatten(self.template.nodelist, {})
+        except _Unsupported:
+            # Rendered by Django every time
+            self.parts = None
+            return
+
+        static_context = Context(static, autoescape=self.template.engine.autoescape)
+        string_if_invalid = self.template.engine.string_if_invalid
+
+        # parts: a string, a (name, node) slot, or a node to render
+        parts = []
+        for node in nodes:
+            if isinstance(node, TextNode):
+                part = node.s
+            else:
+                try:
+                    name = _simple_variable(node)
+                except _Unsupported:
+                    self.parts = None
+                    return
+                if name is not None and name in static:
+                    with static_context.bind_template(self.template):
+                        part = node.render(static_context)
+                elif name is not None and not string_if_invalid and self.template.engine.autoescape:
+                    part = (name, node)
+                else:
+                    part = node
+
+            if isinstance(part, str) and parts and isinstance(parts[-1], str):
+                parts[-1] += part
+            else:
+                parts.append(part)
+
+        self.parts = parts
+
+    # get
+    # String -> String? -> Dictionary? -> EnvelopeBuilder
+    # The cached builder for an Action/Service pair. static defaults to the
+    # current configurations.
+    @classmethod
+    def get(cls, action, service=None, static=None):
+        key = (action, service)
+        builder = cls._builders.get(key)
+        if builder is None:
+            if static is None:
+                static = sabre_configs.configurations
+            static = dict(static, Action=action)
+            if service is not None:
+                static['Service'] = service
+            builder = cls(TEMPLATE_DIR + action + '.xml', static)
+            with cls._lock:
+                builder = cls._builders.setdefault(key, builder)
+        return builder
+
+    # clear
+    # Drops the cached builders, e.g. after changing configurations
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._builders.clear()
+
+    # render
+    # Dictionary -> String
+    def render(self, params):
+        if self.parts is None:
+            return render_to_string(self.template_name, params)
+
+        context = None
+        out = []
+        append = out.append
+        for part in self.parts:
+            if isinstance(part, str):
+                append(part)
+                continue
+
+            if isinstance(part, tuple):
+                name, node = part
+                if name not in params:
+                    continue
+                value = params[name]
+                if type(value) is str:
+                    append(escape(value) if _NEEDS_ESCAPE.search(value) else value)
+                    continue
+            else:
+                node = part
+
+            if context is None:
+                context = Context(params, autoescape=self.template.engine.autoescape)
+            with context.bind_template(self.template):
+                append(node.render(context))
+        return ''.join(out)
@@ -15,6 +15,32 @@ class UnsupportedMethodError(SabreClientError):
 class InvalidInputError(SabreClientError):
     pass
 
+# No SOAP session could be checked out of the session pool in time
+class SessionPoolExhausted(SabreClientError):
+    pass
+
+# Sabre did not create a SOAP session, or rejected one (SOAP fault)
+class SabreSessionError(SabreClientError):
+    pass
+
+# No client-side rate limit token became available in time
+class RateLimitTimeout(SabreClientError):
+    pass
+
+# The circuit breaker of an endpoint is open: the call was not sent.
+# retry_after is the time left before the endpoint is tried again.
+class CircuitOpenError(SabreClientError):
+    def __init__(self, name, retry_after=0):
+        super(CircuitOpenError, self).__init__("circuit %s is open, retry in %.1fs" % (name, retry_after))
+        self.name = name
+        self.retry_after = retry_after
+
+# The replay transport has no recorded response for a request
+class ReplayMissError(SabreClientError):
+    def __init__(self, key):
+        super(ReplayMissError, self).__init__("no recorded response for %s" % key)
+        self.key = key
+
 # Base API Exception
 class SabreDevStudioAPIException(Exception):
     def __init__(self, e=None):
@@ -0,0 +1,131 @@
+import csv
+import json
+import threading
+
+from django.core.cache import cache
+
+from sabre.sabre_dev_studio import sabre_configs
+from sabre.sabre_dev_studio.sabre_configs import sabre_endpoints
+
+
+PREFIX_COUNTRY = "sabre_country_"
+
+
+# geo_code_country
+# Dictionary -> String?
+# Reads the country code out of one element of a GeoCode response's Results
+def geo_code_country(result):
+    try:
+        return result['GeoCodeRS']['Place'][0]['country']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+# CountryIndex
+# Airport/city code -> country code, memoized in-process and in the Django
+# cache. Lookups that miss both fall back to one GeoCode call and the
+# answer is added to the index. The index can be warmed in bulk from a
+# file, from the multi-city airport lookup or from GeoCode batches.
+class CountryIndex(object):
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, ttl=None, shared=True):
+        self.ttl = sabre_configs.configurations.get('COUNTRY_INDEX_TTL') if ttl is None else ttl
+        self.shared = shared
+        self.countries = {}
+
+    # default
+    # () -> CountryIndex
+    # The per-process index, preloaded from COUNTRY_INDEX_FILE if set
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    index = cls()
+                    path = sabre_configs.configurations.get('COUNTRY_INDEX_FILE')
+                    if path:
+                        index.load_file(path)
+                    cls._default = index
+        return cls._default
+
+    # get
+    # String -> String?
+    # The country of code if it is indexed, without calling Sabre
+    def get(self, code):
+        code = code.upper()
+        country = self.countries.get(code)
+        if country is None and self.shared:
+            country = cache.get(PREFIX_COUNTRY + code)
+            if country is not None:
+                self.countries[code] = country
+        return country
+
+    # lookup
+    # String -> (String -> String?) -> String?
+    # The country of code, calling resolve(code) and indexing its answer on
+    # a miss
+    def lookup(self, code, resolve):
+        country = self.get(code)
+        if country is None:
+            country = resolve(code)
+            if country:
+                self.update({code: country})
+        return country
+
+    # update
+    # Dictionary -> ()
+    # Adds code -> country pairs to the index
+    def update(self, mapping):
+        mapping = dict((code.upper(), country) for code, country in mapping.items() if country)
+        self.countries.update(mapping)
+        if self.shared and mapping:
+            cache.set_many(dict((PREFIX_COUNTRY + code, country)
+                                for code, country in mapping.items()), self.ttl)
+
+    # load_file
+    # String -> Int
+    # Loads a JSON object ({"DFW": "US", ...}) or a CSV file with
+    # code,country rows. Returns the number of codes loaded.
+    def load_file(self, path):
+        with open(path) as f:
+            if path.endswith('.json'):
+                mapping = json.load(f)
+            else:
+                mapping = dict(row[:2] for row in csv.reader(f) if len(row) >= 2)
+        self.update(mapping)
+        return len(mapping)
+
+    # warm_from_cities
+    # SabreDevStudio -> [String] -> Int
+    # Indexes every multi-airport city of the given countries, one
+    # multi_city_airport_lookup call per country
+    def warm_from_cities(self, client, country_codes):
+        mapping = {}
+        for country_code in country_codes:
+            resp = client.request('GET',
+                                  sabre_endpoints['multi_city_airport_lookup'],
+                                  { 'country': country_code })
+            for city in resp.get('Cities') or []:
+                code = city.get('code')
+                if code:
+                    mapping[code] = city.get('countryCode') or country_code
+        self.update(mapping)
+        return len(mapping)
+
+    # warm_from_geocode
+    # SabreDevStudio -> [String] -> Int
+    # Resolves codes that are not indexed yet with batched GeoCode requests
+    # (see SabreDevStudio.geocode_many). Returns the number resolved.
+    def warm_from_geocode(self, client, codes):
+        codes = [code for code in codes if self.get(code) is None]
+        if not codes:
+            return 0
+
+        results = client.geocode_many(codes)
+        mapping = dict((code, geo_code_country(result))
+                       for code, result in results.items() if result)
+        self.update(mapping)
+        return len([c for c in mapping.values() if c])
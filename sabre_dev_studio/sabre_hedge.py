@@ -0,0 +1,172 @@
+import collections
+import contextvars
+import logging
+import threading
+import time
+from concurrent import futures
+
+from sabre.sabre_dev_studio import sabre_configs
+from sabre.sabre_dev_studio.sabre_utils import percentile
+
+
+# Threads running hedged calls, shared by every Hedger of the process
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = futures.ThreadPoolExecutor(
+                    max_workers=sabre_configs.configurations.get('HEDGE_MAX_WORKERS'))
+    return _executor
+
+
+# Hedger
+# Hedged calls to one endpoint or SOAP Action. A call that has not
+# answered after delay() seconds -- the percentile-th latency of the last
+# calls, never below min_delay -- is sent a second time, and whichever
+# answers first wins. Hedges are paid for out of a budget: every call earns
+# `budget` of a hedge (0.05 allows 5% extra traffic), and a hedge is only
+# sent with a whole one saved up.
+#
+# Python threads cannot be interrupted, so the losing call is abandoned
+# rather than aborted: its result is dropped when it finishes, and a call
+# that has not started yet is cancelled. Both calls run in a copy of the
+# caller's context, so they report to the call being measured, if any (see
+# sabre_metrics); latencies and the delay are counted from the moment the
+# first call starts running, not from when it was queued.
+#
+# A call needing a resource of its own (e.g. a SOAP session) passes the
+# second attempt as hedge, and ready to tell whether one is free right now;
+# no hedge is sent when it is not.
+#
+#    Hedger.get('instaflights').call(lambda: fetch(...))
+class Hedger(object):
+
+    _hedgers = {}
+    _lock = threading.Lock()
+
+    def __init__(self, name, percentile=None, min_delay=None, initial_delay=None, min_samples=None,
+                 budget=None, samples=1024):
+        configs = sabre_configs.configurations
+
+        def _opt(value, key):
+            return configs.get(key) if value is None else value
+
+        self.name = name
+        self.percentile = _opt(percentile, 'HEDGE_PERCENTILE')
+        self.min_delay = _opt(min_delay, 'HEDGE_MIN_DELAY')
+        self.initial_delay = _opt(initial_delay, 'HEDGE_INITIAL_DELAY')
+        self.min_samples = _opt(min_samples, 'HEDGE_MIN_SAMPLES')
+        self.budget = _opt(budget, 'HEDGE_BUDGET')
+        # Most hedges that can be saved up for a burst of slow calls
+        self.max_tokens = 10
+
+        self.latencies = collections.deque(maxlen=samples)
+        self.tokens = 0.0
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+
+    # get
+    # String -> Hedger
+    # The hedger of an endpoint name or SOAP Action, created on first use
+    @classmethod
+    def get(cls, name):
+        hedger = cls._hedgers.get(name)
+        if hedger is None:
+            with cls._lock:
+                hedger = cls._hedgers.setdefault(name, cls(name))
+        return hedger
+
+    # delay
+    # () -> Number
+    # Seconds to wait for the first call before hedging
+    def delay(self):
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return self.initial_delay
+            latencies = list(self.latencies)
+        return max(self.min_delay, percentile(latencies, self.percentile))
+
+    def record(self, future, start):
+        if start and not future.cancelled() and future.exception() is None:
+            with self.lock:
+                self.latencies.append(time.time() - start[0])
+
+    def spend(self):
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.counters['over_budget'] += 1
+            return False
+
+    # call
+    # (() -> a) -> (() -> a)? -> (() -> Boolean)? -> a
+    def call(self, fn, hedge=None, ready=None):
+        with self.lock:
+            self.counters['calls'] += 1
+            self.tokens = min(self.max_tokens, self.tokens + self.budget)
+
+        executor = _get_executor()
+        delay = self.delay()
+        start = []
+        started = threading.Event()
+
+        def run():
+            start.append(time.time())
+            started.set()
+            return fn()
+
+        primary = executor.submit(contextvars.copy_context().run, run)
+        primary.add_done_callback(lambda future: self.record(future, start))
+
+        # Time spent queued for a worker does not count against the call
+        started.wait()
+        done, _ = futures.wait([primary], timeout=max(0, start[0] + delay - time.time()))
+        if done:
+            return primary.result()
+        if ready is not None and not ready():
+            self.count('not_ready')
+            return primary.result()
+        if not self.spend():
+            return primary.result()
+
+        self.count('hedged')
+        hedge = executor.submit(contextvars.copy_context().run, hedge or fn)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    if future is primary or error is None:
+                        error = future.exception()
+                    continue
+                for other in pending:
+                    other.cancel()
+                self.count('hedge_wins' if future is hedge else 'primary_wins')
+                return future.result()
+
+        logging.warning("%s: hedged call failed twice", self.name)
+        raise error
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    # stats
+    # () -> Dictionary
+    # calls, hedged (second requests sent), hedge_wins, primary_wins (of the
+    # hedged calls), over_budget and not_ready (hedges not sent) and the
+    # current delay
+    def stats(self):
+        stats = dict.fromkeys(['calls', 'hedged', 'hedge_wins', 'primary_wins', 'over_budget',
+                               'not_ready'], 0)
+        with self.lock:
+            stats.update(self.counters)
+        stats['delay'] = self.delay()
+        return stats
@@ -0,0 +1,388 @@
+import collections
+import contextvars
+import logging
+import threading
+import time
+
+from sabre.sabre_dev_studio import sabre_configs
+
+
+# Phases a call may report, in the order they happen. Streamed calls also
+# report first_byte: from the start of the call to the first chunk of the
+# body, overlapping the phases before it.
+PHASES = ('render', 'connect', 'server_wait', 'first_byte', 'download', 'gunzip', 'parse', 'convert_keys')
+
+# The call being measured in the current thread or task
+_current = contextvars.ContextVar('sabre_call', default=None)
+
+
+# Histogram
+# HDR-style latency histogram: values are kept in microseconds, in
+# buckets exact below 256us and then 128 per power of two, so any
+# percentile is within 1% of the recorded value while memory only grows
+# with the range of values seen
+class Histogram(object):
+    SUB_BUCKETS = 128
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def index(cls, value):
+        bits = value.bit_length()
+        if bits <= 8:
+            return value
+        shift = bits - 8
+        return shift * cls.SUB_BUCKETS + (value >> shift)
+
+    @classmethod
+    def value_at(cls, index):
+        if index < 2 * cls.SUB_BUCKETS:
+            return index
+        shift = index // cls.SUB_BUCKETS - 1
+        # Middle of the bucket
+        return ((index - shift * cls.SUB_BUCKETS) << shift) + (1 << shift) // 2
+
+    # record
+    # Number -> ()
+    # Adds a duration in seconds
+    def record(self, seconds):
+        value = max(0, int(seconds * 1e6))
+        self.counts[self.index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    # percentile
+    # Number -> Number?
+    # The q-th percentile (0-100) in seconds
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = max(1, int(round(q / 100.0 * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                value = min(max(self.value_at(index), self.min), self.max)
+                return value / 1e6
+        return self.max / 1e6
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    # summary
+    # () -> Dictionary
+    # count, sum, min, max, p50, p90, p99 and p999 in seconds
+    def summary(self):
+        summary = {
+            'count': self.count,
+            'sum': self.total / 1e6,
+            'min': self.min / 1e6 if self.count else None,
+            'max': self.max / 1e6 if self.count else None,
+        }
+        for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('p999', 99.9)):
+            summary[name] = self.percentile(q)
+        return summary
+
+
+# CallRecord
+# One measured call: kind ('request', 'get_service', 'authenticate',
+# 'checkout'), name (endpoint name or SOAP Action), phase durations in
+# seconds, bytes sent and received, and the error it raised, if any
+class CallRecord(object):
+    def __init__(self, instrumentation, kind, name, **fields):
+        self.instrumentation = instrumentation
+        self.kind = kind
+        self.name = name
+        self.fields = fields
+        self.phases = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.error = None
+        self.start = None
+        self.duration = None
+        self.token = None
+
+    # add
+    # String -> Number -> ()
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0) + seconds
+
+    # begin
+    # Starts the call and makes it the current one: phases measured from
+    # here on are added to it
+    def begin(self):
+        self.start = time.time()
+        self.token = _current.set(self)
+        self.instrumentation.before(self)
+        return self
+
+    # detach
+    # Stops collecting phases without ending the call, e.g. before a
+    # generator hands control back to its caller
+    def detach(self):
+        if self.token is not None:
+            _current.reset(self.token)
+            self.token = None
+
+    # end
+    # Exception? -> ()
+    def end(self, error=None):
+        self.detach()
+        self.duration = time.time() - self.start
+        self.error = error
+        self.instrumentation.after(self)
+
+    def __enter__(self):
+        return self.begin()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end(exc_value)
+
+
+# _Phase
+# Times a block into the current call's phase, if a call is being measured
+class _Phase(object):
+    __slots__ = ('name', 'record', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.record = _current.get()
+        if self.record is not None:
+            self.start = time.time()
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.record is not None:
+            self.record.add(self.name, time.time() - self.start)
+
+
+# current
+# () -> CallRecord?
+# The call being measured in this thread or task
+def current():
+    return _current.get()
+
+
+# phase
+# String -> context manager
+#    with sabre_metrics.phase('parse'):
+#        ...
+def phase(name):
+    return _Phase(name)
+
+
+# count_bytes
+# Iterable of bytes -> CallRecord -> Boolean -> Generator of bytes
+# Passes chunks through, adding their size to the call's bytes_in. With
+# first_byte, also reports the time from the start of the call to the
+# first chunk.
+def count_bytes(chunks, record, first_byte=False):
+    for chunk in chunks:
+        if first_byte:
+            record.add('first_byte', time.time() - record.start)
+            first_byte = False
+        record.bytes_in += len(chunk)
+        yield chunk
+
+
+class _NullRecord(object):
+    def begin(self):
+        return None
+
+    def detach(self):
+        pass
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+# Instrumentation
+# Pre/post hooks and per (kind, name) histograms of every measured call.
+# Hooks are called with the CallRecord; pre hooks before the call, post
+# hooks after it (with duration, phases, bytes and error filled in). A
+# hook that raises is logged and ignored.
+#
+#    instrumentation.add_hook(post=lambda call: log(call.name, call.duration))
+#    instrumentation.export(PrometheusExporter())
+class Instrumentation(object):
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.pre_hooks = []
+        self.post_hooks = []
+        # (kind, name, phase or 'total') -> Histogram
+        self.histograms = {}
+        # (kind, name) -> Counter of calls, errors, bytes_in, bytes_out
+        self.counters = collections.defaultdict(collections.Counter)
+        self.lock = threading.Lock()
+
+    # default
+    # () -> Instrumentation
+    # The per-process instance; measures nothing unless METRICS is set
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    cls._default = cls(enabled=bool(sabre_configs.configurations.get('METRICS')))
+        return cls._default
+
+    # add_hook
+    # (CallRecord -> ())? -> (CallRecord -> ())? -> ()
+    def add_hook(self, pre=None, post=None):
+        if pre is not None:
+            self.pre_hooks.append(pre)
+        if post is not None:
+            self.post_hooks.append(post)
+
+    def remove_hook(self, hook):
+        for hooks in (self.pre_hooks, self.post_hooks):
+            if hook in hooks:
+                hooks.remove(hook)
+
+    # call
+    # String -> String -> CallRecord
+    # Context manager measuring one call
+    #    with instrumentation.call('request', 'instaflights') as call:
+    #        ...
+    def call(self, kind, name, **fields):
+        if not self.enabled:
+            return _NullRecord()
+        return CallRecord(self, kind, name, **fields)
+
+    def before(self, record):
+        for hook in self.pre_hooks:
+            try:
+                hook(record)
+            except Exception:
+                logging.exception("instrumentation pre hook failed")
+
+    def after(self, record):
+        key = (record.kind, record.name)
+        with self.lock:
+            self.histogram(key + ('total',)).record(record.duration)
+            for name, seconds in record.phases.items():
+                self.histogram(key + (name,)).record(seconds)
+            counters = self.counters[key]
+            counters['calls'] += 1
+            if record.error is not None:
+                counters['errors'] += 1
+            counters['bytes_in'] += record.bytes_in
+            counters['bytes_out'] += record.bytes_out
+
+        for hook in self.post_hooks:
+            try:
+                hook(record)
+            except Exception:
+                logging.exception("instrumentation post hook failed")
+
+    def histogram(self, key):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        return histogram
+
+    # snapshot
+    # () -> [Dictionary]
+    # One entry per (kind, name): its counters and a summary of the total
+    # and of each phase, e.g.
+    #    {'kind': 'request', 'name': 'instaflights', 'calls': 10, 'errors': 0,
+    #     'bytes_in': .., 'bytes_out': .., 'phases': {'total': {...}, 'parse': {...}}}
+    def snapshot(self):
+        with self.lock:
+            entries = {}
+            for key, counters in self.counters.items():
+                entries[key] = dict(counters, kind=key[0], name=key[1], phases={})
+            for (kind, name, phase), histogram in self.histograms.items():
+                entry = entries.get((kind, name))
+                if entry is not None:
+                    entry['phases'][phase] = histogram.summary()
+        return [entries[key] for key in sorted(entries, key=lambda k: (k[0], str(k[1])))]
+
+    # export
+    # Exporter -> a
+    def export(self, exporter):
+        return exporter.export(self.snapshot())
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+# PrometheusExporter
+# Renders a snapshot in the Prometheus text exposition format: a summary
+# per kind/name/phase and counters for calls, errors and bytes
+class PrometheusExporter(object):
+    def __init__(self, prefix='sabre'):
+        self.prefix = prefix
+
+    def export(self, snapshot):
+        seconds = self.prefix + '_call_seconds'
+        lines = ['# TYPE %s summary' % seconds]
+        for entry in snapshot:
+            for phase, summary in sorted(entry['phases'].items()):
+                labels = 'kind="%s",name="%s",phase="%s"' % (entry['kind'], _escape(entry['name']), phase)
+                for q, key in (('0.5', 'p50'), ('0.9', 'p90'), ('0.99', 'p99'), ('0.999', 'p999')):
+                    lines.append('%s{%s,quantile="%s"} %.6f' % (seconds, labels, q, summary[key]))
+                lines.append('%s_sum{%s} %.6f' % (seconds, labels, summary['sum']))
+                lines.append('%s_count{%s} %d' % (seconds, labels, summary['count']))
+
+        for counter in ('calls', 'errors', 'bytes_in', 'bytes_out'):
+            metric = '%s_%s_total' % (self.prefix, counter)
+            lines.append('# TYPE %s counter' % metric)
+            for entry in snapshot:
+                labels = 'kind="%s",name="%s"' % (entry['kind'], _escape(entry['name']))
+                lines.append('%s{%s} %d' % (metric, labels, entry.get(counter, 0)))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# StatsdExporter
+# statsd stand-in: turns a snapshot into statsd lines (gauges for the
+# percentiles, in milliseconds, and counts) and hands them to send, which
+# defaults to keeping them in self.lines, so it works without a server
+class StatsdExporter(object):
+    def __init__(self, send=None, prefix='sabre'):
+        self.prefix = prefix
+        self.lines = []
+        self.send = send or self.lines.append
+
+    def export(self, snapshot):
+        lines = []
+        for entry in snapshot:
+            base = '%s.%s.%s' % (self.prefix, entry['kind'], str(entry['name']).replace('.', '_'))
+            for phase, summary in sorted(entry['phases'].items()):
+                for key in ('p50', 'p90', 'p99'):
+                    lines.append('%s.%s.%s:%.3f|g' % (base, phase, key, summary[key] * 1e3))
+            for counter in ('calls', 'errors', 'bytes_in', 'bytes_out'):
+                lines.append('%s.%s:%d|g' % (base, counter, entry.get(counter, 0)))
+        for line in lines:
+            self.send(line)
+        return lines
@@ -0,0 +1,252 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+
+from sabre.sabre_dev_studio import sabre_configs, sabre_exceptions
+from sabre.sabre_dev_studio.sabre_exceptions import RateLimitTimeout
+
+
+PREFIX_RATE = "sabre_rate_"
+
+# Errors worth retrying after a pause: Sabre is throttling us or overloaded
+RETRY_ERRORS = (sabre_exceptions.SabreErrorRateLimited,
+                sabre_exceptions.SabreErrorServiceUnavailable,
+                sabre_exceptions.SabreErrorGatewayTimeout)
+
+
+# parse_retry_after
+# String? -> Number?
+# Seconds to wait according to a Retry-After header, given either as
+# seconds or as an HTTP date
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+# LocalBucket
+# Token bucket for one process: holds up to burst tokens, refilled at rate
+# tokens per second
+class LocalBucket(object):
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    # take
+    # () -> Number
+    # Takes a token, returning 0, or the seconds until one is available
+    def take(self):
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+# CacheBucket
+# Token bucket shared by every process using the Django cache. The cache
+# has no compare-and-set, so the bucket is kept as a counter per window of
+# burst / rate seconds, incremented with cache.incr: at most burst calls
+# per window, which averages out to rate per second.
+class CacheBucket(object):
+    def __init__(self, name, rate, burst, cache=None, prefix=PREFIX_RATE):
+        if cache is None:
+            from django.core.cache import cache
+        self.name = name
+        self.rate = float(rate)
+        self.burst = int(burst)
+        self.window = self.burst / self.rate
+        self.cache = cache
+        self.prefix = prefix + name + '_'
+
+    def take(self):
+        now = time.time()
+        window = int(now / self.window)
+        key = self.prefix + str(window)
+        self.cache.add(key, 0, int(self.window) + 2)
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            self.cache.add(key, 1, int(self.window) + 2)
+            count = 1
+        if count <= self.burst:
+            return 0
+        return (window + 1) * self.window - now
+
+
+# RateLimiter
+# Client-side rate limits per endpoint family ('shop', 'lists', 'hotels',
+# 'soap', 'default'; see sabre_utils.endpoint_family), configured by
+# RATE_LIMITS as {'rate': calls per second, 'burst': calls}. call() waits
+# for a token before each attempt, and retries calls Sabre throttled or
+# could not serve (429, 503, 504) with jittered exponential backoff,
+# honouring Retry-After when Sabre sends one.
+#
+#    limiter.call('shop', lambda: transport.request(...))
+class RateLimiter(object):
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, limits=None, shared=False, cache=None, timeout=None,
+                 retries=None, backoff=None, backoff_max=None):
+        configs = sabre_configs.configurations
+
+        self.limits = configs.get('RATE_LIMITS', {}) if limits is None else limits
+        self.shared = shared
+        self.cache = cache
+        self.timeout = configs.get('RATE_LIMIT_TIMEOUT') if timeout is None else timeout
+        self.retries = configs.get('BACKOFF_RETRIES') if retries is None else retries
+        self.backoff = configs.get('BACKOFF_BASE') if backoff is None else backoff
+        self.backoff_max = configs.get('BACKOFF_MAX') if backoff_max is None else backoff_max
+
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    # default
+    # () -> RateLimiter?
+    # The per-process limiter configured by RATE_LIMIT_BACKEND: 'local',
+    # 'django' (shared by all processes) or None (no limits, no retries)
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    backend = sabre_configs.configurations.get('RATE_LIMIT_BACKEND')
+                    if backend == 'local':
+                        cls._default = cls()
+                    elif backend == 'django':
+                        cls._default = cls(shared=True)
+                    else:
+                        return None
+        return cls._default
+
+    # bucket
+    # String -> (LocalBucket or CacheBucket)?
+    # The bucket of an endpoint family, None if it is not limited
+    def bucket(self, family):
+        bucket = self.buckets.get(family)
+        if bucket is None and family not in self.buckets:
+            limit = self.limits.get(family, self.limits.get('default'))
+            if limit and limit.get('rate'):
+                rate = limit['rate']
+                burst = limit.get('burst') or rate
+                if self.shared:
+                    bucket = CacheBucket(family, rate, burst, self.cache)
+                else:
+                    bucket = LocalBucket(family, rate, burst)
+            with self.lock:
+                bucket = self.buckets.setdefault(family, bucket)
+        return bucket
+
+    # acquire
+    # String -> Number? -> Number
+    # Waits for a token of the family's bucket, up to timeout seconds, and
+    # returns the time waited. Raises RateLimitTimeout if none came in time.
+    def acquire(self, family, timeout=None):
+        bucket = self.bucket(family)
+        if bucket is None:
+            return 0
+
+        timeout = self.timeout if timeout is None else timeout
+        start = time.time()
+        while True:
+            wait = self.wait(bucket, family, start, timeout)
+            if not wait:
+                return time.time() - start
+            time.sleep(wait)
+
+    # acquire_async
+    # String -> Number? -> Number
+    # acquire for coroutines: waits without blocking the event loop
+    async def acquire_async(self, family, timeout=None):
+        bucket = self.bucket(family)
+        if bucket is None:
+            return 0
+
+        timeout = self.timeout if timeout is None else timeout
+        start = time.time()
+        while True:
+            wait = self.wait(bucket, family, start, timeout)
+            if not wait:
+                return time.time() - start
+            await asyncio.sleep(wait)
+
+    # wait
+    # Takes a token, returning 0, or the seconds to wait for one; raises
+    # RateLimitTimeout if that would go past the timeout
+    def wait(self, bucket, family, start, timeout):
+        wait = bucket.take()
+        if wait and time.time() + wait - start > timeout:
+            raise RateLimitTimeout("no %s rate limit token within %.1fs" % (family, timeout))
+        return wait
+
+    # delay
+    # Int -> Exception -> Number
+    # Pause before retry `attempt` (0 based): Retry-After if Sabre sent one,
+    # else a random time up to backoff * 2 ** attempt (full jitter)
+    def delay(self, attempt, error):
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    # retry_delay
+    # String -> Int -> Exception -> Number
+    # The pause before retrying a failed attempt; re-raises the error once
+    # the retries are used up
+    def retry_delay(self, family, attempt, error):
+        if attempt >= self.retries:
+            raise error
+        delay = self.delay(attempt, error)
+        logging.warning("%s: %s, retry %d/%d in %.2fs", family, error.__class__.__name__,
+                        attempt + 1, self.retries, delay)
+        return delay
+
+    # call
+    # String -> (() -> a) -> a
+    # Calls fn once a token is available, retrying RETRY_ERRORS up to
+    # retries times
+    def call(self, family, fn):
+        attempt = 0
+        while True:
+            self.acquire(family)
+            try:
+                return fn()
+            except RETRY_ERRORS as e:
+                time.sleep(self.retry_delay(family, attempt, e))
+                attempt += 1
+
+    # call_async
+    # String -> (() -> Awaitable of a) -> a
+    # call for coroutines: fn is called for each attempt and awaited
+    async def call_async(self, family, fn):
+        attempt = 0
+        while True:
+            await self.acquire_async(family)
+            try:
+                return await fn()
+            except RETRY_ERRORS as e:
+                await asyncio.sleep(self.retry_delay(family, attempt, e))
+                attempt += 1
@@ -0,0 +1,310 @@
+import datetime
+import hashlib
+import io
+import itertools
+import json
+import mmap
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from urllib.parse import urlencode, urlsplit
+
+from sabre.sabre_dev_studio import sabre_configs, sabre_metrics
+from sabre.sabre_dev_studio.sabre_exceptions import ReplayMissError
+
+
+# Replay files are a header followed by one frame per exchange:
+#    >HI  length of the key, length of the data
+#    key  'METHOD /path[ SOAPAction] digest' (ascii), readable without
+#         inflating the frame so that opening a file only indexes keys
+#    data zlib of the response: a JSON line (status, reason, headers,
+#         encoding, elapsed) and the body, decoded (not gzipped)
+# Frames are appended with a single write, so several recording processes
+# can share one file.
+MAGIC = b'SABRERP1\n'
+FRAME = struct.Struct('>HI')
+
+# Headers describing the body as it came over the wire: bodies are stored
+# decoded and served whole
+_WIRE_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'connection')
+
+# Headers never saved: they carry session state
+_SECRET_HEADERS = ('set-cookie', 'authorization')
+
+REDACTED = b'REDACTED'
+
+_SOAP_ACTION = re.compile(br'<(?:\w+:)?Action>\s*([^<\s]+)\s*<')
+
+
+# request_key
+# String -> String -> Dictionary? -> Object? -> [Pattern] -> String
+# The key of a request: method, path (the host is left out, so fixtures
+# recorded against one environment replay against any), SOAP Action and a
+# digest of the query and the body with the ignore patterns removed
+def request_key(method, url, params=None, data=None, ignore=()):
+    parts = urlsplit(url)
+    query = parts.query
+    if params:
+        query += '&' + urlencode(sorted(params.items()), doseq=True)
+
+    if data is None:
+        body = b''
+    elif isinstance(data, dict):
+        body = urlencode(sorted(data.items()), doseq=True).encode('utf-8')
+    elif isinstance(data, bytes):
+        body = data
+    else:
+        body = data.encode('utf-8')
+
+    group = '%s %s' % (method.upper(), parts.path.rstrip('/') or '/')
+    match = _SOAP_ACTION.search(body)
+    if match:
+        group += ' ' + match.group(1).decode('ascii', 'replace')
+
+    for pattern in ignore:
+        body = pattern.sub(b'', body)
+    digest = hashlib.sha1(query.encode('utf-8') + b'\0' + body).hexdigest()[:16]
+    return group + ' ' + digest
+
+
+def _compile(patterns):
+    return [re.compile(p.encode('utf-8') if not isinstance(p, bytes) else p) for p in patterns]
+
+
+# redact
+# bytes -> [Pattern] -> bytes
+# Replaces the 'secret' group of every match with REDACTED
+def redact(body, patterns):
+    for pattern in patterns:
+        def sub(match):
+            start, end = match.span('secret')
+            offset = match.start()
+            text = match.group(0)
+            return text[:start - offset] + REDACTED + text[end - offset:]
+        body = pattern.sub(sub, body)
+    return body
+
+
+# _ReplayBody
+# Stands in for the urllib3 response under requests.Response.raw, so that
+# streamed calls (iter_content, raw.stream) read a replayed body as well
+class _ReplayBody(io.BytesIO):
+    def stream(self, amt=2 ** 16, decode_content=None):
+        while True:
+            chunk = self.read(amt)
+            if not chunk:
+                break
+            yield chunk
+
+    def release_conn(self):
+        pass
+
+
+# make_response
+# Dictionary -> bytes -> String -> requests.Response
+def make_response(meta, body, url):
+    resp = requests.Response()
+    resp.status_code = meta['status']
+    resp.reason = meta.get('reason')
+    resp.headers = CaseInsensitiveDict(meta.get('headers') or {})
+    resp.encoding = meta.get('encoding')
+    resp.url = url
+    resp.elapsed = datetime.timedelta(seconds=meta.get('elapsed') or 0)
+    resp.raw = _ReplayBody(body)
+    return resp
+
+
+# RecordingTransport
+# Sends every request through a real transport (SabreTransport) and
+# appends the exchange to a replay file. Responses are read whole so they
+# can be saved; streamed calls still get them, from memory. Only responses
+# are stored, never request bodies or headers, and the tokens in them are
+# redacted (REPLAY_REDACT); the caller gets the response unredacted.
+class RecordingTransport(object):
+    def __init__(self, path=None, transport=None, ignore=None, redact=None, level=6):
+        configs = sabre_configs.configurations
+
+        if transport is None:
+            from sabre.sabre_dev_studio.sabre_transport import SabreTransport
+            transport = SabreTransport()
+        self.transport = transport
+        self.path = path or configs.get('REPLAY_FILE')
+        self.ignore = _compile(configs.get('REPLAY_IGNORE', ()) if ignore is None else ignore)
+        self.redact = _compile(configs.get('REPLAY_REDACT', ()) if redact is None else redact)
+        self.level = level
+        self.lock = threading.Lock()
+        self.recorded = 0
+
+        self.file = open(self.path, 'ab', buffering=0)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def request(self, method, url, headers=None, params=None, data=None,
+                stream=False, timeout=None):
+        start = time.time()
+        resp = self.transport.request(method, url, headers=headers, params=params, data=data,
+                                      stream=stream, timeout=timeout)
+        body = resp.content
+        meta = self.record(request_key(method, url, params, data, self.ignore), resp, body,
+                           time.time() - start)
+        if stream:
+            # The body has been read off the socket: serve it from memory
+            resp.close()
+            return make_response(meta, body, url)
+        return resp
+
+    # record
+    # String -> Response -> bytes -> Number -> Dictionary
+    # Appends one exchange and returns its metadata
+    def record(self, key, resp, body, elapsed):
+        meta = {
+            'status': resp.status_code,
+            'reason': resp.reason,
+            'headers': dict((k, v) for k, v in resp.headers.items()
+                            if k.lower() not in _WIRE_HEADERS + _SECRET_HEADERS),
+            'encoding': resp.encoding,
+            'elapsed': round(elapsed, 4),
+        }
+        data = zlib.compress(json.dumps(meta, separators=(',', ':')).encode('utf-8') + b'\n'
+                             + redact(body, self.redact), self.level)
+        key = key.encode('ascii')
+        with self.lock:
+            self.file.write(FRAME.pack(len(key), len(data)) + key + data)
+            self.recorded += 1
+        return meta
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+        self.transport.close()
+
+
+# ReplayTransport
+# Answers requests from a replay file instead of Sabre. The file is
+# memory mapped and only its keys are read up front; a response is
+# inflated the first time it is asked for and kept, so replaying is a dict
+# lookup. Responses recorded more than once for a key are served in turn,
+# always in the same order.
+#
+# latency (seconds, or 'recorded' for the latency of each recorded call,
+# scaled by latency_scale) and jitter (random extra seconds, seeded) are
+# slept before answering, to load test with realistic response times.
+#
+#    client = SabreDevStudio(transport=ReplayTransport('bfm.bin', latency=0.05))
+class ReplayTransport(object):
+    def __init__(self, path=None, latency=None, jitter=None, strict=None, ignore=None,
+                 latency_scale=1.0, seed=0):
+        configs = sabre_configs.configurations
+
+        def _opt(value, key):
+            return configs.get(key) if value is None else value
+
+        self.path = path or configs.get('REPLAY_FILE')
+        self.latency = _opt(latency, 'REPLAY_LATENCY')
+        self.latency_scale = latency_scale
+        self.jitter = _opt(jitter, 'REPLAY_JITTER')
+        self.strict = _opt(strict, 'REPLAY_STRICT')
+        self.ignore = _compile(_opt(ignore, 'REPLAY_IGNORE'))
+        self.random = random.Random(seed)
+
+        # key -> [(offset, length)], group -> [key]
+        self.frames = {}
+        self.groups = {}
+        # (offset, length) -> (meta, body)
+        self.decoded = {}
+        self.turns = {}
+        self.lock = threading.Lock()
+
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("%s is not a replay file" % self.path)
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index()
+
+    # index
+    # () -> ()
+    # Reads the keys of every frame
+    def index(self):
+        offset = len(MAGIC)
+        end = len(self.map)
+        while offset + FRAME.size <= end:
+            key_length, length = FRAME.unpack_from(self.map, offset)
+            offset += FRAME.size
+            if offset + key_length + length > end:
+                # Frame cut short, e.g. a recording that was killed
+                break
+            key = self.map[offset:offset + key_length].decode('ascii')
+            offset += key_length
+            frames = self.frames.get(key)
+            if frames is None:
+                frames = self.frames[key] = []
+                self.groups.setdefault(key.rsplit(' ', 1)[0], []).append(key)
+            frames.append((offset, length))
+            offset += length
+
+    def keys(self):
+        return list(self.frames)
+
+    # lookup
+    # String -> (Dictionary, bytes)
+    def lookup(self, key):
+        frames = self.frames.get(key)
+        if frames is None:
+            if self.strict:
+                raise ReplayMissError(key)
+            group, digest = key.rsplit(' ', 1)
+            keys = self.groups.get(group)
+            if not keys:
+                raise ReplayMissError(key)
+            # Same answer for the same request, every run
+            frames = self.frames[keys[int(digest, 16) % len(keys)]]
+
+        if len(frames) == 1:
+            frame = frames[0]
+        else:
+            with self.lock:
+                turns = self.turns.get(key)
+                if turns is None:
+                    turns = self.turns[key] = itertools.cycle(frames)
+                frame = next(turns)
+
+        decoded = self.decoded.get(frame)
+        if decoded is None:
+            offset, length = frame
+            meta, body = zlib.decompress(self.map[offset:offset + length]).split(b'\n', 1)
+            decoded = self.decoded[frame] = (json.loads(meta.decode('utf-8')), body)
+        return decoded
+
+    # delay
+    # Dictionary -> Number
+    def delay(self, meta):
+        if self.latency == 'recorded':
+            delay = (meta.get('elapsed') or 0) * self.latency_scale
+        else:
+            delay = self.latency or 0
+        if self.jitter:
+            with self.lock:
+                delay += self.random.uniform(0, self.jitter)
+        return delay
+
+    def request(self, method, url, headers=None, params=None, data=None,
+                stream=False, timeout=None):
+        meta, body = self.lookup(request_key(method, url, params, data, self.ignore))
+        delay = self.delay(meta)
+        if delay > 0:
+            time.sleep(delay)
+
+        call = sabre_metrics.current()
+        if call is not None:
+            call.add('server_wait', delay)
+            call.bytes_in += len(body)
+        return make_response(meta, body, url)
+
+    def close(self):
+        self.map.close()
@@ -0,0 +1,645 @@
+import collections
+import logging
+import random
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+from sabre.sabre_dev_studio import sabre_configs, sabre_concurrency
+from sabre.sabre_dev_studio.sabre_metrics import Instrumentation
+from sabre.sabre_dev_studio.sabre_exceptions import SessionPoolExhausted, SabreSessionError
+from sabre.sabre_dev_studio.sabre_utils import percentile
+
+
+PREFIX_SESSION = "session_"
+PREFIX_LEASE = "session_lease_"
+PREFIX_USED = "session_used_"
+POOL_SIZE_KEY = "session_pool_size"
+
+
+# SessionResult
+# Outcome of a pool operation on one slot: the session acted on (None if
+# none could be created), the error if the operation failed, and the
+# session that took its place after a failure, if any
+SessionResult = collections.namedtuple('SessionResult', ['index', 'token', 'error', 'replacement'])
+
+
+# SessionLease
+# One checked out session: use .token as the BinarySecurityToken, then
+# check it back in (or leave the with block)
+class SessionLease(object):
+    def __init__(self, pool, index, token, lease_id, expires):
+        self.pool = pool
+        self.index = index
+        self.token = token
+        self.lease_id = lease_id
+        self.expires = expires
+        self.released = False
+
+    # renew
+    # Number? -> Boolean
+    # Extends the lease for a call that outlives lease_timeout. False if it
+    # had already expired and was reclaimed.
+    def renew(self, lease_timeout=None):
+        return self.pool.renew(self, lease_timeout)
+
+    # release
+    # Boolean -> ()
+    # Checks the session back in; discard drops it from the pool instead
+    def release(self, discard=False):
+        if not self.released:
+            self.released = True
+            self.pool.checkin(self, discard)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+# SessionPool
+# N Sabre SOAP sessions (BinarySecurityTokens) shared by every thread and
+# process using the same Django cache. Slot i holds a token under
+# session_<i>; a caller owns slot i while it holds the lease key
+# session_lease_<i>, taken with cache.add so that exactly one caller gets
+# it. Leases expire after lease_timeout, so the slot of a caller that died
+# without checking in comes back on its own.
+#
+#    with pool.lease() as lease:
+#        values["BinarySecurityToken"] = lease.token
+#        ...
+#
+# When every session is leased, checkout waits up to checkout_timeout for
+# one to come back (woken at once by check-ins in this process, polling
+# for other processes), then raises SessionPoolExhausted.
+#
+# fill, ping_all and close_all talk to Sabre through the create, ping and
+# close callables, up to max_workers sessions at a time:
+#    create is a () -> String? callable returning a new BinarySecurityToken
+#    ping and close are String -> a callables raising when Sabre fails
+#
+# With create set, the pool scales between min_size and max_size sessions:
+# - it grows by one session (in the background) whenever a checkout has
+#   waited grow_wait seconds or more than grow_waiters callers are waiting;
+# - once no resize happened for scale_cooldown seconds, the last session is
+#   closed if it has been idle for shrink_idle seconds.
+# Resizes take a cache lock, so one process resizes at a time and slots
+# stay numbered 0..size-1. stats() reports size, waiters and checkout
+# latency percentiles for this process.
+class SessionPool(object):
+    def __init__(self, create=None, ping=None, close=None, lease_timeout=None, checkout_timeout=None,
+                 max_workers=None, create_attempts=None, min_size=None, max_size=None,
+                 grow_wait=None, grow_waiters=None, shrink_idle=None, scale_cooldown=None, cache=cache,
+                 prefix=PREFIX_SESSION, lease_prefix=PREFIX_LEASE, used_prefix=PREFIX_USED,
+                 size_key=POOL_SIZE_KEY, instrumentation=None):
+        configs = sabre_configs.configurations
+
+        self.create = create
+        self.ping = ping
+        self.close = close
+        self.lease_timeout = configs.get('SESSION_LEASE_TIMEOUT') if lease_timeout is None else lease_timeout
+        self.checkout_timeout = configs.get('SESSION_CHECKOUT_TIMEOUT') if checkout_timeout is None else checkout_timeout
+        self.max_workers = configs.get('SESSION_POOL_WORKERS') if max_workers is None else max_workers
+        self.create_attempts = configs.get('SESSION_CREATE_ATTEMPTS') if create_attempts is None else create_attempts
+        self.min_size = configs.get('SESSION_POOL_MIN') if min_size is None else min_size
+        self.max_size = configs.get('SESSION_POOL_MAX') if max_size is None else max_size
+        self.grow_wait = configs.get('SESSION_GROW_WAIT') if grow_wait is None else grow_wait
+        self.grow_waiters = configs.get('SESSION_GROW_WAITERS') if grow_waiters is None else grow_waiters
+        self.shrink_idle = configs.get('SESSION_SHRINK_IDLE') if shrink_idle is None else shrink_idle
+        self.scale_cooldown = configs.get('SESSION_SCALE_COOLDOWN') if scale_cooldown is None else scale_cooldown
+        self.cache = cache
+        self.prefix = prefix
+        self.lease_prefix = lease_prefix
+        self.used_prefix = used_prefix
+        self.size_key = size_key
+        self.scale_lock_key = size_key + '_lock'
+        self.scaled_at_key = size_key + '_scaled_at'
+
+        self.available = threading.Condition(threading.Lock())
+        self.instrumentation = instrumentation or Instrumentation.default()
+
+        # Per-process statistics
+        self.lock = threading.Lock()
+        self.waiters = 0
+        self.waits = collections.deque(maxlen=1024)
+        self.counters = collections.Counter()
+        self.growing = False
+        self.shrink_checked = 0
+
+    def slot_key(self, index):
+        return self.prefix + str(index)
+
+    def lease_key(self, index):
+        return self.lease_prefix + str(index)
+
+    def used_key(self, index):
+        return self.used_prefix + str(index)
+
+    # size
+    # () -> Int
+    # Number of slots in the pool
+    def size(self):
+        return self.cache.get(self.size_key) or 0
+
+    # tokens
+    # () -> Dictionary
+    # index -> token of every filled slot
+    def tokens(self):
+        size = self.size()
+        keys = [self.slot_key(i) for i in range(size)]
+        found = self.cache.get_many(keys)
+        return dict((i, found[key]) for i, key in enumerate(keys) if found.get(key))
+
+    # populate
+    # [String] -> ()
+    # Replaces the pool with these tokens, dropping every lease
+    def populate(self, tokens):
+        size = self.size()
+        self.cache.delete_many([self.lease_key(i) for i in range(max(size, len(tokens)))])
+        self.cache.delete_many([self.slot_key(i) for i in range(len(tokens), size)])
+        self.cache.delete_many([self.used_key(i) for i in range(len(tokens), size)])
+        self.cache.set_many(dict((self.slot_key(i), token) for i, token in enumerate(tokens)), None)
+        now = time.time()
+        self.cache.set_many(dict((self.used_key(i), now) for i in range(len(tokens))), None)
+        self.cache.set(self.size_key, len(tokens), None)
+        with self.available:
+            self.available.notify_all()
+
+    # clear
+    # () -> ()
+    def clear(self):
+        self.populate([])
+
+    # try_checkout
+    # Int? -> SessionLease?
+    # Leases a free session (slot index only, if given) without waiting.
+    # The lowest free slot is taken, so that under light traffic the last
+    # slots go idle and a pool grown by a burst can shrink back (see
+    # maybe_shrink).
+    def try_checkout(self, index=None):
+        if index is not None:
+            return self._lease_slot(index)
+
+        size = self.size()
+        if not size:
+            return None
+
+        for index in range(size):
+            lease = self._lease_slot(index)
+            if lease is not None:
+                return lease
+        return None
+
+    def _lease_slot(self, index):
+        lease_id = uuid.uuid4().hex
+        if not self.cache.add(self.lease_key(index), lease_id, self.lease_timeout):
+            return None
+
+        token = self.cache.get(self.slot_key(index))
+        if token is None:
+            # Empty slot (failed session not replaced): skip it
+            self.cache.delete(self.lease_key(index))
+            return None
+        return SessionLease(self, index, token, lease_id, time.time() + self.lease_timeout)
+
+    # checkout
+    # Number? -> SessionLease
+    # Leases a session, waiting up to timeout seconds (checkout_timeout by
+    # default) for one to be checked in
+    def checkout(self, timeout=None):
+        with self.instrumentation.call('checkout', 'session_pool'):
+            return self.checkout_once(timeout)
+
+    def checkout_once(self, timeout=None):
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.time()
+        lease = self.try_checkout()
+        if lease is None:
+            with self.lock:
+                self.waiters += 1
+            try:
+                lease = self._wait(start, timeout)
+            finally:
+                with self.lock:
+                    self.waiters -= 1
+
+        with self.lock:
+            self.waits.append(time.time() - start)
+            self.counters['checkouts'] += 1
+        return lease
+
+    def _wait(self, start, timeout):
+        deadline = start + timeout
+        poll = 0.01
+        while True:
+            now = time.time()
+            if now - start >= self.grow_wait or self.waiters > self.grow_waiters:
+                self.grow()
+
+            remaining = deadline - now
+            if remaining <= 0:
+                with self.lock:
+                    self.counters['timeouts'] += 1
+                raise SessionPoolExhausted("no SOAP session available after %.1fs (pool size %d)"
+                                           % (timeout, self.size()))
+            with self.available:
+                self.available.wait(min(poll, remaining))
+            poll = min(poll * 2, 0.25)
+
+            lease = self.try_checkout()
+            if lease is not None:
+                return lease
+
+    # lease
+    # Number? -> SessionLease
+    # checkout, for use as a context manager
+    def lease(self, timeout=None):
+        return self.checkout(timeout)
+
+    # checkin
+    # SessionLease -> Boolean -> ()
+    # Returns a leased session. With discard, the token is dropped from its
+    # slot (e.g. Sabre rejected it) and the slot stays empty until refilled.
+    def checkin(self, lease, discard=False):
+        key = self.lease_key(lease.index)
+        # A lease that expired may already belong to someone else
+        if self.cache.get(key) == lease.lease_id:
+            if discard:
+                self.cache.delete(self.slot_key(lease.index))
+            else:
+                self.cache.set(self.used_key(lease.index), time.time(), None)
+            self.cache.delete(key)
+        elif discard:
+            logging.warning("session %d: lease expired before it was discarded", lease.index)
+
+        with self.available:
+            self.available.notify()
+        self.maybe_shrink()
+
+    # renew
+    # SessionLease -> Number? -> Boolean
+    def renew(self, lease, lease_timeout=None):
+        lease_timeout = self.lease_timeout if lease_timeout is None else lease_timeout
+        key = self.lease_key(lease.index)
+        if self.cache.get(key) != lease.lease_id:
+            return False
+        self.cache.set(key, lease.lease_id, lease_timeout)
+        lease.expires = time.time() + lease_timeout
+        return True
+
+    # leased
+    # () -> Int
+    # Number of sessions currently leased
+    def leased(self):
+        size = self.size()
+        return len(self.cache.get_many([self.lease_key(i) for i in range(size)]))
+
+    # grow
+    # () -> ()
+    # Adds one session in the background, unless the pool is at max_size
+    # or a resize is already running
+    def grow(self):
+        if self.create is None or self.growing or self.size() >= self.max_size:
+            return
+        with self.lock:
+            if self.growing:
+                return
+            self.growing = True
+
+        def run():
+            try:
+                self._resize(self._grow_locked)
+            except Exception:
+                logging.exception("session pool: grow failed")
+            finally:
+                self.growing = False
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def _grow_locked(self):
+        if self.size() >= self.max_size:
+            return False
+        token = self.create_session()
+        self.cache.add(self.size_key, 0, None)
+        index = self.cache.incr(self.size_key) - 1
+        self.cache.set(self.used_key(index), time.time(), None)
+        self.cache.set(self.slot_key(index), token, None)
+        with self.lock:
+            self.counters['grown'] += 1
+        with self.available:
+            self.available.notify_all()
+        logging.info("session pool: grew to %d", index + 1)
+        return True
+
+    # maybe_shrink
+    # Boolean -> ()
+    # Checks, at most every few seconds per process, whether the last
+    # session should be closed; closing happens in the background unless
+    # background is False. Called on checkin and by SessionKeepalive, so
+    # that a pool without traffic shrinks as well.
+    def maybe_shrink(self, background=True):
+        now = time.time()
+        if self.close is None or now - self.shrink_checked < min(5, self.shrink_idle / 10.0):
+            return
+        self.shrink_checked = now
+
+        if self.size() <= self.min_size:
+            return
+        scaled_at = self.cache.get(self.scaled_at_key) or 0
+        if now - scaled_at < self.scale_cooldown:
+            return
+
+        if not background:
+            self.shrink()
+            return
+        thread = threading.Thread(target=self.shrink)
+        thread.daemon = True
+        thread.start()
+
+    def shrink(self):
+        try:
+            self._resize(self._shrink_locked)
+        except Exception:
+            logging.exception("session pool: shrink failed")
+
+    def _shrink_locked(self):
+        size = self.size()
+        if size <= self.min_size:
+            return False
+        index = size - 1
+        last_used = self.cache.get(self.used_key(index)) or 0
+        if time.time() - last_used < self.shrink_idle:
+            return False
+
+        lease = self.try_checkout(index)
+        if lease is None:
+            return False
+        self.cache.delete(self.slot_key(index))
+        self.cache.delete(self.used_key(index))
+        self.cache.decr(self.size_key)
+        self.cache.delete(self.lease_key(index))
+        with self.lock:
+            self.counters['shrunk'] += 1
+        logging.info("session pool: shrank to %d", index)
+
+        try:
+            self.close(lease.token)
+        except Exception as e:
+            logging.warning("session pool: closing idle session failed: %r", e)
+        return True
+
+    # _resize
+    # Runs a grow or shrink step under the cross-process resize lock and
+    # records when the pool last changed size
+    def _resize(self, step):
+        if not self.cache.add(self.scale_lock_key, 1, 2 * self.lease_timeout):
+            return
+        try:
+            if step():
+                self.cache.set(self.scaled_at_key, time.time(), None)
+        finally:
+            self.cache.delete(self.scale_lock_key)
+
+    # stats
+    # () -> Dictionary
+    # size, leased, waiters, min_size, max_size, counters (checkouts,
+    # timeouts, grown, shrunk) and checkout wait percentiles in seconds
+    # (wait_p50, wait_p90, wait_p99, wait_max) over the last 1024 checkouts
+    # in this process
+    def stats(self):
+        with self.lock:
+            waits = list(self.waits)
+            stats = {
+                'waiters': self.waiters,
+                'checkouts': self.counters['checkouts'],
+                'timeouts': self.counters['timeouts'],
+                'grown': self.counters['grown'],
+                'shrunk': self.counters['shrunk'],
+            }
+        stats.update({
+            'size': self.size(),
+            'leased': self.leased(),
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'wait_p50': percentile(waits, 50),
+            'wait_p90': percentile(waits, 90),
+            'wait_p99': percentile(waits, 99),
+            'wait_max': max(waits) if waits else None,
+        })
+        return stats
+
+    # create_session
+    # () -> String
+    # A new session token, trying create up to create_attempts times
+    def create_session(self):
+        error = None
+        for attempt in range(self.create_attempts):
+            try:
+                token = self.create()
+                if token:
+                    return token
+                error = SabreSessionError("SessionCreateRQ returned no BinarySecurityToken")
+            except Exception as e:
+                error = e
+            logging.warning("SessionCreateRQ attempt %d/%d failed: %r", attempt + 1, self.create_attempts, error)
+        raise error
+
+    # fill
+    # Int -> Int? -> [SessionResult]
+    # Replaces the pool with size new sessions, created in parallel. Slots
+    # whose session could not be created are left out rather than holding
+    # None, so the pool may end up smaller than size.
+    def fill(self, size, max_workers=None):
+        def create(index):
+            try:
+                return SessionResult(index, self.create_session(), None, None)
+            except Exception as e:
+                return SessionResult(index, None, e, None)
+
+        results = self._run(create, range(size), max_workers)
+        self.populate([result.token for result in results if result.error is None])
+        return results
+
+    # ping_all
+    # Int? -> Int? -> [SessionResult]
+    # Pings every idle session in parallel (those of the first limit slots
+    # only, if given). A session Sabre rejects is replaced by a new one (its
+    # slot is emptied if that fails too). Sessions leased at the time are
+    # skipped: they are in use anyway.
+    def ping_all(self, max_workers=None, limit=None):
+        def ping(index):
+            lease = self.try_checkout(index)
+            if lease is None:
+                return SessionResult(index, None, None, None)
+            try:
+                self.ping(lease.token)
+            except Exception as e:
+                logging.warning("session %d: ping failed: %r", index, e)
+                return SessionResult(index, lease.token, e, self.replace(lease))
+            lease.release()
+            return SessionResult(index, lease.token, None, None)
+
+        size = self.size()
+        return self._run(ping, range(size if limit is None else min(limit, size)), max_workers)
+
+    # replace
+    # SessionLease -> String?
+    # Puts a new session in the slot of a leased, broken one and releases
+    # the lease. Returns the new token, None if none could be created.
+    def replace(self, lease):
+        try:
+            token = self.create_session()
+        except Exception as e:
+            logging.error("session %d: no replacement: %r", lease.index, e)
+            lease.release(discard=True)
+            return None
+
+        self.cache.set(self.slot_key(lease.index), token, None)
+        lease.release()
+        return token
+
+    # last_used
+    # () -> Dictionary
+    # index -> time a session was last checked in (or pinged), for every slot
+    def last_used(self):
+        keys = [self.used_key(i) for i in range(self.size())]
+        found = self.cache.get_many(keys)
+        return dict((i, found.get(key) or 0) for i, key in enumerate(keys))
+
+    # ping_idle
+    # Number -> Int? -> [SessionResult]
+    # Pings the sessions idle for at least idle seconds, longest idle first,
+    # at most limit of them. Like ping_all, a session Sabre rejects is
+    # replaced and leased ones are skipped.
+    def ping_idle(self, idle, limit=None):
+        now = time.time()
+        due = sorted((used, index) for index, used in self.last_used().items() if now - used >= idle)
+        if limit is not None:
+            due = due[:limit]
+
+        results = []
+        for used, index in due:
+            lease = self.try_checkout(index)
+            if lease is None:
+                continue
+            try:
+                self.ping(lease.token)
+            except Exception as e:
+                logging.warning("session %d: ping failed after %ds idle: %r", index, now - used, e)
+                results.append(SessionResult(index, lease.token, e, self.replace(lease)))
+                continue
+            lease.release()
+            results.append(SessionResult(index, lease.token, None, None))
+        return results
+
+    # close_all
+    # Int? -> Int? -> [SessionResult]
+    # Empties the pool, then closes its sessions on Sabre in parallel. With
+    # limit, only the first limit slots are emptied and closed; the others
+    # stay in the pool.
+    def close_all(self, max_workers=None, limit=None):
+        tokens = self.tokens()
+        if limit is None or limit >= self.size():
+            self.clear()
+        else:
+            tokens = dict((i, token) for i, token in tokens.items() if i < limit)
+            # Empty slots are skipped by checkouts until refilled
+            self.cache.delete_many([self.slot_key(i) for i in tokens])
+
+        def close(index):
+            try:
+                self.close(tokens[index])
+                return SessionResult(index, tokens[index], None, None)
+            except Exception as e:
+                return SessionResult(index, tokens[index], e, None)
+
+        return self._run(close, sorted(tokens), max_workers)
+
+    # _run
+    # Runs fn(index) for every index on up to max_workers threads and
+    # returns the results in index order
+    def _run(self, fn, indexes, max_workers=None):
+        max_workers = self.max_workers if max_workers is None else max_workers
+        results = []
+        for batch in sabre_concurrency.fan_out(fn, [(i,) for i in indexes], max_workers):
+            if batch.error is not None:
+                batch = batch._replace(result=SessionResult(batch.query[0], None, batch.error, None))
+            results.append(batch.result)
+        results.sort(key=lambda result: result.index)
+        return results
+
+
+# SessionKeepalive
+# Background thread keeping the sessions of a pool alive. Sabre drops a
+# session idle for idle_timeout seconds; every interval seconds (with
+# jitter) the thread pings the sessions whose last use is within margin
+# seconds of that, at most max_pings per round and longest idle first.
+# Sessions in use are never pinged, and since a ping counts as a use, each
+# session is pinged at its own pace rather than all at once. A session
+# that fails its ping is replaced (see SessionPool.replace). Any number of
+# processes may run one: pings go through leases, so each session is
+# pinged by one of them.
+#
+#    keepalive = SessionKeepalive(pool)
+#    keepalive.start()
+#    ...
+#    keepalive.stop()
+class SessionKeepalive(object):
+    def __init__(self, pool, idle_timeout=None, margin=None, interval=None, max_pings=None):
+        configs = sabre_configs.configurations
+
+        self.pool = pool
+        self.idle_timeout = configs.get('SESSION_IDLE_TIMEOUT') if idle_timeout is None else idle_timeout
+        self.margin = configs.get('SESSION_KEEPALIVE_MARGIN') if margin is None else margin
+        self.interval = configs.get('SESSION_KEEPALIVE_INTERVAL') if interval is None else interval
+        self.max_pings = configs.get('SESSION_KEEPALIVE_MAX_PINGS') if max_pings is None else max_pings
+
+        self.stopped = threading.Event()
+        self.thread = None
+        self.counters = collections.Counter()
+
+    # run_once
+    # () -> [SessionResult]
+    # One round: closes the last session if the pool can shrink, then pings
+    # the sessions due for it
+    def run_once(self):
+        self.pool.maybe_shrink(background=False)
+        results = self.pool.ping_idle(self.idle_timeout - self.margin, self.max_pings)
+        for result in results:
+            self.counters['pinged'] += 1
+            if result.error is not None:
+                self.counters['failed'] += 1
+                self.counters['replaced' if result.replacement else 'evicted'] += 1
+        return results
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logging.exception("session keepalive failed")
+            # Jitter so that processes started together don't ping in step
+            self.stopped.wait(self.interval * random.uniform(0.5, 1.5))
+
+    # start
+    # () -> SessionKeepalive
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.run, name='sabre-session-keepalive')
+            self.thread.daemon = True
+            self.thread.start()
+        return self
+
+    # stop
+    # Number? -> ()
+    def stop(self, timeout=None):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
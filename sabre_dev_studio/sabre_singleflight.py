@@ -0,0 +1,194 @@
+import asyncio
+import collections
+import logging
+import threading
+import time
+
+from sabre.sabre_dev_studio import sabre_configs
+
+
+PREFIX_FLIGHT = "sabre_flight_"
+
+
+# _Call
+# One in-flight call and the callers waiting on it
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# SingleFlight
+# Coalesces identical concurrent calls: while a call for a key is in
+# flight, other callers with the same key wait for it and share its result
+# (or its exception) instead of calling Sabre again. The shared result is
+# the same object for every caller: treat it as read-only.
+#
+# With shared=True, the first caller across processes also takes a cache
+# lock (cache.add) for the key and publishes its result in the cache for
+# result_ttl seconds; callers in other processes poll for that result and
+# only call Sabre themselves if the lock holder fails or the lock expires
+# (lock_timeout). Results must then be picklable.
+#
+# do_async coalesces coroutines of the same event loop; it does not take
+# the cross-process lock.
+#
+#    single_flight.do(key, lambda: fetch(...))
+#    await single_flight.do_async(key, lambda: fetch_async(...))
+class SingleFlight(object):
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, shared=False, cache=None, lock_timeout=None, result_ttl=None,
+                 prefix=PREFIX_FLIGHT):
+        configs = sabre_configs.configurations
+
+        if shared and cache is None:
+            from django.core.cache import cache
+        self.shared = shared
+        self.cache = cache
+        self.lock_timeout = configs.get('SINGLE_FLIGHT_LOCK_TIMEOUT') if lock_timeout is None else lock_timeout
+        self.result_ttl = configs.get('SINGLE_FLIGHT_RESULT_TTL') if result_ttl is None else result_ttl
+        self.prefix = prefix
+
+        self.calls = {}
+        # (event loop, key) -> asyncio.Future
+        self.async_calls = {}
+        self.lock = threading.Lock()
+        self.counters = collections.Counter()
+
+    # default
+    # () -> SingleFlight?
+    # The per-process instance configured by SINGLE_FLIGHT_BACKEND: 'local'
+    # (threads of this process), 'django' (all processes) or None (off)
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    backend = sabre_configs.configurations.get('SINGLE_FLIGHT_BACKEND')
+                    if backend == 'local':
+                        cls._default = cls()
+                    elif backend == 'django':
+                        cls._default = cls(shared=True)
+                    else:
+                        return None
+        return cls._default
+
+    # do
+    # String -> (() -> a) -> a
+    # Calls fn, unless a call for key is already in flight, in which case
+    # waits for it and returns its result
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.counters['calls'] += 1
+            else:
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self.shared_do(key, fn) if self.shared else fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    # do_async
+    # String -> (() -> Awaitable of a) -> a
+    # do for coroutines: while a call for key is in flight on this event
+    # loop, other coroutines await its result
+    async def do_async(self, key, fn):
+        loop = asyncio.get_running_loop()
+        call_key = (loop, key)
+        with self.lock:
+            future = self.async_calls.get(call_key)
+            leader = future is None
+            if leader:
+                future = self.async_calls[call_key] = loop.create_future()
+                self.counters['calls'] += 1
+            else:
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            # A waiter that is cancelled must not cancel the shared call
+            return await asyncio.shield(future)
+
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved, so that a call nobody joined logs no warning
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.async_calls[call_key]
+
+    # shared_do
+    # String -> (() -> a) -> a
+    # Cross-process part of do: runs fn under the cache lock for key, or
+    # waits for the result of the process holding it
+    def shared_do(self, key, fn):
+        lock_key = self.prefix + 'lock_' + key
+        result_key = self.prefix + 'result_' + key
+        poll = 0.02
+
+        while True:
+            if self.cache.add(lock_key, 1, self.lock_timeout):
+                try:
+                    result = fn()
+                    try:
+                        self.cache.set(result_key, (result,), self.result_ttl)
+                    except Exception as e:
+                        logging.warning("single flight: result not shared: %r", e)
+                    return result
+                finally:
+                    self.cache.delete(lock_key)
+
+            # Another process is calling: wait for its result
+            while True:
+                found = self.cache.get_many([result_key, lock_key])
+                if result_key in found:
+                    self.count('coalesced_remote')
+                    return found[result_key][0]
+                if lock_key not in found:
+                    # It failed, or its result expired: try to lead
+                    break
+                time.sleep(poll)
+                poll = min(poll * 2, 0.25)
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    # stats
+    # () -> Dictionary
+    # calls (made by this process), coalesced (callers that joined a call
+    # in this process) and coalesced_remote (calls answered by another
+    # process's result)
+    def stats(self):
+        stats = dict.fromkeys(['calls', 'coalesced', 'coalesced_remote'], 0)
+        with self.lock:
+            stats.update(self.counters)
+        return stats
@@ -0,0 +1,243 @@
+import codecs
+import collections
+import json
+import re
+import zlib
+from xml.parsers import expat
+
+from sabre import xmltodict
+
+
+# Tokens that matter for finding element boundaries: brackets and whole
+# strings (so brackets inside strings are skipped). A string cut off by the
+# end of the buffer matches with an empty closing group.
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*("|\\?\Z)|[{}\[\]]', re.S)
+
+
+_SEPARATORS = re.compile(r'[\s,]*')
+# What may follow a complete scalar element
+_SCALAR_ENDS = frozenset(' \t\n\r,]')
+_decoder = json.JSONDecoder()
+
+# Largest block of decompressed XML handed to expat at once
+XML_BLOCK_SIZE = 64 * 1024
+
+
+# JsonArrayItems
+# Incremental scanner that pulls the elements of one top-level array out of
+# a JSON document fed in arbitrary chunks, e.g. the PricedItineraries of an
+# InstaFlights response:
+#
+#    scanner = JsonArrayItems('PricedItineraries')
+#    for chunk in chunks:
+#        for itinerary in scanner.feed(chunk):
+#            ...
+#
+# The text before the array is only scanned for brackets and strings; each
+# element is then decoded by the C JSON decoder as soon as it is complete.
+# Only the element being read is buffered, so memory stays flat however
+# large the document is.
+class JsonArrayItems(object):
+    def __init__(self, key):
+        self.key = json.dumps(key)
+        self.buf = ''
+        self.pos = 0
+        self.depth = 0
+        self.key_end = None
+        self.in_array = False
+        self.retry_at = 0
+        self.done = False
+
+    # feed
+    # String -> Boolean -> [Object]
+    # Scans another chunk of text and returns the elements it completed.
+    # final marks the end of the document; an element still incomplete then
+    # raises ValueError.
+    def feed(self, text, final=False):
+        if self.done:
+            return []
+
+        self.buf += text
+        if not self.in_array:
+            self.find_array()
+            if not self.in_array:
+                return []
+        return self.read_items(final)
+
+    # find_array
+    # Skips ahead to just after the '[' opening the array
+    def find_array(self):
+        buf = self.buf
+        pos = self.pos
+
+        for m in _TOKEN.finditer(buf, pos):
+            c = buf[m.start()]
+
+            if c == '"':
+                if m.group(1) != '"':
+                    # String continues in the next chunk
+                    pos = m.start()
+                    break
+                if self.depth == 1:
+                    self.key_end = m.end() if m.group() == self.key else None
+                pos = m.end()
+                continue
+
+            i = m.start()
+            pos = i + 1
+            if c in '{[':
+                if (c == '[' and self.depth == 1 and self.key_end is not None
+                        and buf[self.key_end:i].strip() == ':'):
+                    self.in_array = True
+                    self.key_end = None
+                    break
+                self.key_end = None
+                self.depth += 1
+            else:
+                self.depth -= 1
+        else:
+            pos = len(buf)
+
+        # Keep a pending key and the text after it, drop the rest
+        keep = pos if self.key_end is None else self.key_end
+        self.buf = buf[keep:]
+        self.pos = pos - keep
+        if self.key_end is not None:
+            self.key_end -= keep
+
+    # read_items
+    # Boolean -> [Object]
+    # Decodes the complete elements at the start of the buffer
+    def read_items(self, final):
+        buf = self.buf
+        size = len(buf)
+        if size < self.retry_at and not final:
+            return []
+
+        items = []
+        pos = 0
+        while True:
+            pos = _SEPARATORS.match(buf, pos).end()
+            if pos >= size:
+                break
+            if buf[pos] == ']':
+                self.done = True
+                break
+
+            try:
+                item, end = _decoder.raw_decode(buf, pos)
+            except ValueError:
+                if final:
+                    raise
+                # Incomplete: wait until the buffer has doubled before
+                # decoding this element again
+                self.retry_at = 2 * (size - pos)
+                break
+
+            if (not final and not isinstance(item, (dict, list))
+                    and (end >= size or buf[end] not in _SCALAR_ENDS)):
+                # A number may continue in the next chunk ('-2500.' then
+                # '0'): take it once a separator follows
+                break
+
+            items.append(item)
+            pos = end
+            self.retry_at = 0
+
+        self.buf = buf[pos:]
+        return items
+
+
+# iter_json_array
+# Iterable of bytes -> String -> String? -> Generator of Object
+# Yields the elements of the top-level array `key` from a stream of
+# encoded chunks, as soon as each one is complete
+def iter_json_array(chunks, key, encoding='utf-8'):
+    decoder = codecs.getincrementaldecoder(encoding or 'utf-8')('replace')
+    scanner = JsonArrayItems(key)
+
+    for chunk in chunks:
+        for item in scanner.feed(decoder.decode(chunk)):
+            yield item
+        if scanner.done:
+            return
+
+    for item in scanner.feed(decoder.decode(b'', True), final=True):
+        yield item
+
+
+# iter_xml_items
+# Iterable of bytes -> Int -> String? -> Boolean -> Generator of (path, Dictionary)
+# Parses a (possibly gzipped) XML stream chunk by chunk and yields every
+# element found at item_depth, as soon as its end tag has been read. With
+# item_name, only elements with that local name are yielded. Decompression
+# and parsing are incremental and finished items are not kept, so memory is
+# bounded by the largest item. fast picks xmltodict's fast handler (plain
+# dicts, interned names), which a projection also implies. Extra keyword
+# arguments go to the handler (attr_prefix, dict_constructor, ...).
+def iter_xml_items(chunks, item_depth, item_name=None, fast=True, projection=None, **kwargs):
+    ready = collections.deque()
+    if projection is not None:
+        fast = True
+        kwargs['projection'] = projection
+    handler_class = xmltodict._FastDictSAXHandler if fast else xmltodict._DictSAXHandler
+    handler = handler_class(item_depth=item_depth, **kwargs)
+
+    def collect(path, item):
+        name, attrs = path[-1]
+        if item_name is not None and name.rsplit(':', 1)[-1] != item_name:
+            return True
+        if attrs and handler.xml_attribs:
+            # At item_depth xmltodict leaves the element's own attributes in
+            # path; put them back so items match a full parse
+            node = handler.dict_constructor(
+                (handler.attr_prefix + key, value) for key, value in attrs.items())
+            if isinstance(item, dict):
+                node.update(item)
+            elif item is not None:
+                node[handler.cdata_key] = item
+            item = node
+        ready.append((path, item))
+        return True
+
+    handler.item_callback = collect
+    parser = expat.ParserCreate()
+    parser.ordered_attributes = True
+    parser.buffer_text = True
+    parser.StartElementHandler = handler.startElement
+    parser.EndElementHandler = handler.endElement
+    parser.CharacterDataHandler = handler.characters
+
+    decompressor = None
+    head = b''
+    for chunk in chunks:
+        if head is not None:
+            # Sniff the gzip magic number once two bytes have arrived
+            head += chunk
+            if len(head) < 2:
+                continue
+            if head[:2] == b'\x1f\x8b':
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            chunk, head = head, None
+        if decompressor is None:
+            parser.Parse(chunk, False)
+            while ready:
+                yield ready.popleft()
+            continue
+
+        # SOAP compresses well: inflate at most XML_BLOCK_SIZE bytes at a
+        # time so that one compressed chunk is not expanded all at once
+        while chunk:
+            block = decompressor.decompress(chunk, XML_BLOCK_SIZE)
+            chunk = decompressor.unconsumed_tail
+            parser.Parse(block, False)
+            while ready:
+                yield ready.popleft()
+
+    if head:
+        parser.Parse(head, False)
+    if decompressor is not None:
+        parser.Parse(decompressor.flush(), False)
+    parser.Parse(b'', True)
+    while ready:
+        yield ready.popleft()
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from sabre.sabre_dev_studio import sabre_configs, sabre_metrics
+
+
+# Connections that report the time spent connecting (TCP + TLS) to the
+# call being measured, see sabre_metrics
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        with sabre_metrics.phase('connect'):
+            super(_TimedHTTPConnection, self).connect()
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        with sabre_metrics.phase('connect'):
+            super(_TimedHTTPSConnection, self).connect()
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+# SabreTransport
+# Pooled, keep-alive HTTP transport shared by the REST and SOAP calls.
+# Each instance owns a requests.Session whose HTTPAdapter keeps up to
+# pool_maxsize connections per host open, so repeated calls to api.sabre.com
+# reuse the TCP+TLS connection instead of paying the handshake every time.
+# With pooled=False every call goes through requests.request(), which opens
+# a fresh connection (the old behaviour, kept for benchmarks and debugging).
+class SabreTransport(object):
+
+    _default = None
+    _default_pid = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, pool_connections=None, pool_maxsize=None, pool_block=None,
+                 keep_alive=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, retry_backoff=None, retry_statuses=None,
+                 pooled=True):
+        configs = sabre_configs.configurations
+
+        def _opt(value, key):
+            return configs.get(key) if value is None else value
+
+        self.pool_connections = _opt(pool_connections, 'HTTP_POOL_CONNECTIONS')
+        self.pool_maxsize = _opt(pool_maxsize, 'HTTP_POOL_MAXSIZE')
+        self.pool_block = _opt(pool_block, 'HTTP_POOL_BLOCK')
+        self.keep_alive = _opt(keep_alive, 'HTTP_KEEP_ALIVE')
+        self.timeout = (_opt(connect_timeout, 'HTTP_CONNECT_TIMEOUT'),
+                        _opt(read_timeout, 'HTTP_READ_TIMEOUT'))
+        self.retries = Retry(total=_opt(max_retries, 'HTTP_MAX_RETRIES'),
+                             backoff_factor=_opt(retry_backoff, 'HTTP_RETRY_BACKOFF'),
+                             status_forcelist=_opt(retry_statuses, 'HTTP_RETRY_STATUSES'),
+                             raise_on_status=False)
+        self.pooled = pooled
+        self.session = self.make_session() if pooled else None
+
+    # default
+    # () -> SabreTransport
+    # Returns the per-process transport shared by every client that was not
+    # given its own. A new one is built after a fork so that parent and child
+    # never share sockets. With REPLAY_MODE set, it records to or replays
+    # from REPLAY_FILE (see sabre_replay).
+    @classmethod
+    def default(cls):
+        pid = os.getpid()
+        if cls._default is None or cls._default_pid != pid:
+            with cls._default_lock:
+                if cls._default is None or cls._default_pid != pid:
+                    cls._default = cls.make_default()
+                    cls._default_pid = pid
+        return cls._default
+
+    @classmethod
+    def make_default(cls):
+        mode = sabre_configs.configurations.get('REPLAY_MODE')
+        if mode == 'record':
+            from sabre.sabre_dev_studio.sabre_replay import RecordingTransport
+            return RecordingTransport(transport=cls())
+        if mode == 'replay':
+            from sabre.sabre_dev_studio.sabre_replay import ReplayTransport
+            return ReplayTransport()
+        return cls()
+
+    # make_session
+    # () -> requests.Session
+    # Builds a session with a pooled adapter mounted for http and https
+    def make_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              max_retries=self.retries,
+                              pool_block=self.pool_block)
+        adapter.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    # request
+    # String -> String -> Dictionary? -> Dictionary? -> Object? -> Response
+    # Sends one HTTP request through the pool
+    #    params are added as query params, data is sent as the body
+    def request(self, method, url, headers=None, params=None, data=None,
+                stream=False, timeout=None):
+        headers = headers.copy() if headers else {}
+        if not self.keep_alive:
+            headers['Connection'] = 'close'
+
+        sender = self.session.request if self.pooled else requests.request
+        call = sabre_metrics.current()
+        if call is None:
+            return sender(method, url,
+                          headers=headers,
+                          params=params,
+                          data=data,
+                          stream=stream,
+                          timeout=timeout or self.timeout)
+
+        connect = call.phases.get('connect', 0)
+        start = time.time()
+        resp = sender(method, url,
+                      headers=headers,
+                      params=params,
+                      data=data,
+                      stream=stream,
+                      timeout=timeout or self.timeout)
+        self.measure(call, resp, time.time() - start, call.phases.get('connect', 0) - connect, stream)
+        return resp
+
+    # measure
+    # Reports the phases of one HTTP exchange to the call being measured:
+    # server_wait (request sent until headers read, less connecting),
+    # download (reading the body, unless streamed) and bytes on the wire
+    def measure(self, call, resp, seconds, connect, stream):
+        headers_at = resp.elapsed.total_seconds()
+        call.add('server_wait', max(0, headers_at - connect))
+        if not stream:
+            call.add('download', max(0, seconds - headers_at))
+            try:
+                call.bytes_in += resp.raw.tell() or len(resp.content)
+            except Exception:
+                call.bytes_in += len(resp.content)
+        body = resp.request.body
+        call.bytes_out += len(resp.request.url) + (len(body) if body else 0)
+
+    # close
+    # () -> ()
+    # Closes every pooled connection
+    def close(self):
+        if self.session is not None:
+            self.session.close()
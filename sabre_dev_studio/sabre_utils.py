@@ -6,7 +6,7 @@ import re
 
 import requests
 
-from sabre.sabre_dev_studio import sabre_endpoints
+from sabre.sabre_dev_studio.sabre_configs import sabre_endpoints, soap_projections
 
 
 # Local imports
@@ -16,66 +16,311 @@ from sabre.sabre_dev_studio import sabre_endpoints
 def convert_date(date):
     return date.strftime('%Y-%m-%d')
 
+# endpoint_name
+# String -> String?
+# Finds the sabre_endpoints key of a relative endpoint, e.g.
+# '/v1/lists/supported/countries' -> 'countries_lookup'. Endpoints built by
+# appending to a configured path (flights_to, tagid) map to that entry.
+def endpoint_name(endpoint):
+    path = endpoint.split('?', 1)[0]
+    name = _endpoint_names().get(path.rstrip('/'))
+    if name:
+        return name
+
+    for prefix, name in _endpoint_prefixes:
+        if path.startswith(prefix):
+            return name
+    return None
+
+# endpoint_family
+# String -> String
+# Rate limit family of a relative endpoint: 'hotels' (/shop/hotels),
+# 'shop', 'lists', else 'default'
+def endpoint_family(endpoint):
+    parts = endpoint.split('?', 1)[0].strip('/').split('/')
+    if len(parts) > 2 and parts[1] == 'shop' and parts[2] == 'hotels':
+        return 'hotels'
+    if len(parts) > 1 and parts[1] in ('shop', 'lists'):
+        return parts[1]
+    return 'default'
+
+_endpoint_index = {}
+_endpoint_prefixes = []
+
+def _endpoint_names():
+    if not _endpoint_index:
+        for name, value in sabre_endpoints.items():
+            url = value.get('url') if isinstance(value, dict) else value
+            if not isinstance(url, str) or not url.startswith('/'):
+                continue
+            path = url.split('?', 1)[0].rstrip('/')
+            _endpoint_index.setdefault(path, name)
+            _endpoint_prefixes.append((path + '/', name))
+        # longest prefix wins
+        _endpoint_prefixes.sort(key=lambda p: -len(p[0]))
+    return _endpoint_index
+
+# percentile
+# [Number] -> Number -> Number?
+# The q-th percentile (0-100) of values, nearest rank
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    rank = int(round(q / 100.0 * (len(values) - 1)))
+    return values[min(max(rank, 0), len(values) - 1)]
+
+# soap_projection
+# (String or [String])? -> [String]?
+# Turns a projection given relative to the SOAP response element, or the
+# name of one in soap_projections, into xmltodict paths from the Envelope
+SOAP_RESPONSE_PATH = 'Envelope/Body/*/'
+
+def soap_projection(projection):
+    if projection is None:
+        return None
+    if isinstance(projection, str):
+        projection = soap_projections[projection]
+    return [SOAP_RESPONSE_PATH + path.lstrip('/') for path in projection]
+
+# soap_fault
+# Dictionary -> Dictionary?
+# The Fault element of a parsed SOAP response, if there is one
+def soap_fault(doc):
+    def child(node, name):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key.rsplit(':', 1)[-1] == name:
+                    return value
+        return None
+
+    return child(child(child(doc, 'Envelope'), 'Body'), 'Fault')
+
+# Key pythonizing patterns, compiled once
+_CAMEL_HEAD = re.compile('(.)([A-Z][a-z]+)')
+_CAMEL_TAIL = re.compile('([a-z0-9])([A-Z])')
+_NON_ALNUM = re.compile('[^0-9a-zA-Z]+')
+_LEADING_DIGIT = re.compile('^[0-9]')
+_UNDERSCORES = re.compile('__*')
+_TRAILING_UNDERSCORES = re.compile('_*$')
+
+# Sabre responses reuse a small vocabulary of keys, so each key is converted
+# once and looked up afterwards. The cap keeps data-like keys from growing
+# the cache without bound.
+_key_cache = {}
+_KEY_CACHE_MAX = 65536
+
+# pythonize_key
+# String -> String
+# Converts a Sabre key to a Pythonic name, e.g. 'PricedItineraries' ->
+# 'priced_itineraries', 'PTC_FareBreakdown' -> 'ptc_fare_breakdown'
+def pythonize_key(key):
+    try:
+        return _key_cache[key]
+    except KeyError:
+        pass
+
+    # Camelcase to _
+    s = _CAMEL_HEAD.sub(r'\1_\2', key)
+    s = _CAMEL_TAIL.sub(r'\1_\2', s).lower()
+
+    # Replace non-alphanumeric characters with underscores
+    s = _NON_ALNUM.sub('_', s)
+
+    # Remove leading numbers
+    s = _LEADING_DIGIT.sub('', s)
+
+    # Replace whitespace with underscore
+    s = s.replace(' ', '_')
+
+    # Consolidate duplicate underscores
+    s = _UNDERSCORES.sub('_', s)
+
+    # Remove trailing underscore
+    s = _TRAILING_UNDERSCORES.sub('', s)
+
+    if len(_key_cache) < _KEY_CACHE_MAX:
+        _key_cache[key] = s
+    return s
+
 # convert_keys
-# JSON Dictionary -> ResponseData
-# Converts a dictionary into a python object with Pythonic names
+# JSON Dictionary -> ()
+# Renames the keys of a parsed JSON structure to Pythonic names, in place.
+# Walks the structure with an explicit stack, so deep responses cost no
+# recursion.
 def convert_keys(d):
-    if isinstance(d, list):
-        for elem in d:
-            convert_keys(elem)
-        return
-    elif not isinstance(d, dict):
-        return
+    stack = [d]
+    pop = stack.pop
+    push = stack.append
+
+    while stack:
+        node = pop()
+        if isinstance(node, dict):
+            for key in list(node):
+                value = node[key]
+                s = _key_cache.get(key) or pythonize_key(key)
+                if s != key:
+                    del node[key]
+                    node[s] = value
+                if isinstance(value, (dict, list)):
+                    push(value)
+        elif isinstance(node, list):
+            for value in node:
+                if isinstance(value, (dict, list)):
+                    push(value)
+
+# response_data
+# Object -> Object
+# Wraps parsed JSON in ResponseData (dicts) and ResponseList (lists); other
+# values are returned as they are
+def response_data(value):
+    cls = type(value)
+    if cls is dict:
+        return ResponseData(value)
+    if cls is list:
+        return ResponseList(value)
+    return value
+
+
+# ResponseData
+# dict with Pythonic attribute access over parsed JSON, e.g.
+#    resp.results[0].geo_code_rs.place[0].country
+# It is a plain dict otherwise (original keys, isinstance, json.dumps,
+# mutation). Keys are pythonized only when an attribute is first looked up,
+# and a nested object is wrapped, level by level, the first time it is
+# reached. Each level is a shallow copy: the parsed data it was built from
+# (e.g. a cached response) is never modified.
+#    resp.priced_itineraries     pythonized attribute access
+#    resp['PricedItineraries']   original keys (pythonized names work too)
+class ResponseData(dict):
+    __slots__ = ('_names',)
+
+    def __init__(self, data=()):
+        dict.__init__(self, data)
+        self._names = None
+
+    # _name_index
+    # Boolean -> Dictionary
+    # Pythonized name -> original key, built on first attribute access and
+    # again (rebuild) after keys were added or removed
+    def _name_index(self, rebuild=False):
+        names = self._names
+        if names is None or rebuild:
+            names = {}
+            for key in dict.__iter__(self):
+                if isinstance(key, str):
+                    names.setdefault(_key_cache.get(key) or pythonize_key(key), key)
+            self._names = names
+        return names
+
+    def _key_for(self, name):
+        key = self._name_index().get(name)
+        if key is None or not dict.__contains__(self, key):
+            key = self._name_index(rebuild=True).get(name)
+        return key
+
+    def _wrapped(self, key, value):
+        wrapped = response_data(value)
+        if wrapped is not value:
+            dict.__setitem__(self, key, wrapped)
+        return wrapped
+
+    def _wrap_all(self):
+        for key, value in list(dict.items(self)):
+            self._wrapped(key, value)
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name == '_names':
+            raise AttributeError(name)
+        key = self._key_for(name)
+        if key is None:
+            raise AttributeError(name)
+        return self._wrapped(key, dict.__getitem__(self, key))
+
+    def __getitem__(self, key):
+        try:
+            value = dict.__getitem__(self, key)
+        except KeyError:
+            name = self._key_for(key) if isinstance(key, str) else None
+            if name is None:
+                raise
+            key = name
+            value = dict.__getitem__(self, key)
+        return self._wrapped(key, value)
 
-    for key in d.keys():
-        # Pythonize
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
 
-        # Camelcase to _
-        s = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', key)
-        s = re.sub('([a-z0-9])([A-Z])', r'\1_\2', s).lower()
+    def values(self):
+        self._wrap_all()
+        return dict.values(self)
 
-        # Replace non-alphanumeric characters with underscores
-        s = re.sub('[^0-9a-zA-Z]+', '_', s)
+    def items(self):
+        self._wrap_all()
+        return dict.items(self)
 
-        # Remove leading numbers
-        s = re.sub('^[0-9]', '', s)
+    def pop(self, key, *default):
+        return response_data(dict.pop(self, key, *default))
 
-        # Replace whitespace with underscore
-        s = s.replace(' ', '_')
+    def popitem(self):
+        key, value = dict.popitem(self)
+        return key, response_data(value)
 
-        # Consolidate duplicate underscores
-        s = re.sub('__*', '_', s)
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return default
 
-        # Remove trailing underscore
-        s = re.sub('_*$', '', s)
+    def copy(self):
+        self._wrap_all()
+        return ResponseData(self)
 
-        d[s] = d[key]
-        if s != key:
-            del d[key]
+    def __dir__(self):
+        return sorted(set(dict.__dir__(self)) | set(self._name_index(rebuild=True)))
 
-        convert_keys(d[s])
+    def __repr__(self):
+        return 'ResponseData(%s)' % dict.__repr__(self)
+
+    # namedtuple compatibility
+    @property
+    def _fields(self):
+        return tuple(self._name_index(rebuild=True))
+
+    def _asdict(self):
+        return self
+
+
+# ResponseList
+# list counterpart of ResponseData: elements are wrapped as they are read
+class ResponseList(list):
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        value = list.__getitem__(self, index)
+        wrapped = response_data(value)
+        if wrapped is not value:
+            list.__setitem__(self, index, wrapped)
+        return wrapped
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def pop(self, *index):
+        return response_data(list.pop(self, *index))
+
+    def __repr__(self):
+        return 'ResponseList(%s)' % list.__repr__(self)
 
 # country_code_lookup
-# String -> String?
-# Finds a country code given an airport/city code
+# SabreDevStudio -> String -> String?
+# Finds a country code given an airport/city code, through the client's
+# memoized country index
 def country_code_lookup(self, code):
-    opts = [{
-        "GeoCodeRQ": {
-            "PlaceById": {
-                "Id": code,
-                "BrowseCategory": {
-                    "name": "AIR"
-                }
-            }
-        }
-    }]
-
-    try:
-        resp = self.request('POST',
-                            sabre_endpoints['geo_code'],
-                            json.dumps(opts, sort_keys=True),
-                            additional_headers={'Content-Type': 'application/json'})
-        code = resp.results[0].geo_code_rs.place[0].country
-        return code
-    except:
-        return None
+    return self.country_code_lookup(code)
@@ -0,0 +1,19 @@
+# Tests for the Sabre client. Run them with unittest or pytest from the
+# directory holding the package, e.g.
+#     python -m unittest discover -s sabre/tests -t .
+# Nothing here talks to Sabre: every test runs against the local stub in
+# benchmarks/stub_server.py.
+
+from sabre.benchmarks import setup_django
+
+# Set before the client is imported: Session builds its client, with the
+# configured caches, at import time. Tests that exercise them pass their
+# own instances.
+setup_django(SABRE={
+    'TEST': True,
+    'WSDL_URL': 'http://127.0.0.1:0/',
+    'RESPONSE_CACHE_BACKEND': None,
+    'SINGLE_FLIGHT_BACKEND': None,
+    'RATE_LIMIT_BACKEND': None,
+    'TOKEN_SHARED_CACHE': False,
+})
@@ -0,0 +1,68 @@
+import itertools
+import json
+import threading
+import uuid
+
+from sabre.benchmarks.stub_server import StubServer
+from sabre.sabre_dev_studio.sabre_session import SessionPool
+
+
+# ScriptedStub
+# StubServer that can be told how to answer the next calls to a path:
+#    stub.script('/v1/shop/flights', (429, {'message': 'slow down'}, {'Retry-After': '1'}), 200)
+# Each reply is a status, or (status, body[, headers]); once a path's
+# script runs out it is served as usual. Every request is logged in
+# stub.requests as (method, path).
+class ScriptedStub(StubServer):
+    def __init__(self, *args, **kwargs):
+        super(ScriptedStub, self).__init__(*args, **kwargs)
+        self.scripts = {}
+        self.requests = []
+        self.script_lock = threading.Lock()
+
+    def script(self, path, *replies):
+        with self.script_lock:
+            self.scripts.setdefault(path.rstrip('/'), []).extend(replies)
+
+    def route(self, method, path, body=b''):
+        with self.script_lock:
+            self.requests.append((method, path))
+            replies = self.scripts.get(path.rstrip('/'))
+            reply = replies.pop(0) if replies else None
+
+        if reply is None:
+            return super(ScriptedStub, self).route(method, path, body)
+        if not isinstance(reply, tuple):
+            reply = (reply, {'status': reply})
+        status, payload = reply[:2]
+        headers = reply[2] if len(reply) > 2 else {}
+        return status, 'application/json', json.dumps(payload).encode('utf-8'), headers
+
+    # calls
+    # String -> Int
+    # Number of requests made to a path
+    def calls(self, path):
+        path = path.rstrip('/')
+        with self.script_lock:
+            return sum(1 for method, p in self.requests if p.rstrip('/') == path)
+
+
+# make_pool
+# Keyword arguments -> SessionPool
+# A pool with its own cache keys, creating 'session0', 'session1', ...
+def make_pool(created=None, pinged=None, closed=None, **kwargs):
+    counter = itertools.count()
+    prefix = 'test_%s_' % uuid.uuid4().hex
+
+    def create():
+        token = 'session%d' % next(counter)
+        if created is not None:
+            created.append(token)
+        return token
+
+    kwargs.setdefault('max_workers', 2)
+    return SessionPool(create=create,
+                       ping=pinged.append if pinged is not None else lambda token: None,
+                       close=closed.append if closed is not None else lambda token: None,
+                       prefix=prefix + 'slot_', lease_prefix=prefix + 'lease_',
+                       used_prefix=prefix + 'used_', size_key=prefix + 'size', **kwargs)
@@ -0,0 +1,371 @@
+import asyncio
+import time
+import unittest
+
+from sabre.benchmarks import fixtures
+from sabre.benchmarks.stub_server import TOKEN_RESPONSE
+from sabre.sabre_dev_studio import sabre_configs, sabre_exceptions
+from sabre.sabre_dev_studio.sabre_async import AsyncSabreDevStudio
+from sabre.sabre_dev_studio.sabre_breaker import OPEN, CircuitBreakers
+from sabre.sabre_dev_studio.sabre_cache import LocalLRUBackend, ResponseCache
+from sabre.sabre_dev_studio.sabre_configs import sabre_endpoints
+from sabre.sabre_dev_studio.sabre_metrics import Instrumentation
+from sabre.sabre_dev_studio.sabre_ratelimit import RateLimiter
+from sabre.sabre_dev_studio.sabre_singleflight import SingleFlight
+from sabre.tests.stub import ScriptedStub
+
+
+INSTAFLIGHTS = sabre_endpoints['instaflights']
+LEAD_PRICE = sabre_endpoints['lead_price']
+COUNTRIES = sabre_endpoints['countries_lookup']
+
+
+class AsyncClientTest(unittest.IsolatedAsyncioTestCase):
+    latency = 0
+
+    def setUp(self):
+        self.stub = ScriptedStub(latency=self.latency, routes={
+            INSTAFLIGHTS: fixtures.instaflights_response(3),
+            LEAD_PRICE: fixtures.lead_price_response(4),
+        }, soap={
+            'BargainFinderMaxRQ': fixtures.bargain_finder_max_response(2),
+        }).start()
+        self.addCleanup(self.stub.stop)
+
+        self.wsdl_url = sabre_configs.configurations['WSDL_URL']
+        sabre_configs.configurations['WSDL_URL'] = self.stub.soap_url
+        self.addCleanup(sabre_configs.configurations.__setitem__, 'WSDL_URL', self.wsdl_url)
+
+    async def asyncSetUp(self):
+        self.sabre = AsyncSabreDevStudio()
+        self.sabre.host = self.stub.url
+        self.sabre.set_credentials('client', 'secret')
+        self.sabre.rate_limiter = None
+
+    async def asyncTearDown(self):
+        await self.sabre.close()
+
+
+class AuthenticateTest(AsyncClientTest):
+    async def test_authenticate_stores_token(self):
+        await self.sabre.authenticate()
+        self.assertEqual(self.sabre.token, TOKEN_RESPONSE['access_token'])
+        self.assertFalse(self.sabre.token_manager.expiring())
+
+    async def test_authenticate_without_credentials(self):
+        self.sabre.client_id = None
+        with self.assertRaises(sabre_exceptions.NoCredentialsProvided):
+            await self.sabre.authenticate()
+
+    async def test_request_without_token(self):
+        self.sabre.set_credentials(None, None)
+        with self.assertRaises(sabre_exceptions.NotAuthorizedError):
+            await self.sabre.instaflights({'origin': 'JFK'})
+
+    async def test_unauthenticated_request_is_replayed_with_new_token(self):
+        self.sabre.token = 'revoked'
+        self.stub.script(INSTAFLIGHTS, (401, {'status': 'NotAuthorized'}))
+
+        resp = await self.sabre.instaflights({'origin': 'JFK', 'destination': 'LAX'})
+
+        self.assertEqual(len(resp.priced_itineraries), 3)
+        self.assertEqual(self.sabre.token, TOKEN_RESPONSE['access_token'])
+        self.assertEqual(self.stub.calls(INSTAFLIGHTS), 2)
+
+    async def test_unauthenticated_without_credentials_raises(self):
+        self.sabre.set_credentials(None, None)
+        self.sabre.token = 'revoked'
+        self.stub.script(INSTAFLIGHTS, (401, {'status': 'NotAuthorized'}))
+
+        with self.assertRaises(sabre_exceptions.SabreErrorUnauthenticated):
+            await self.sabre.instaflights({'origin': 'JFK'})
+
+
+class RestWrappersTest(AsyncClientTest):
+    async def asyncSetUp(self):
+        await super(RestWrappersTest, self).asyncSetUp()
+        await self.sabre.authenticate()
+
+    async def test_instaflights(self):
+        resp = await self.sabre.instaflights({'origin': 'JFK', 'destination': 'LAX'})
+        itinerary = resp.priced_itineraries[0]
+        self.assertTrue(itinerary.air_itinerary_pricing_info.ptc_fare_breakdowns)
+
+    async def test_lead_price(self):
+        resp = await self.sabre.lead_price('JFK', 'LAX', [5, 7], point_of_sale='US')
+        self.assertEqual(len(resp.fare_info), 4)
+        self.assertEqual(resp.origin_location, 'JFK')
+
+    async def test_return_obj_false_gives_dicts(self):
+        self.sabre.return_obj = False
+        resp = await self.sabre.lead_price_opts({'origin': 'JFK', 'destination': 'LAX'})
+        self.assertIsInstance(resp, dict)
+        self.assertIn('FareInfo', resp)
+
+    async def test_get_service(self):
+        resp = await self.sabre.get_service({
+            'Action': 'BargainFinderMaxRQ',
+            'Service': 'BargainFinderMaxRQ',
+            'BinarySecurityToken': 'session',
+            'origin': 'JFK',
+            'destination': 'LAX',
+            'date_departure': '2026-11-01T00:00:00',
+            'date_arrival': '2026-11-08T00:00:00',
+        })
+        self.assertIn('soap-env:Envelope', resp)
+
+
+class ConcurrencyTest(AsyncClientTest):
+    latency = 0.2
+
+    async def test_gather_runs_requests_concurrently(self):
+        await self.sabre.authenticate()
+
+        start = time.time()
+        results = await asyncio.gather(*[
+            self.sabre.instaflights({'origin': 'JFK', 'destination': 'LAX', 'limit': i})
+            for i in range(10)
+        ])
+        elapsed = time.time() - start
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(self.stub.calls(INSTAFLIGHTS), 10)
+        # One after the other would take 10 * latency
+        self.assertLess(elapsed, 5 * self.latency)
+
+
+class SingleFlightTest(AsyncClientTest):
+    latency = 0.1
+
+    async def asyncSetUp(self):
+        await super(SingleFlightTest, self).asyncSetUp()
+        await self.sabre.authenticate()
+        self.sabre.single_flight = SingleFlight()
+
+    async def test_identical_requests_share_one_call(self):
+        results = await asyncio.gather(*[
+            self.sabre.instaflights({'origin': 'JFK', 'destination': 'LAX'}) for _ in range(10)
+        ])
+
+        self.assertEqual(self.stub.calls(INSTAFLIGHTS), 1)
+        self.assertTrue(all(len(result.priced_itineraries) == 3 for result in results))
+        self.assertEqual(self.sabre.single_flight.stats()['coalesced'], 9)
+
+    async def test_different_requests_are_not_coalesced(self):
+        await asyncio.gather(*[
+            self.sabre.instaflights({'origin': 'JFK', 'destination': 'LAX', 'limit': i}) for i in range(3)
+        ])
+        self.assertEqual(self.stub.calls(INSTAFLIGHTS), 3)
+
+    async def test_error_is_shared(self):
+        self.stub.script(INSTAFLIGHTS, 404)
+        results = await asyncio.gather(*[
+            self.sabre.instaflights({'origin': 'JFK'}) for _ in range(3)
+        ], return_exceptions=True)
+
+        self.assertEqual(self.stub.calls(INSTAFLIGHTS), 1)
+        for result in results:
+            self.assertIsInstance(result, sabre_exceptions.SabreErrorNotFound)
+
+    async def test_cancelled_waiter_does_not_cancel_the_call(self):
+        leader = asyncio.ensure_future(self.sabre.instaflights({'origin': 'JFK'}))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(self.sabre.instaflights({'origin': 'JFK'}))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+
+        resp = await leader
+        self.assertEqual(len(resp.priced_itineraries), 3)
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+
+class ErrorStatusTest(AsyncClientTest):
+    async def asyncSetUp(self):
+        await super(ErrorStatusTest, self).asyncSetUp()
+        await self.sabre.authenticate()
+
+    async def assertStatusRaises(self, status, error):
+        self.stub.script(INSTAFLIGHTS, status)
+        with self.assertRaises(error) as raised:
+            await self.sabre.instaflights({'origin': 'JFK'})
+        return raised.exception
+
+    async def test_bad_request(self):
+        await self.assertStatusRaises(400, sabre_exceptions.SabreErrorBadRequest)
+
+    async def test_forbidden(self):
+        await self.assertStatusRaises(403, sabre_exceptions.SabreErrorForbidden)
+
+    async def test_not_found(self):
+        await self.assertStatusRaises(404, sabre_exceptions.SabreErrorNotFound)
+
+    async def test_internal_server_error(self):
+        await self.assertStatusRaises(500, sabre_exceptions.SabreInternalServerError)
+
+    async def test_rate_limited_reads_retry_after(self):
+        error = await self.assertStatusRaises((429, {'status': 'slow down'}, {'Retry-After': '7'}),
+                                              sabre_exceptions.SabreErrorRateLimited)
+        self.assertEqual(error.retry_after, 7)
+
+    async def test_service_unavailable(self):
+        error = await self.assertStatusRaises(503, sabre_exceptions.SabreErrorServiceUnavailable)
+        self.assertIsNone(error.retry_after)
+
+    async def test_gateway_timeout(self):
+        await self.assertStatusRaises(504, sabre_exceptions.SabreErrorGatewayTimeout)
+
+    async def test_rate_limiter_retries_after_retry_after(self):
+        self.sabre.rate_limiter = RateLimiter(limits={}, retries=2, backoff=0.01)
+        self.stub.script(INSTAFLIGHTS, (429, {'status': 'slow down'}, {'Retry-After': '0.05'}), 503)
+
+        resp = await self.sabre.instaflights({'origin': 'JFK'})
+
+        self.assertEqual(len(resp.priced_itineraries), 3)
+        self.assertEqual(self.stub.calls(INSTAFLIGHTS), 3)
+
+    async def test_rate_limiter_gives_up(self):
+        self.sabre.rate_limiter = RateLimiter(limits={}, retries=1, backoff=0.01)
+        self.stub.script(INSTAFLIGHTS, 503, 503, 503)
+
+        with self.assertRaises(sabre_exceptions.SabreErrorServiceUnavailable):
+            await self.sabre.instaflights({'origin': 'JFK'})
+        self.assertEqual(self.stub.calls(INSTAFLIGHTS), 2)
+
+
+class BreakerTest(AsyncClientTest):
+    async def asyncSetUp(self):
+        await super(BreakerTest, self).asyncSetUp()
+        await self.sabre.authenticate()
+        self.sabre.breakers = CircuitBreakers(overrides={
+            'instaflights': {'window': 4, 'min_calls': 4, 'failure_rate': 0.5, 'open_seconds': 60},
+        })
+
+    async def test_failures_open_the_circuit(self):
+        self.stub.script(INSTAFLIGHTS, 503, 503, 503, 503)
+        for _ in range(4):
+            with self.assertRaises(sabre_exceptions.SabreErrorServiceUnavailable):
+                await self.sabre.instaflights({'origin': 'JFK'})
+
+        breaker = self.sabre.breakers.get('instaflights')
+        self.assertEqual(breaker.state, OPEN)
+        with self.assertRaises(sabre_exceptions.CircuitOpenError):
+            await self.sabre.instaflights({'origin': 'JFK'})
+        self.assertEqual(self.stub.calls(INSTAFLIGHTS), 4)
+
+    async def test_client_errors_do_not_count(self):
+        self.stub.script(INSTAFLIGHTS, 404, 404, 404, 404)
+        for _ in range(4):
+            with self.assertRaises(sabre_exceptions.SabreErrorNotFound):
+                await self.sabre.instaflights({'origin': 'JFK'})
+
+        resp = await self.sabre.instaflights({'origin': 'JFK'})
+        self.assertEqual(len(resp.priced_itineraries), 3)
+        self.assertEqual(self.sabre.breakers.get('instaflights').stats()['successes'], 5)
+
+    async def test_retry_after_does_not_trip_the_circuit(self):
+        self.sabre.rate_limiter = RateLimiter(limits={}, retries=3, backoff=0.01)
+        self.stub.script(INSTAFLIGHTS, *[(429, {'status': 'slow down'}, {'Retry-After': '0.01'})] * 3)
+
+        resp = await self.sabre.instaflights({'origin': 'JFK'})
+
+        self.assertEqual(len(resp.priced_itineraries), 3)
+        self.assertNotEqual(self.sabre.breakers.get('instaflights').state, OPEN)
+
+
+class InstrumentationTest(AsyncClientTest):
+    latency = 0.05
+
+    async def asyncSetUp(self):
+        await super(InstrumentationTest, self).asyncSetUp()
+        self.sabre.instrumentation = Instrumentation()
+        self.calls = []
+        self.sabre.instrumentation.add_hook(post=self.calls.append)
+
+    async def test_request_phases(self):
+        await self.sabre.authenticate()
+        await self.sabre.instaflights({'origin': 'JFK', 'destination': 'LAX'})
+
+        self.assertEqual([(c.kind, c.name) for c in self.calls],
+                         [('authenticate', 'token'), ('request', 'instaflights')])
+        call = self.calls[1]
+        self.assertIsNone(call.error)
+        self.assertEqual(call.fields['method'], 'GET')
+        self.assertGreaterEqual(call.phases['server_wait'], self.latency)
+        self.assertIn('download', call.phases)
+        self.assertIn('parse', call.phases)
+        self.assertIn('convert_keys', call.phases)
+        self.assertGreater(call.bytes_in, 0)
+        self.assertGreater(call.bytes_out, 0)
+        self.assertIn('parse', self.calls[0].phases)
+
+    async def test_concurrent_calls_are_measured_apart(self):
+        await self.sabre.authenticate()
+        await asyncio.gather(*[
+            self.sabre.instaflights({'origin': 'JFK', 'limit': i}) for i in range(5)
+        ])
+
+        snapshot = dict((entry['name'], entry) for entry in self.sabre.instrumentation.snapshot())
+        self.assertEqual(snapshot['instaflights']['calls'], 5)
+        self.assertEqual(snapshot['instaflights']['phases']['server_wait']['count'], 5)
+        for call in self.calls[1:]:
+            # One HTTP exchange each, not the sum of those in flight
+            self.assertLess(call.phases['server_wait'], 4 * self.latency)
+
+    async def test_get_service_and_errors(self):
+        await self.sabre.authenticate()
+        await self.sabre.get_service({
+            'Action': 'BargainFinderMaxRQ',
+            'Service': 'BargainFinderMaxRQ',
+            'BinarySecurityToken': 'session',
+        })
+        self.stub.script(INSTAFLIGHTS, 404)
+        with self.assertRaises(sabre_exceptions.SabreErrorNotFound):
+            await self.sabre.instaflights({'origin': 'JFK'})
+
+        service, failed = self.calls[1:]
+        self.assertEqual((service.kind, service.name), ('get_service', 'BargainFinderMaxRQ'))
+        self.assertIn('render', service.phases)
+        self.assertIn('parse', service.phases)
+        self.assertIsInstance(failed.error, sabre_exceptions.SabreErrorNotFound)
+
+
+class ResponseCacheTest(AsyncClientTest):
+    async def asyncSetUp(self):
+        await super(ResponseCacheTest, self).asyncSetUp()
+        await self.sabre.authenticate()
+        self.sabre.response_cache = ResponseCache(LocalLRUBackend(), policies={
+            'countries_lookup': {'ttl': 60, 'stale': 60},
+        })
+
+    async def test_cached_endpoint_is_fetched_once(self):
+        first = await self.sabre.countries_lookup('US')
+        second = await self.sabre.countries_lookup('US')
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.stub.calls(COUNTRIES), 1)
+        self.assertEqual(self.sabre.response_cache.stats()['hits'], 1)
+
+    async def test_stale_entry_is_served_and_revalidated(self):
+        cache = self.sabre.response_cache
+        cache.policies['countries_lookup'] = {'ttl': 0, 'stale': 60}
+
+        await self.sabre.countries_lookup('US')
+        await self.sabre.countries_lookup('US')
+        for _ in range(50):
+            if cache.stats()['revalidations']:
+                break
+            await asyncio.sleep(0.01)
+
+        self.assertEqual(cache.stats()['stale_hits'], 1)
+        self.assertEqual(cache.stats()['revalidations'], 1)
+        self.assertEqual(self.stub.calls(COUNTRIES), 2)
+
+    async def test_uncached_endpoint_is_not_cached(self):
+        await self.sabre.instaflights({'origin': 'JFK'})
+        await self.sabre.instaflights({'origin': 'JFK'})
+        self.assertEqual(self.stub.calls(INSTAFLIGHTS), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import threading
+import time
+import unittest
+import uuid
+
+from django.core.cache import cache
+
+from sabre.benchmarks.stub_server import StubServer, TOKEN_RESPONSE
+from sabre.sabre_dev_studio.sabre_auth import TokenManager
+from sabre.sabre_dev_studio.sabre_dev_studio import SabreDevStudio
+
+
+class TokenManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.fetched = 0
+        self.release = threading.Event()
+        self.manager = TokenManager(self.fetch, refresh_skew=60, shared=False)
+
+    def fetch(self):
+        self.fetched += 1
+        self.release.wait(5)
+        return 'token%d' % self.fetched, 3600
+
+    def test_one_background_refresh_at_a_time(self):
+        self.manager.store('old', 30)
+        start = threading.Barrier(20)
+
+        def get():
+            start.wait()
+            self.assertEqual(self.manager.get_token(), 'old')
+
+        threads = [threading.Thread(target=get) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.release.set()
+        for _ in range(100):
+            if not self.manager.refreshing:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(self.fetched, 1)
+        self.assertEqual(self.manager.get_token(), 'token1')
+
+
+class SharedTokenTest(unittest.TestCase):
+    def setUp(self):
+        self.key = TokenManager.make_cache_key(uuid.uuid4().hex, 'https://api.test')
+        self.addCleanup(cache.delete, self.key)
+        self.fetched = []
+
+    def manager(self, name):
+        def fetch():
+            self.fetched.append(name)
+            return name, 3600
+        return TokenManager(fetch, cache_key=self.key, refresh_skew=60, shared=True)
+
+    def test_second_manager_adopts_without_fetching(self):
+        first, second = self.manager('first'), self.manager('second')
+        self.assertEqual(first.get_token(), None)
+        self.assertEqual(first.refresh(), 'first')
+
+        self.assertEqual(second.get_token(), 'first')
+        self.assertEqual(second.refresh(), 'first')
+        self.assertEqual(self.fetched, ['first'])
+
+    def test_rejected_token_is_not_adopted(self):
+        first, second = self.manager('first'), self.manager('second')
+        first.refresh()
+        self.assertEqual(second.refresh(stale='first'), 'second')
+        self.assertEqual(self.fetched, ['first', 'second'])
+
+
+class SharedAuthenticateTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubServer().start()
+        self.addCleanup(self.stub.stop)
+        self.client_id = uuid.uuid4().hex
+        key = TokenManager.make_cache_key(self.client_id, self.stub.url)
+        self.addCleanup(cache.delete, key)
+
+    def client(self):
+        client = SabreDevStudio()
+        client.host = self.stub.url
+        client.token_manager.shared = True
+        client.set_credentials(self.client_id, 'secret')
+        return client
+
+    def test_workers_share_one_token(self):
+        first = self.client()
+        first.authenticate()
+        calls = self.stub.count
+
+        second = self.client()
+        second.authenticate()
+        self.assertEqual(second.token, TOKEN_RESPONSE['access_token'])
+        self.assertEqual(self.stub.count, calls)
+
+        third = self.client()
+        self.assertEqual(third.token_manager.get_token(), TOKEN_RESPONSE['access_token'])
+        self.assertEqual(self.stub.count, calls)
+
+    def test_authenticate_again_fetches_a_new_token(self):
+        client = self.client()
+        client.authenticate()
+        calls = self.stub.count
+        client.authenticate()
+        self.assertEqual(self.stub.count, calls + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import time
+import unittest
+
+import requests
+
+from sabre.sabre_dev_studio import sabre_exceptions
+from sabre.sabre_dev_studio.sabre_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from sabre.sabre_dev_studio.sabre_exceptions import CircuitOpenError
+
+
+def fail():
+    raise requests.ConnectionError('unreachable')
+
+
+def not_found():
+    raise sabre_exceptions.SabreErrorNotFound({'status': 'NotFound', 'message': 'no such route'})
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker('test', window=4, min_calls=4, failure_rate=0.5,
+                                      slow_call_seconds=0.1, slow_call_rate=0.5,
+                                      open_seconds=0.1, half_open_probes=2)
+
+    def fail(self, times):
+        for _ in range(times):
+            with self.assertRaises(requests.ConnectionError):
+                self.breaker.call(fail)
+
+    def open(self):
+        self.breaker.call(lambda: 'ok')
+        self.breaker.call(lambda: 'ok')
+        self.fail(2)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_stays_closed_below_min_calls(self):
+        self.fail(3)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failure_rate_opens_the_circuit(self):
+        self.open()
+
+        calls = []
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.call(lambda: calls.append(None))
+        self.assertEqual(calls, [])
+        self.assertGreater(raised.exception.retry_after, 0)
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+        self.assertEqual(self.breaker.stats()['opened'], 1)
+
+    def test_slow_calls_open_the_circuit(self):
+        self.breaker.call(lambda: 'ok')
+        self.breaker.call(lambda: 'ok')
+        self.breaker.call(lambda: time.sleep(0.1))
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.call(lambda: time.sleep(0.1))
+
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats()['slow'], 2)
+
+    def test_client_errors_do_not_count(self):
+        for _ in range(4):
+            with self.assertRaises(sabre_exceptions.SabreErrorNotFound):
+                self.breaker.call(not_found)
+
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.stats()['failures'], 0)
+
+    def test_half_open_after_open_seconds(self):
+        self.open()
+        time.sleep(0.1)
+
+        self.breaker.before()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.breaker.before()
+        # Only half_open_probes calls go through
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before()
+
+    def test_successful_probes_close_the_circuit(self):
+        self.open()
+        time.sleep(0.1)
+
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.breaker.call(lambda: 'ok')
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        # The window starts over
+        self.fail(3)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_reopens_the_circuit(self):
+        self.open()
+        time.sleep(0.1)
+
+        self.breaker.call(lambda: 'ok')
+        self.fail(1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats()['opened'], 2)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: 'ok')
+
+    def test_slow_probe_reopens_the_circuit(self):
+        self.open()
+        time.sleep(0.1)
+
+        self.breaker.call(lambda: time.sleep(0.1))
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_client_error_frees_a_probe(self):
+        self.open()
+        time.sleep(0.1)
+
+        with self.assertRaises(sabre_exceptions.SabreErrorNotFound):
+            self.breaker.call(not_found)
+        self.breaker.call(lambda: 'ok')
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
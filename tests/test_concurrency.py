@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from sabre.sabre_dev_studio import sabre_configs
+from sabre.sabre_dev_studio.sabre_concurrency import fan_out, fan_out_async
+
+
+class Gauge(object):
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def enter(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def leave(self):
+        with self.lock:
+            self.current -= 1
+
+
+class FanOutAsyncTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        limit = sabre_configs.configurations['MAX_CONCURRENT_REQUESTS']
+        # Read by the loop's first batch: every test runs in a new loop
+        sabre_configs.configurations['MAX_CONCURRENT_REQUESTS'] = 3
+        self.addCleanup(sabre_configs.configurations.__setitem__, 'MAX_CONCURRENT_REQUESTS', limit)
+        self.gauge = Gauge()
+
+    async def call(self, n):
+        self.gauge.enter()
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            self.gauge.leave()
+        if n < 0:
+            raise ValueError(n)
+        return n * 2
+
+    async def collect(self, queries, max_concurrency):
+        return [r async for r in fan_out_async(self.call, queries, max_concurrency)]
+
+    async def test_concurrent_batches_share_the_global_cap(self):
+        batches = await asyncio.gather(*[
+            self.collect([(n,) for n in range(6)], 3) for _ in range(3)
+        ])
+
+        self.assertEqual(self.gauge.peak, 3)
+        for batch in batches:
+            self.assertEqual(sorted(r.result for r in batch), [0, 2, 4, 6, 8, 10])
+
+    async def test_batch_cap_and_errors(self):
+        results = await self.collect([(1,), (-1,), (2,)], 1)
+
+        self.assertEqual(self.gauge.peak, 1)
+        self.assertEqual([r.result for r in results], [2, None, 4])
+        self.assertIsInstance(results[1].error, ValueError)
+
+    async def test_queries_are_read_lazily(self):
+        read = []
+
+        def queries():
+            for n in range(100):
+                read.append(n)
+                yield (n,)
+
+        batch = fan_out_async(self.call, queries(), 2)
+        await batch.__anext__()
+        await batch.aclose()
+        await asyncio.sleep(0)
+        self.assertLessEqual(len(read), 3)
+        self.assertEqual(self.gauge.current, 0)
+
+
+class FanOutTest(unittest.TestCase):
+    def test_results_and_errors(self):
+        def call(n):
+            time.sleep(0.01)
+            if n < 0:
+                raise ValueError(n)
+            return n * 2
+
+        results = list(fan_out(call, [(1,), (-1,), {'n': 2}], 2))
+        self.assertEqual(sorted(r.result for r in results if r.error is None), [2, 4])
+        self.assertEqual([type(r.error) for r in results if r.error is not None], [ValueError])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import threading
+import time
+import unittest
+from concurrent import futures
+
+from sabre.sabre_dev_studio import sabre_hedge, sabre_metrics
+from sabre.sabre_dev_studio.sabre_hedge import Hedger
+from sabre.sabre_dev_studio.sabre_metrics import Instrumentation
+
+
+class HedgerTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = futures.ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+        executor = sabre_hedge._executor
+        sabre_hedge._executor = self.executor
+        self.addCleanup(setattr, sabre_hedge, '_executor', executor)
+
+        self.hedger = Hedger('test', percentile=50, min_delay=0.05, initial_delay=0.05,
+                             min_samples=1, budget=1)
+
+    def test_queue_time_is_not_latency(self):
+        busy = threading.Event()
+        for _ in range(2):
+            self.executor.submit(busy.wait, 5)
+        threading.Timer(0.2, busy.set).start()
+
+        self.assertEqual(self.hedger.call(lambda: 'ok'), 'ok')
+        self.assertLess(self.hedger.latencies[0], 0.1)
+        self.assertEqual(self.hedger.stats()['hedged'], 0)
+
+    def test_calls_report_to_the_measured_call(self):
+        def fetch():
+            time.sleep(0.1)
+            return sabre_metrics.current()
+
+        with Instrumentation().call('request', 'test') as record:
+            self.assertIs(self.hedger.call(fetch), record)
+        self.assertEqual(self.hedger.stats()['hedged'], 1)
+
+    def test_hedge_wins(self):
+        calls = []
+
+        def fetch():
+            calls.append(None)
+            time.sleep(0.5 if len(calls) == 1 else 0)
+            return len(calls)
+
+        start = time.time()
+        self.assertEqual(self.hedger.call(fetch), 2)
+        self.assertLess(time.time() - start, 0.3)
+        self.assertEqual(self.hedger.stats()['hedge_wins'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
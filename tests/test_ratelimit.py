@@ -0,0 +1,142 @@
+import email.utils
+import time
+import unittest
+
+from sabre.sabre_dev_studio import sabre_exceptions
+from sabre.sabre_dev_studio.sabre_exceptions import RateLimitTimeout
+from sabre.sabre_dev_studio.sabre_ratelimit import LocalBucket, RateLimiter, parse_retry_after
+
+
+def rate_limited(retry_after=None):
+    error = sabre_exceptions.SabreErrorRateLimited({'status': 'RateLimited', 'message': 'slow down'})
+    error.retry_after = retry_after
+    return error
+
+
+# flaky
+# [Exception] -> (() -> String)
+# A call raising each of errors in turn, then returning 'ok'
+def flaky(errors):
+    calls = []
+
+    def fn():
+        calls.append(time.time())
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return 'ok'
+    fn.calls = calls
+    return fn
+
+
+class LocalBucketTest(unittest.TestCase):
+    def test_burst_then_refill(self):
+        bucket = LocalBucket('test', rate=20, burst=2)
+        self.assertEqual(bucket.take(), 0)
+        self.assertEqual(bucket.take(), 0)
+
+        wait = bucket.take()
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 0.05)
+
+        time.sleep(0.06)
+        self.assertEqual(bucket.take(), 0)
+
+    def test_never_holds_more_than_burst(self):
+        bucket = LocalBucket('test', rate=100, burst=2)
+        time.sleep(0.05)
+        bucket.take()
+        bucket.take()
+        self.assertGreater(bucket.take(), 0)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.limiter = RateLimiter(limits={'shop': {'rate': 20, 'burst': 1}}, timeout=1,
+                                   retries=2, backoff=0.01, backoff_max=0.2)
+
+    def test_acquire_waits_for_a_token(self):
+        self.assertLess(self.limiter.acquire('shop'), 0.01)
+        waited = self.limiter.acquire('shop')
+        self.assertGreater(waited, 0.03)
+        self.assertLess(waited, 0.2)
+
+    def test_unlimited_family(self):
+        for _ in range(10):
+            self.assertEqual(self.limiter.acquire('lists'), 0)
+
+    def test_default_limit_applies_to_each_family(self):
+        limiter = RateLimiter(limits={'default': {'rate': 1}}, timeout=0.1)
+        limiter.acquire('lists')
+        limiter.acquire('hotels')
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire('lists')
+
+    def test_timeout(self):
+        self.limiter.acquire('shop')
+        start = time.time()
+        with self.assertRaises(RateLimitTimeout):
+            self.limiter.acquire('shop', timeout=0.01)
+        # Gives up at once rather than sleeping past the timeout
+        self.assertLess(time.time() - start, 0.03)
+
+    def test_retries_after_retry_after(self):
+        fn = flaky([rate_limited(0.1)])
+        self.assertEqual(self.limiter.call('lists', fn), 'ok')
+        self.assertEqual(len(fn.calls), 2)
+        self.assertGreaterEqual(fn.calls[1] - fn.calls[0], 0.1)
+
+    def test_retry_after_is_capped(self):
+        fn = flaky([rate_limited(60)])
+        start = time.time()
+        self.assertEqual(self.limiter.call('lists', fn), 'ok')
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_backoff_grows(self):
+        limiter = RateLimiter(limits={}, retries=5, backoff=1, backoff_max=3)
+        for attempt, cap in enumerate([1, 2, 3, 3]):
+            delays = [limiter.delay(attempt, rate_limited()) for _ in range(50)]
+            self.assertTrue(all(0 <= delay <= cap for delay in delays))
+        self.assertEqual(limiter.delay(0, rate_limited(0.5)), 0.5)
+
+    def test_retries_unavailable_and_gateway_timeout(self):
+        fn = flaky([sabre_exceptions.SabreErrorServiceUnavailable(),
+                    sabre_exceptions.SabreErrorGatewayTimeout()])
+        self.assertEqual(self.limiter.call('lists', fn), 'ok')
+        self.assertEqual(len(fn.calls), 3)
+
+    def test_gives_up_after_retries(self):
+        fn = flaky([rate_limited(0)] * 3)
+        with self.assertRaises(sabre_exceptions.SabreErrorRateLimited):
+            self.limiter.call('lists', fn)
+        self.assertEqual(len(fn.calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        fn = flaky([sabre_exceptions.SabreErrorNotFound()])
+        with self.assertRaises(sabre_exceptions.SabreErrorNotFound):
+            self.limiter.call('lists', fn)
+        self.assertEqual(len(fn.calls), 1)
+
+    def test_each_attempt_takes_a_token(self):
+        fn = flaky([rate_limited(0)])
+        self.limiter.acquire('shop')
+        start = time.time()
+        self.limiter.call('shop', fn)
+        self.assertGreater(time.time() - start, 0.07)
+
+
+class ParseRetryAfterTest(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after('2'), 2.0)
+        self.assertEqual(parse_retry_after('-1'), 0.0)
+
+    def test_http_date(self):
+        when = email.utils.formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(when), 30, delta=2)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+
+
+if __name__ == '__main__':
+    unittest.main()
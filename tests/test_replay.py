@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+from sabre.benchmarks import fixtures
+from sabre.benchmarks.stub_server import TOKEN_RESPONSE
+from sabre.sabre_dev_studio import sabre_configs, sabre_exceptions
+from sabre.sabre_dev_studio.sabre_configs import sabre_endpoints
+from sabre.sabre_dev_studio.sabre_dev_studio import SabreDevStudio
+from sabre.sabre_dev_studio.sabre_replay import (FRAME, MAGIC, RecordingTransport,
+                                                ReplayTransport)
+from sabre.sabre_dev_studio.sabre_transport import SabreTransport
+from sabre.tests.stub import ScriptedStub
+
+
+INSTAFLIGHTS = sabre_endpoints['instaflights']
+
+
+def session_token(doc):
+    header = doc['soap-env:Envelope']['soap-env:Header']
+    return header['wsse:Security']['wsse:BinarySecurityToken']['#text']
+
+
+def read_frames(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = len(MAGIC)
+    frames = []
+    while offset < len(data):
+        key_length, length = FRAME.unpack_from(data, offset)
+        offset += FRAME.size + key_length
+        frames.append(zlib.decompress(data[offset:offset + length]))
+        offset += length
+    return frames
+
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='sabre_replay_')
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.path = os.path.join(self.dir, 'replay.bin')
+
+        self.stub = ScriptedStub(routes={
+            INSTAFLIGHTS: fixtures.instaflights_response(3),
+        }, soap={
+            'SessionCreateRQ': fixtures.soap_response('SessionCreateRQ', 'Session'),
+        }).start()
+        self.addCleanup(self.stub.stop)
+
+        wsdl_url = sabre_configs.configurations['WSDL_URL']
+        sabre_configs.configurations['WSDL_URL'] = self.stub.soap_url
+        self.addCleanup(sabre_configs.configurations.__setitem__, 'WSDL_URL', wsdl_url)
+
+    def client(self, transport):
+        client = SabreDevStudio(transport=transport)
+        client.breakers = None
+        client.response_cache = None
+        client.single_flight = None
+        client.rate_limiter = None
+        client.host = self.stub.url
+        client.set_credentials('client', 'secret')
+        return client
+
+    def record(self):
+        recorder = RecordingTransport(self.path, transport=SabreTransport())
+        client = self.client(recorder)
+        client.authenticate()
+        flights = client.instaflights({'origin': 'JFK', 'destination': 'LAX'})
+        session = client.get_service({'Service': 'Session', 'Action': 'SessionCreateRQ'})
+        recorder.close()
+        return client, flights, session
+
+    def test_record_redacts_tokens(self):
+        client, flights, session = self.record()
+
+        # The caller still gets the real tokens
+        self.assertEqual(client.token, TOKEN_RESPONSE['access_token'])
+        token = session_token(session)
+        self.assertIn('STUB', token)
+
+        frames = read_frames(self.path)
+        self.assertEqual(len(frames), 3)
+        for frame in frames:
+            self.assertNotIn(TOKEN_RESPONSE['access_token'].encode('ascii'), frame)
+            self.assertNotIn(token.encode('ascii'), frame)
+        self.assertTrue(any(b'"access_token": "REDACTED"' in frame for frame in frames))
+        self.assertTrue(any(b'>REDACTED</wsse:BinarySecurityToken>' in frame for frame in frames))
+
+    def test_replay_without_network(self):
+        _, flights, session = self.record()
+        self.stub.stop()
+
+        client = self.client(ReplayTransport(self.path))
+        client.host = 'https://api.invalid'
+        client.authenticate()
+        self.assertEqual(client.token, 'REDACTED')
+
+        replayed = client.instaflights({'origin': 'JFK', 'destination': 'LAX'})
+        self.assertEqual(len(replayed.priced_itineraries), len(flights.priced_itineraries))
+
+        replayed = client.get_service({'Service': 'Session', 'Action': 'SessionCreateRQ'})
+        self.assertEqual(session_token(replayed), 'REDACTED')
+
+    def test_replay_miss(self):
+        self.record()
+        client = self.client(ReplayTransport(self.path))
+        client.token = 'any'
+
+        with self.assertRaises(sabre_exceptions.ReplayMissError):
+            client.instaflights({'origin': 'JFK', 'destination': 'SFO'})
+
+        client.transport = ReplayTransport(self.path, strict=False)
+        resp = client.instaflights({'origin': 'JFK', 'destination': 'SFO'})
+        self.assertEqual(len(resp.priced_itineraries), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+import threading
+import time
+import unittest
+
+from sabre.sabre_dev_studio.sabre_exceptions import SessionPoolExhausted
+from sabre.sabre_dev_studio.sabre_session import SessionKeepalive
+from sabre.tests.stub import make_pool
+
+
+class SessionLeaseTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = make_pool(min_size=2, max_size=2, checkout_timeout=1, lease_timeout=60)
+        self.pool.fill(2)
+
+    def test_checkout_and_checkin(self):
+        first = self.pool.checkout()
+        second = self.pool.checkout()
+
+        self.assertEqual(sorted([first.token, second.token]), ['session0', 'session1'])
+        self.assertEqual(self.pool.leased(), 2)
+        self.assertIsNone(self.pool.try_checkout())
+
+        first.release()
+        first.release()
+        self.assertEqual(self.pool.leased(), 1)
+        with self.pool.lease() as lease:
+            self.assertEqual(lease.token, first.token)
+        second.release()
+        self.assertEqual(self.pool.leased(), 0)
+        self.assertEqual(self.pool.stats()['checkouts'], 3)
+
+    def test_checkout_waits_for_a_checkin(self):
+        leases = [self.pool.checkout(), self.pool.checkout()]
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(self.pool.checkout(timeout=2)))
+        start = time.time()
+        waiter.start()
+
+        time.sleep(0.1)
+        self.assertEqual(got, [])
+        leases[1].release()
+        waiter.join()
+
+        self.assertEqual(got[0].token, leases[1].token)
+        self.assertGreaterEqual(time.time() - start, 0.1)
+        self.assertLess(time.time() - start, 1)
+
+    def test_checkout_times_out(self):
+        leases = [self.pool.checkout(), self.pool.checkout()]
+        start = time.time()
+        with self.assertRaises(SessionPoolExhausted):
+            self.pool.checkout(timeout=0.1)
+
+        self.assertGreaterEqual(time.time() - start, 0.1)
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+        for lease in leases:
+            lease.release()
+
+    def test_lease_of_a_dead_holder_is_reclaimed(self):
+        self.pool.lease_timeout = 0.1
+        dead = [self.pool.checkout(), self.pool.checkout()]
+
+        # The holders never check in: their leases expire
+        time.sleep(0.15)
+        lease = self.pool.checkout(timeout=0.5)
+        self.assertIn(lease.token, [d.token for d in dead])
+        self.assertFalse(dead[0].renew())
+
+        # A late checkin must not free the new holder's lease
+        for d in dead:
+            d.release()
+        self.assertEqual(self.pool.leased(), 1)
+        lease.release()
+        self.assertEqual(self.pool.leased(), 0)
+
+    def test_renew_keeps_the_lease(self):
+        self.pool.lease_timeout = 0.1
+        lease = self.pool.checkout()
+        self.assertTrue(lease.renew(60))
+        time.sleep(0.15)
+        self.assertEqual(self.pool.leased(), 1)
+        lease.release()
+
+    def test_discarded_session_leaves_its_slot_empty(self):
+        lease = self.pool.checkout()
+        lease.release(discard=True)
+
+        self.assertEqual(len(self.pool.tokens()), 1)
+        with self.pool.lease() as other:
+            self.assertNotEqual(other.index, lease.index)
+            self.assertIsNone(self.pool.try_checkout())
+
+
+class SessionPingTest(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+        self.rejected = set()
+        self.pool = make_pool(created=self.created, min_size=2, max_size=2)
+        self.pool.ping = self.ping
+        self.pool.fill(2)
+
+    def ping(self, token):
+        if token in self.rejected:
+            raise ValueError('rejected ' + token)
+
+    def test_rejected_session_is_replaced(self):
+        self.rejected.add('session1')
+        results = self.pool.ping_all()
+
+        self.assertIsNone(results[0].error)
+        self.assertIsInstance(results[1].error, ValueError)
+        self.assertEqual(results[1].replacement, 'session2')
+        self.assertEqual(self.pool.tokens(), {0: 'session0', 1: 'session2'})
+        self.assertEqual(self.pool.leased(), 0)
+
+    def test_slot_is_emptied_when_no_replacement_can_be_made(self):
+        self.rejected.add('session0')
+
+        def fail():
+            raise ValueError('no session')
+        self.pool.create = fail
+        self.pool.create_attempts = 1
+        results = self.pool.ping_all()
+
+        self.assertIsNone(results[0].replacement)
+        self.assertEqual(self.pool.tokens(), {1: 'session1'})
+        self.assertEqual(self.pool.leased(), 0)
+
+    def test_leased_sessions_are_not_pinged(self):
+        with self.pool.lease() as lease:
+            self.rejected.add(lease.token)
+            results = self.pool.ping_all()
+        self.assertEqual([r.error for r in results], [None, None])
+        self.assertIsNone(results[lease.index].token)
+
+
+class SessionPoolLimitTest(unittest.TestCase):
+    def setUp(self):
+        self.pinged = []
+        self.closed = []
+        self.pool = make_pool(pinged=self.pinged, closed=self.closed, min_size=4, max_size=4)
+        self.pool.fill(4)
+
+    def test_ping_all_with_limit(self):
+        results = self.pool.ping_all(limit=2)
+        self.assertEqual([result.index for result in results], [0, 1])
+        self.assertEqual(sorted(self.pinged), ['session0', 'session1'])
+
+    def test_close_all_with_limit(self):
+        tokens = self.pool.tokens()
+        results = self.pool.close_all(limit=2)
+
+        self.assertEqual([result.token for result in results], [tokens[0], tokens[1]])
+        self.assertEqual(sorted(self.closed), sorted([tokens[0], tokens[1]]))
+        self.assertEqual(self.pool.tokens(), {2: tokens[2], 3: tokens[3]})
+        with self.pool.lease() as lease:
+            self.assertIn(lease.index, (2, 3))
+
+    def test_close_all(self):
+        results = self.pool.close_all()
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len(self.closed), 4)
+        self.assertEqual(self.pool.size(), 0)
+
+
+class SessionPoolScalingTest(unittest.TestCase):
+    def setUp(self):
+        self.closed = []
+        self.pool = make_pool(closed=self.closed, min_size=1, max_size=3, grow_wait=0,
+                              shrink_idle=0.2, scale_cooldown=0, checkout_timeout=2)
+        self.pool.fill(1)
+
+    def grow_to_peak(self):
+        leases = [self.pool.checkout()]
+        while len(leases) < 3:
+            leases.append(self.pool.checkout())
+        self.assertEqual(self.pool.size(), 3)
+        for lease in leases:
+            lease.release()
+
+    def test_checkout_takes_the_lowest_free_slot(self):
+        self.grow_to_peak()
+        for _ in range(10):
+            with self.pool.lease() as lease:
+                self.assertEqual(lease.index, 0)
+        with self.pool.lease() as first, self.pool.lease() as second:
+            self.assertEqual((first.index, second.index), (0, 1))
+
+    def test_shrinks_back_under_light_traffic(self):
+        self.grow_to_peak()
+
+        deadline = time.time() + 3
+        while self.pool.size() > 1 and time.time() < deadline:
+            with self.pool.lease():
+                time.sleep(0.01)
+
+        self.assertEqual(self.pool.size(), 1)
+        self.assertEqual(len(self.closed), 2)
+        self.assertEqual(self.pool.stats()['shrunk'], 2)
+
+    def test_keepalive_shrinks_an_idle_pool(self):
+        self.grow_to_peak()
+        keepalive = SessionKeepalive(self.pool, idle_timeout=60, margin=0)
+
+        time.sleep(0.25)
+        keepalive.run_once()
+        self.assertEqual(self.pool.size(), 2)
+        self.pool.shrink_checked = 0
+        keepalive.run_once()
+        self.assertEqual(self.pool.size(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
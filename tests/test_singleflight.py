@@ -0,0 +1,99 @@
+import threading
+import time
+import unittest
+from concurrent import futures
+
+from sabre.benchmarks import fixtures
+from sabre.sabre_dev_studio.sabre_configs import sabre_endpoints
+from sabre.sabre_dev_studio.sabre_dev_studio import SabreDevStudio
+from sabre.sabre_dev_studio.sabre_singleflight import SingleFlight
+from sabre.tests.stub import ScriptedStub
+
+
+INSTAFLIGHTS = sabre_endpoints['instaflights']
+HOTEL_LIST = sabre_endpoints['get_hotel_list']
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.executor = futures.ThreadPoolExecutor(max_workers=5)
+        self.addCleanup(self.executor.shutdown)
+
+    def run_together(self, key, fn, times=5):
+        return [f.result() for f in [self.executor.submit(self.single_flight.do, key, fn)
+                                     for _ in range(times)]]
+
+    def test_concurrent_calls_share_one_result(self):
+        calls = []
+
+        def fetch():
+            calls.append(None)
+            time.sleep(0.1)
+            return {'calls': len(calls)}
+
+        results = self.run_together('key', fetch)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(self.single_flight.stats(), {'calls': 1, 'coalesced': 4, 'coalesced_remote': 0})
+
+    def test_later_calls_are_not_coalesced(self):
+        self.single_flight.do('key', lambda: 1)
+        self.assertEqual(self.single_flight.do('key', lambda: 2), 2)
+
+    def test_error_is_shared(self):
+        started = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(None)
+            started.set()
+            time.sleep(0.1)
+            raise ValueError('failed')
+
+        leader = self.executor.submit(self.single_flight.do, 'key', fetch)
+        started.wait(1)
+        with self.assertRaises(ValueError):
+            self.single_flight.do('key', fetch)
+        with self.assertRaises(ValueError):
+            leader.result()
+        self.assertEqual(len(calls), 1)
+
+
+class ClientSingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = ScriptedStub(latency=0.1, routes={
+            INSTAFLIGHTS: fixtures.instaflights_response(3),
+        }).start()
+        self.addCleanup(self.stub.stop)
+
+        self.sabre = SabreDevStudio()
+        self.sabre.host = self.stub.url
+        self.sabre.set_credentials('client', 'secret')
+        self.sabre.rate_limiter = None
+        self.sabre.authenticate()
+        self.sabre.single_flight = SingleFlight()
+
+        self.executor = futures.ThreadPoolExecutor(max_workers=5)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_identical_gets_share_one_call(self):
+        results = list(self.executor.map(lambda _: self.sabre.instaflights({'origin': 'JFK'}), range(5)))
+
+        self.assertEqual(self.stub.calls(INSTAFLIGHTS), 1)
+        self.assertTrue(all(len(result.priced_itineraries) == 3 for result in results))
+        self.assertEqual(self.sabre.single_flight.stats()['coalesced'], 4)
+
+    def test_different_gets_are_not_coalesced(self):
+        list(self.executor.map(lambda i: self.sabre.instaflights({'origin': 'JFK', 'limit': i}), range(3)))
+        self.assertEqual(self.stub.calls(INSTAFLIGHTS), 3)
+
+    def test_posts_are_never_coalesced(self):
+        list(self.executor.map(lambda _: self.sabre.get_hotel_list({'city': 'NYC'}), range(5)))
+
+        self.assertEqual(self.stub.calls(HOTEL_LIST), 5)
+        self.assertEqual(self.sabre.single_flight.stats()['calls'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
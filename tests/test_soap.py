@@ -0,0 +1,98 @@
+import time
+import unittest
+
+from sabre.benchmarks import fixtures
+from sabre.benchmarks.stub_server import SOAP_PATH
+from sabre.sabre_dev_studio import sabre_configs
+from sabre.sabre_dev_studio.sabre_dev_studio import SabreDevStudio, Session
+from sabre.sabre_dev_studio.sabre_hedge import Hedger
+from sabre.tests.stub import ScriptedStub, make_pool
+
+
+BFM_VALUES = {
+    'origin': 'JFK',
+    'destination': 'LAX',
+    'date_departure': '2026-11-01T00:00:00',
+    'date_arrival': '2026-11-08T00:00:00',
+}
+
+
+class SoapTestCase(unittest.TestCase):
+    pool_size = 2
+    latency = 0
+
+    def setUp(self):
+        self.stub = ScriptedStub(latency=self.latency, soap={
+            'BargainFinderMaxRQ': fixtures.bargain_finder_max_response(3),
+        }).start()
+        self.addCleanup(self.stub.stop)
+
+        wsdl_url = sabre_configs.configurations['WSDL_URL']
+        sabre_configs.configurations['WSDL_URL'] = self.stub.soap_url
+        self.addCleanup(sabre_configs.configurations.__setitem__, 'WSDL_URL', wsdl_url)
+
+        pool = Session._pool
+        Session._pool = make_pool(min_size=self.pool_size, max_size=self.pool_size, checkout_timeout=1)
+        Session._pool.fill(self.pool_size)
+        self.addCleanup(setattr, Session, '_pool', pool)
+
+        self.sabre = SabreDevStudio()
+        self.sabre.host = self.stub.url
+
+
+class SoapServicesTest(SoapTestCase):
+    def test_template_values_are_not_modified(self):
+        values = dict(BFM_VALUES)
+        self.sabre.bargain_finder_max_RQ(values)
+        self.assertEqual(values, BFM_VALUES)
+
+    def test_stream_does_not_modify_template_values(self):
+        values = dict(BFM_VALUES)
+        items = list(self.sabre.bargain_finder_max_RQ(values, stream=True))
+
+        self.assertEqual(len(items), 3)
+        self.assertEqual(values, BFM_VALUES)
+        self.assertEqual(Session.pool().leased(), 0)
+
+
+class HedgeTestCase(SoapTestCase):
+    latency = 0.2
+
+    def setUp(self):
+        super(HedgeTestCase, self).setUp()
+        self.hedger = Hedger('BargainFinderMaxRQ', min_delay=0.05, initial_delay=0.05, budget=1)
+        hedger = Hedger._hedgers.get('BargainFinderMaxRQ')
+        Hedger._hedgers['BargainFinderMaxRQ'] = self.hedger
+        self.addCleanup(Hedger._hedgers.__setitem__, 'BargainFinderMaxRQ', hedger)
+
+
+class HedgedSoapTest(HedgeTestCase):
+    def test_hedge_uses_a_second_session(self):
+        result = self.sabre.bargain_finder_max_RQ(dict(BFM_VALUES), hedge=True)
+
+        self.assertIn('soap-env:Envelope', result)
+        self.assertEqual(self.hedger.stats()['hedged'], 1)
+        # The loser gives its session back once its call is over
+        deadline = time.time() + 2
+        while Session.pool().leased() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(Session.pool().leased(), 0)
+
+
+class SingleSessionHedgeTest(HedgeTestCase):
+    pool_size = 1
+
+    def test_no_hedge_without_a_free_session(self):
+        start = time.time()
+        result = self.sabre.bargain_finder_max_RQ(dict(BFM_VALUES), hedge=True)
+
+        self.assertIn('soap-env:Envelope', result)
+        self.assertLess(time.time() - start, 2 * self.latency)
+        stats = self.hedger.stats()
+        self.assertEqual((stats['hedged'], stats['not_ready']), (0, 1))
+        self.assertEqual(self.stub.calls(SOAP_PATH), 1)
+        self.assertEqual(Session.pool().leased(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
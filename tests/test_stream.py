@@ -0,0 +1,80 @@
+import json
+import unittest
+
+from sabre.benchmarks import fixtures
+from sabre.sabre_dev_studio import sabre_exceptions
+from sabre.sabre_dev_studio.sabre_configs import sabre_endpoints
+from sabre.sabre_dev_studio.sabre_dev_studio import SabreDevStudio
+from sabre.sabre_dev_studio.sabre_metrics import Instrumentation
+from sabre.sabre_dev_studio.sabre_stream import iter_json_array
+from sabre.tests.stub import ScriptedStub
+
+
+INSTAFLIGHTS = sabre_endpoints['instaflights']
+
+
+def chunked(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class JsonArrayTest(unittest.TestCase):
+    def test_every_chunk_boundary(self):
+        items = [-2500.05, 1e-07, 12, 'x,]', True, None, {'a': [1, 2]}, [3.5], 0]
+        text = json.dumps({'Other': [9], 'Items': items, 'After': 1})
+        for size in range(1, len(text) + 1):
+            self.assertEqual(list(iter_json_array(chunked(text, size), 'Items')), items, size)
+
+    def test_number_cut_off_by_the_end_of_the_stream(self):
+        self.assertEqual(list(iter_json_array([b'{"Items": [1, 2.', b'5'], 'Items')), [1, 2.5])
+
+    def test_missing_key(self):
+        self.assertEqual(list(iter_json_array(chunked('{"Other": [1, 2]}', 3), 'Items')), [])
+
+
+class StreamedRequestTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = ScriptedStub(latency=0.05, routes={
+            INSTAFLIGHTS: fixtures.instaflights_response(5),
+        }).start()
+        self.addCleanup(self.stub.stop)
+
+        self.calls = []
+        instrumentation = Instrumentation()
+        instrumentation.add_hook(post=self.calls.append)
+        self.sabre = SabreDevStudio(instrumentation=instrumentation)
+        self.sabre.host = self.stub.url
+        self.sabre.token = 'stub'
+
+    def test_stream_is_measured_until_the_last_item(self):
+        items = list(self.sabre.instaflights({'origin': 'JFK'}, stream=True))
+
+        self.assertEqual(len(items), 5)
+        self.assertEqual(len(self.calls), 1)
+        call = self.calls[0]
+        self.assertEqual((call.kind, call.name, call.fields), ('request', 'instaflights',
+                                                               {'method': 'GET', 'stream': True}))
+        self.assertIsNone(call.error)
+        self.assertGreaterEqual(call.phases['first_byte'], 0.05)
+        self.assertGreaterEqual(call.duration, call.phases['first_byte'])
+        self.assertGreater(call.bytes_in, 0)
+
+    def test_failed_stream_is_recorded(self):
+        self.stub.script(INSTAFLIGHTS, 404)
+        with self.assertRaises(sabre_exceptions.SabreErrorNotFound):
+            list(self.sabre.instaflights({'origin': 'JFK'}, stream=True))
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertIsInstance(self.calls[0].error, sabre_exceptions.SabreErrorNotFound)
+
+    def test_closed_stream_is_recorded(self):
+        stream = self.sabre.instaflights({'origin': 'JFK'}, stream=True)
+        next(stream)
+        stream.close()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertIsNone(self.calls[0].error)
+
+
+if __name__ == '__main__':
+    unittest.main()
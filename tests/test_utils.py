@@ -0,0 +1,114 @@
+import copy
+import json
+import pickle
+import unittest
+
+from sabre.benchmarks import fixtures
+from sabre.sabre_dev_studio.sabre_utils import (ResponseData, ResponseList, convert_keys, pythonize_key,
+                                                response_data)
+
+
+class PythonizeKeyTest(unittest.TestCase):
+    def test_keys(self):
+        self.assertEqual(pythonize_key('PricedItineraries'), 'priced_itineraries')
+        self.assertEqual(pythonize_key('PTC_FareBreakdown'), 'ptc_fare_breakdown')
+        self.assertEqual(pythonize_key('GeoCodeRS'), 'geo_code_rs')
+        self.assertEqual(pythonize_key('OriginLocation'), 'origin_location')
+        self.assertEqual(pythonize_key('1stClass'), 'st_class')
+        self.assertEqual(pythonize_key('Total Fare'), 'total_fare')
+
+
+class ConvertKeysTest(unittest.TestCase):
+    def test_nested_keys_are_renamed_in_place(self):
+        data = {'PricedItineraries': [{'AirItinerary': {'DirectionInd': 'Return'}}, 1],
+                'OriginLocation': 'JFK'}
+        convert_keys(data)
+        self.assertEqual(data, {'priced_itineraries': [{'air_itinerary': {'direction_ind': 'Return'}}, 1],
+                                'origin_location': 'JFK'})
+
+    def test_deep_structures(self):
+        data = node = {}
+        for _ in range(5000):
+            node['NextNode'] = {}
+            node = node['NextNode']
+        convert_keys(data)
+        self.assertIn('next_node', data)
+
+
+class ResponseDataTest(unittest.TestCase):
+    def setUp(self):
+        self.raw = fixtures.instaflights_response(2)
+        self.snapshot = copy.deepcopy(self.raw)
+        self.resp = response_data(self.raw)
+
+    def test_is_a_dict(self):
+        self.assertIsInstance(self.resp, dict)
+        self.assertIsInstance(self.resp['PricedItineraries'], list)
+        self.assertIsInstance(self.resp['PricedItineraries'][0], dict)
+        self.assertEqual(self.resp, self.raw)
+        self.assertEqual(sorted(self.resp), sorted(self.raw))
+
+    def test_attribute_access(self):
+        itinerary = self.resp.priced_itineraries[0]
+        self.assertIsInstance(itinerary, ResponseData)
+        self.assertIs(self.resp.priced_itineraries, self.resp['PricedItineraries'])
+        self.assertEqual(itinerary.air_itinerary_pricing_info,
+                         self.raw['PricedItineraries'][0]['AirItineraryPricingInfo'])
+        self.assertEqual(self.resp['priced_itineraries'], self.resp.priced_itineraries)
+        self.assertIn('priced_itineraries', self.resp._fields)
+        with self.assertRaises(AttributeError):
+            self.resp.no_such_key
+
+    def test_json_dumps(self):
+        self.resp.priced_itineraries[0].air_itinerary_pricing_info
+        self.assertEqual(json.loads(json.dumps(self.resp)), self.raw)
+
+    def test_mutation_does_not_touch_the_source(self):
+        self.resp.priced_itineraries[0]['Extra'] = 1
+        self.resp.priced_itineraries.append({'Sequence': 3})
+        self.resp['OriginLocation'] = 'LAX'
+        del self.resp['PricedItineraries'][1]
+        for value in self.resp.values():
+            if isinstance(value, dict):
+                value.clear()
+
+        self.assertEqual(self.raw, self.snapshot)
+        self.assertEqual(self.resp.priced_itineraries[0]['Extra'], 1)
+        self.assertEqual(self.resp.origin_location, 'LAX')
+        self.assertEqual(json.loads(json.dumps(self.resp))['PricedItineraries'][1], {'Sequence': 3})
+
+    def test_new_keys_are_reachable_by_name(self):
+        self.resp.origin_location
+        self.resp['TotalFare'] = 10
+        self.assertEqual(self.resp.total_fare, 10)
+        del self.resp['TotalFare']
+        with self.assertRaises(AttributeError):
+            self.resp.total_fare
+
+    def test_dict_methods_wrap_nested_objects(self):
+        self.assertIsInstance(self.resp.get('PricedItineraries'), ResponseList)
+        self.assertIsNone(self.resp.get('Missing'))
+        self.assertTrue(all(isinstance(i, ResponseData) for i in self.resp.priced_itineraries))
+        self.assertTrue(all(not isinstance(v, dict) or isinstance(v, ResponseData)
+                            for v in self.resp.values()))
+        self.assertIsInstance(self.resp.copy(), ResponseData)
+        self.assertIsInstance(self.resp.pop('PricedItineraries'), ResponseList)
+
+    def test_pickle(self):
+        self.resp.priced_itineraries[0]
+        restored = pickle.loads(pickle.dumps(self.resp))
+        self.assertEqual(restored, self.raw)
+        self.assertEqual(restored.priced_itineraries[0].sequence_number,
+                         self.raw['PricedItineraries'][0]['SequenceNumber'])
+
+    def test_scalars_and_lists(self):
+        self.assertEqual(response_data(3), 3)
+        items = response_data([{'CountryCode': 'US'}, [1]])
+        self.assertIsInstance(items, ResponseList)
+        self.assertEqual(items[0].country_code, 'US')
+        self.assertEqual(items[-1], [1])
+        self.assertEqual([i.country_code for i in items[:1]], ['US'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,6 +29,10 @@ try:  # pragma no cover
     _unicode = unicode
 except NameError:  # pragma no cover
     _unicode = str
+try:  # pragma no cover
+    _intern = intern
+except NameError:  # pragma no cover
+    from sys import intern as _intern
 
 __author__ = 'Martin Blech'
 __version__ = '0.9.1'
@@ -154,8 +158,271 @@ class _DictSAXHandler(object):
         return item
 
 
+class XmlNode(object):
+    """Compact element produced by ``parse(..., fast=True, nodes=True)``.
+
+    `attrs` maps attribute names (without prefix) to values, `children`
+    maps child names to nodes, strings or lists of those, and `text` is the
+    element's character data. Each is `None` when empty. Attributes are
+    stored as a flat ``(name, value, ...)`` tuple, `attrs` builds the
+    dictionary on access. Elements with neither attributes nor children
+    are kept as plain strings, like in the default output.
+
+    Subscripting looks up children, so ``doc['a']['b']`` reads the same as
+    with dictionaries. `to_dict` converts a node back to the default
+    output.
+    """
+    __slots__ = ('attr_items', 'children', 'text')
+
+    def __init__(self, attr_items=None, children=None, text=None):
+        self.attr_items = attr_items
+        self.children = children
+        self.text = text
+
+    @property
+    def attrs(self):
+        items = self.attr_items
+        if not items:
+            return None
+        return dict(zip(items[0::2], items[1::2]))
+
+    def __getitem__(self, key):
+        if self.children is None:
+            raise KeyError(key)
+        return self.children[key]
+
+    def get(self, key, default=None):
+        if self.children is None:
+            return default
+        return self.children.get(key, default)
+
+    def __contains__(self, key):
+        return self.children is not None and key in self.children
+
+    def __eq__(self, other):
+        if not isinstance(other, XmlNode):
+            return NotImplemented
+        return (self.attr_items == other.attr_items and
+                self.children == other.children and
+                self.text == other.text)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return 'XmlNode(attrs=%r, children=%r, text=%r)' % (
+            self.attrs, self.children, self.text)
+
+    def to_dict(self, attr_prefix='@', cdata_key='#text',
+                dict_constructor=OrderedDict):
+        def convert(value):
+            if isinstance(value, list):
+                return [convert(v) for v in value]
+            if isinstance(value, XmlNode):
+                return value.to_dict(attr_prefix, cdata_key, dict_constructor)
+            return value
+
+        result = dict_constructor()
+        items = self.attr_items
+        if items:
+            for i in range(0, len(items), 2):
+                result[attr_prefix + items[i]] = items[i + 1]
+        if self.children:
+            for key, value in self.children.items():
+                result[key] = convert(value)
+        if self.text is not None:
+            result[cdata_key] = self.text
+        return result
+
+
+def _compile_projection(paths):
+    """Turns element paths into a tree of nested dictionaries keyed by
+    local name, where `True` marks a selected element (whole subtree)."""
+    tree = {}
+    for path in paths:
+        steps = [step.rsplit(':', 1)[-1] for step in path.split('/') if step]
+        node = tree
+        for i, step in enumerate(steps):
+            if i == len(steps) - 1:
+                node[step] = True
+                break
+            child = node.get(step)
+            if child is True:
+                break
+            if child is None:
+                child = node[step] = {}
+            node = child
+    return tree
+
+
+class _FastDictSAXHandler(_DictSAXHandler):
+    """Leaner handler behind ``parse(..., fast=True)``.
+
+    Builds plain dictionaries by default and interns element and attribute
+    names, building each distinct name (and its namespace) only once.
+    Element attributes are only kept in `path` when something can read
+    them (an item callback or a postprocessor). With `nodes=True`,
+    elements become `XmlNode` objects instead of dictionaries.
+
+    `projection` is an iterable of element paths (see `parse`); elements
+    outside of it are skipped without building anything.
+    """
+    def __init__(self, dict_constructor=dict, nodes=False, projection=None,
+                 **kwargs):
+        _DictSAXHandler.__init__(self, dict_constructor=dict_constructor,
+                                 **kwargs)
+        self.nodes = nodes
+        self.names = {}
+        self.attr_names = {}
+        self.node_attrs = []
+        self.keep_path_attrs = bool(self.item_depth or
+                                    self.postprocessor is not None)
+        self.projection = None
+        if projection is not None:
+            self.projection = _compile_projection(projection)
+            self.selectors = [self.projection]
+            self.local_names = {}
+            self.skip_depth = 0
+
+    def _attr_names(self, key):
+        names = self.attr_names.get(key)
+        if names is None:
+            names = (_intern(key), _intern(self.attr_prefix + key))
+            self.attr_names[key] = names
+        return names
+
+    def _select(self, name):
+        # Projection step for a new element: True keeps its whole subtree,
+        # a dict keeps the children it lists, None skips the element
+        selector = self.selectors[-1]
+        if selector is True:
+            return True
+        local = self.local_names.get(name)
+        if local is None:
+            local = self.local_names[name] = name.rsplit(':', 1)[-1]
+        child = selector.get(local)
+        if child is None:
+            child = selector.get('*')
+        return child
+
+    def startElement(self, full_name, attrs):
+        if self.projection is not None and self.skip_depth:
+            self.skip_depth += 1
+            return
+
+        name = self.names.get(full_name)
+        if name is None:
+            name = _intern(self._build_name(full_name))
+            self.names[full_name] = name
+
+        if self.projection is not None:
+            selector = self._select(name)
+            if selector is None:
+                self.skip_depth = 1
+                return
+            self.selectors.append(selector)
+
+        path_attrs = item = node_attrs = None
+        if attrs:
+            if isinstance(attrs, dict):
+                attrs = [v for pair in attrs.items() for v in pair]
+            attr_names = self.attr_names
+            if self.keep_path_attrs:
+                path_attrs = self.dict_constructor()
+            if self.xml_attribs:
+                if self.nodes:
+                    node_attrs = attrs
+                else:
+                    item = self.dict_constructor()
+            for i in range(0, len(attrs), 2):
+                key = attrs[i]
+                names = attr_names.get(key) or self._attr_names(key)
+                if path_attrs is not None:
+                    path_attrs[names[0]] = attrs[i + 1]
+                if item is not None:
+                    item[names[1]] = attrs[i + 1]
+                elif node_attrs is not None:
+                    node_attrs[i] = names[0]
+            if node_attrs is not None:
+                node_attrs = tuple(node_attrs)
+
+        self.path.append((name, path_attrs))
+        if len(self.path) > self.item_depth:
+            self.stack.append((self.item, self.data))
+            if self.nodes:
+                self.node_attrs.append(node_attrs)
+            self.item = item
+            self.data = None
+
+    def endElement(self, full_name):
+        if self.projection is not None:
+            if self.skip_depth:
+                self.skip_depth -= 1
+                return
+            self.selectors.pop()
+
+        path = self.path
+        name = path[-1][0]
+        if len(path) == self.item_depth:
+            item = self.item
+            if item is None:
+                item = self.data
+            should_continue = self.item_callback(path, item)
+            if not should_continue:
+                raise ParsingInterrupted()
+        if self.stack:
+            item, data = self.item, self.data
+            self.item, self.data = self.stack.pop()
+            if self.strip_whitespace and data is not None:
+                data = data.strip() or None
+            if self.nodes:
+                attrs = self.node_attrs.pop()
+                if item is None and not attrs and not (data and
+                                                       self.force_cdata):
+                    value = data
+                else:
+                    value = XmlNode(attrs, item, data)
+                self.item = self.push_data(self.item, name, value)
+            else:
+                if data and self.force_cdata and item is None:
+                    item = self.dict_constructor()
+                if item is not None:
+                    if data:
+                        self.push_data(item, self.cdata_key, data)
+                    self.item = self.push_data(self.item, name, item)
+                else:
+                    self.item = self.push_data(self.item, name, data)
+        else:
+            self.item = self.data = None
+        path.pop()
+
+    def characters(self, data):
+        if self.projection is not None and self.skip_depth:
+            return
+        _DictSAXHandler.characters(self, data)
+
+    def push_data(self, item, key, data):
+        if self.postprocessor is not None:
+            result = self.postprocessor(self.path, key, data)
+            if result is None:
+                return item
+            key, data = result
+        if item is None:
+            item = self.dict_constructor()
+        if key in item:
+            value = item[key]
+            if isinstance(value, list):
+                value.append(data)
+            else:
+                item[key] = [value, data]
+        else:
+            item[key] = data
+        return item
+
+
 def parse(xml_input, encoding=None, expat=expat, process_namespaces=False,
-          namespace_separator=':', **kwargs):
+          namespace_separator=':', fast=False, **kwargs):
     """Parse the given XML input and convert it into a dictionary.
 
     `xml_input` can either be a `string` or a file-like object.
@@ -222,9 +489,35 @@ def parse(xml_input, encoding=None, expat=expat, process_namespaces=False,
         >>> xmltodict.parse('<a>hello</a>', expat=defusedexpat.pyexpat)
         OrderedDict([(u'a', u'hello')])
 
+    With `fast=True`, plain dictionaries are built by default (pass
+    `dict_constructor` to override) and element and attribute names are
+    interned, which parses large documents faster and in less memory.
+    Passing `nodes=True` as well returns compact :class:`XmlNode` objects
+    instead of dictionaries:
+
+        >>> doc = xmltodict.parse('<a x="1"><b>2</b></a>', fast=True,
+        ...                       nodes=True)
+        >>> doc['a']['b'], doc['a'].attrs
+        (u'2', {u'x': u'1'})
+
+    `projection` (implies `fast`) limits the output to the given element
+    paths. A path lists local names (namespace prefixes are ignored) from
+    the root element down, `*` matching any one element. A selected element
+    is kept whole; its ancestors are kept with their attributes and
+    selected children only, and everything else is skipped while parsing:
+
+        >>> xmltodict.parse('<a x="1"><b>1</b><c><d>2</d><e/></c></a>',
+        ...                 projection=['a/c/d'])
+        {u'a': {u'@x': u'1', u'c': {u'd': u'2'}}}
+
     """
-    handler = _DictSAXHandler(namespace_separator=namespace_separator,
-                              **kwargs)
+    projection = kwargs.pop('projection', None)
+    if projection is not None:
+        fast = True
+        kwargs['projection'] = projection
+    handler_class = _FastDictSAXHandler if fast else _DictSAXHandler
+    handler = handler_class(namespace_separator=namespace_separator,
+                            **kwargs)
     if isinstance(xml_input, _unicode):
         if not encoding:
             encoding = 'utf-8'